@@ -0,0 +1,162 @@
+import logging
+import time
+import numpy as np
+from pathlib import Path
+from scipy import sparse
+
+from config.constants import ANN_N_PROBE
+from algorithms.semantic_search import normalize_rows, top_k
+
+logger = logging.getLogger(__name__)
+
+# Inverted file index (IVF-Flat) in plain numpy. Vectors are bucketed by their nearest
+# k-means centroid and a query only scans the n_probe closest buckets, so n_probe is the
+# recall/latency knob: n_probe == n_lists is an exact search.
+
+# - https://github.com/facebookresearch/faiss/wiki/Faiss-indexes
+# - Jégou, Douze & Schmid (2011). Product quantization for nearest neighbor search.
+
+
+def spherical_kmeans(
+    matrix: np.ndarray, n_clusters: int, n_iter: int = 20, seed: int = 0
+) -> np.ndarray:
+    """Unit length centroids that maximise the cosine similarity to their members"""
+    rng = np.random.default_rng(seed)
+    centroids = matrix[rng.choice(len(matrix), n_clusters, replace=False)].copy()
+
+    for _ in range(n_iter):
+        assignments = assign(matrix, centroids)
+        members = sparse.csr_matrix(
+            (np.ones(len(matrix), dtype=np.float32), (assignments, np.arange(len(matrix)))),
+            shape=(n_clusters, len(matrix)),
+        )
+        sums = np.asarray(members @ matrix, dtype=np.float32)
+
+        # clusters that lost all their members are reseeded with a random vector
+        empty = np.bincount(assignments, minlength=n_clusters) == 0
+        sums[empty] = matrix[rng.choice(len(matrix), int(empty.sum()))]
+        centroids = normalize_rows(sums)
+
+    return centroids
+
+
+def assign(matrix: np.ndarray, centroids: np.ndarray, chunk_size: int = 8192) -> np.ndarray:
+    """Nearest centroid of every row, in chunks to bound the size of the score matrix"""
+    assignments = np.empty(len(matrix), dtype=np.int64)
+    for i in range(0, len(matrix), chunk_size):
+        assignments[i : i + chunk_size] = np.argmax(
+            matrix[i : i + chunk_size] @ centroids.T, axis=1
+        )
+    return assignments
+
+
+class IVFIndex:
+    """Approximate cosine search over normalized float32 embeddings"""
+
+    def __init__(self, centroids: np.ndarray, n_probe: int = ANN_N_PROBE):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.n_probe = n_probe
+        self.vectors = np.empty((0, self.centroids.shape[1]), dtype=np.float32)
+        self.size = 0
+        self.lists: list[np.ndarray] = [
+            np.empty(0, dtype=np.int64) for _ in range(len(self.centroids))
+        ]
+
+    @classmethod
+    def build(
+        cls,
+        matrix: np.ndarray,
+        n_lists: int | None = None,
+        n_probe: int = ANN_N_PROBE,
+        max_training_rows: int = 100_000,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        """Train the coarse quantizer on (a sample of) the matrix and insert every row"""
+        start_time = time.time()
+
+        matrix = normalize_rows(matrix)
+        n_lists = n_lists or max(1, int(4 * np.sqrt(len(matrix))))
+        n_lists = min(n_lists, len(matrix))
+
+        rng = np.random.default_rng(seed)
+        sample = matrix
+        if len(matrix) > max_training_rows:
+            sample = matrix[rng.choice(len(matrix), max_training_rows, replace=False)]
+
+        index = cls(spherical_kmeans(sample, n_lists, seed=seed), n_probe)
+        index.add(matrix)
+
+        elapsed_time = time.time() - start_time
+        logger.info(
+            f"Built IVF index with {n_lists} lists over {len(matrix)} vectors in {elapsed_time:.2f} seconds"
+        )
+        return index
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    def add(self, vectors: np.ndarray) -> np.ndarray:
+        """Insert vectors without retraining, returning their ids"""
+        vectors = normalize_rows(np.atleast_2d(vectors))
+        return self._insert(vectors, assign(vectors, self.centroids))
+
+    def _insert(self, vectors: np.ndarray, assignments: np.ndarray) -> np.ndarray:
+        ids = np.arange(self.size, self.size + len(vectors))
+
+        # grow geometrically so repeated small inserts stay cheap
+        if self.size + len(vectors) > len(self.vectors):
+            capacity = max(self.size + len(vectors), 2 * len(self.vectors))
+            grown = np.empty((capacity, self.centroids.shape[1]), dtype=np.float32)
+            grown[: self.size] = self.vectors[: self.size]
+            self.vectors = grown
+        self.vectors[self.size : self.size + len(vectors)] = vectors
+        self.size += len(vectors)
+
+        # group the new ids by list with one sort instead of a mask per list
+        order = np.argsort(assignments, kind="stable")
+        bounds = np.cumsum(np.bincount(assignments, minlength=self.n_lists))
+        for list_id, group in enumerate(np.split(ids[order], bounds[:-1])):
+            if len(group):
+                self.lists[list_id] = np.concatenate([self.lists[list_id], group])
+        return ids
+
+    def search(
+        self, query: list[float] | np.ndarray, k: int = 10, n_probe: int | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Ids and scores of (approximately) the k most similar vectors, best first"""
+        n_probe = n_probe or self.n_probe
+        q = normalize_rows(query)
+
+        if n_probe >= self.n_lists:
+            return top_k(self.vectors[: self.size] @ q, k)
+
+        probed = np.argpartition(-(self.centroids @ q), n_probe - 1)[:n_probe]
+        candidates = np.concatenate([self.lists[i] for i in probed])
+        ids, scores = top_k(self.vectors[candidates] @ q, k)
+        return candidates[ids], scores
+
+    def save(self, path: str | Path) -> None:
+        """Write the index to a .npz file"""
+        assignments = np.empty(self.size, dtype=np.int64)
+        for list_id, ids in enumerate(self.lists):
+            assignments[ids] = list_id
+
+        np.savez(
+            path,
+            centroids=self.centroids,
+            vectors=self.vectors[: self.size],
+            assignments=assignments,
+            n_probe=np.array(self.n_probe),
+        )
+
+    @classmethod
+    def load(cls, path: str | Path) -> "IVFIndex":
+        with np.load(path, allow_pickle=False) as data:
+            index = cls(data["centroids"], int(data["n_probe"]))
+            index._insert(data["vectors"], data["assignments"])
+        return index
+
@@ -0,0 +1,81 @@
+import logging
+import time
+import numpy as np
+from dataclasses import dataclass
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer
+
+from config.constants import CLUSTER_TOP_TERMS, CLUSTER_LEGEND_TERMS
+
+logger = logging.getLogger(__name__)
+
+# Clusters are named by class-based TF-IDF: the documents of a cluster are treated as one
+# document, so a term scores high when it is frequent in that cluster and rare in the
+# others. Everything stays sparse, the clusters x terms matrix is summed from the
+# documents x terms counts with a sparse one-hot product.
+#   c-tf-idf(t, c) = tf(t, c) / words(c) * log(1 + A / f(t))
+# where A is the average number of words per cluster and f(t) the count of t overall.
+
+# - Grootendorst (2022). BERTopic: Neural topic modeling with a class-based TF-IDF procedure. https://arxiv.org/abs/2203.05794
+# - https://maartengr.github.io/BERTopic/getting_started/ctfidf/ctfidf.html
+
+
+@dataclass
+class Clustering:
+    """Cluster of every row (-1 is noise) and the top terms of every cluster"""
+
+    labels: np.ndarray
+    terms: dict[int, list[str]]
+
+    def name(self, cluster: int, n_terms: int = CLUSTER_LEGEND_TERMS) -> str:
+        """Legend entry of a cluster, e.g. "3: nurse, ward, patient" """
+        if cluster == -1 or not self.terms.get(cluster):
+            return str(cluster)
+        return f"{cluster}: {', '.join(self.terms[cluster][:n_terms])}"
+
+
+def class_tfidf(
+    documents: list[str], labels: np.ndarray, n_terms: int = CLUSTER_TOP_TERMS
+) -> dict[int, list[str]]:
+    """Top n_terms of every cluster by class-based TF-IDF, noise (-1) excluded"""
+    start_time = time.time()
+
+    labels = np.asarray(labels)
+    clustered = labels >= 0
+    clusters = np.unique(labels[clustered])
+    if not len(clusters):
+        return {}
+
+    vectorizer = CountVectorizer(stop_words="english", token_pattern=r"(?u)\b[a-zA-Z][a-zA-Z+#]+\b")
+    try:
+        counts = vectorizer.fit_transform([documents[i] for i in np.flatnonzero(clustered)])
+    except ValueError:
+        # only stop words or no words at all
+        return {int(cluster): [] for cluster in clusters}
+    vocabulary = vectorizer.get_feature_names_out()
+
+    # clusters x documents one-hot, so the product sums the counts of each cluster
+    rows = np.searchsorted(clusters, labels[clustered])
+    one_hot = sparse.csr_matrix(
+        (np.ones(len(rows)), (rows, np.arange(len(rows)))), shape=(len(clusters), len(rows))
+    )
+    class_counts = sparse.csr_matrix(one_hot @ counts, dtype=np.float64)
+
+    words = np.asarray(class_counts.sum(axis=1)).ravel()
+    frequency = np.asarray(class_counts.sum(axis=0)).ravel()
+    idf = np.log(1 + words.mean() / frequency)
+    tf = sparse.diags(1 / np.maximum(words, 1)) @ class_counts
+    scores = sparse.csr_matrix(tf @ sparse.diags(idf))
+
+    terms = {}
+    for i, cluster in enumerate(clusters):
+        start, end = scores.indptr[i], scores.indptr[i + 1]
+        row_scores, row_terms = scores.data[start:end], scores.indices[start:end]
+        # ties go to the term first in the vocabulary, so labels are stable across runs
+        order = np.lexsort((row_terms, -row_scores))[:n_terms]
+        terms[int(cluster)] = vocabulary[row_terms[order]].tolist()
+
+    elapsed_time = time.time() - start_time
+    logger.info(f"Labelled {len(clusters)} clusters with c-TF-IDF in {elapsed_time:.2f} seconds")
+
+    return terms
@@ -3,6 +3,7 @@ import streamlit as st
 import hdbscan
 import logging
 import time
+import numpy as np
 from sklearn.cluster import KMeans
 
 logger = logging.getLogger(__name__)
@@ -29,16 +30,17 @@ def cluster_kmeans(
 
 
 def cluster_hdbscan(
-    df: pd.DataFrame, col_name: str, min_cluster_size: int = 5
+    df: pd.DataFrame, col_name: str, min_cluster_size: int = 5, n_jobs: int = 4
 ) -> pd.DataFrame:
-    """Add HDBSCAN clusters to data"""
+    """Add HDBSCAN clusters to data, n_jobs=-1 computes core distances on every core"""
     logger.info(
         f"Starting HDBSCAN clustering on {len(df)} samples using {col_name} coordinates with min_cluster_size={min_cluster_size}"
     )
     start_time = time.time()
 
-    clusterer = hdbscan.HDBSCAN(min_cluster_size=min_cluster_size)
-    clusters = clusterer.fit_predict(df[[f"{col_name}1", f"{col_name}2"]])
+    clusters = hdbscan_labels(
+        df[[f"{col_name}1", f"{col_name}2"]].to_numpy(), min_cluster_size, n_jobs
+    )
     df["Cluster"] = clusters
 
     elapsed_time = time.time() - start_time
@@ -50,3 +52,13 @@ def cluster_hdbscan(
     logger.info(f"Cluster distribution: {pd.Series(clusters).value_counts().to_dict()}")
 
     return df
+
+
+def hdbscan_labels(
+    coordinates: np.ndarray, min_cluster_size: int = 5, n_jobs: int = 4
+) -> np.ndarray:
+    """HDBSCAN cluster of every row of the coordinates, -1 is noise"""
+    clusterer = hdbscan.HDBSCAN(
+        min_cluster_size=min_cluster_size, core_dist_n_jobs=n_jobs
+    )
+    return clusterer.fit_predict(coordinates)
@@ -4,9 +4,25 @@ import umap.umap_ as umap
 import logging
 import time
 from sklearn.decomposition import PCA
+from sklearn.pipeline import Pipeline, make_pipeline
+
+from config.constants import FAST_PCA_COMPONENTS
+
+from algorithms.semantic_search import embedding_matrix
 
 logger = logging.getLogger(__name__)
 
+# Visualization modes:
+#   - exact: UMAP on the full embeddings, seeded, which makes UMAP single threaded
+#   - fast: PCA to FAST_PCA_COMPONENTS first, then UMAP on all cores without a seed.
+#     Runs differ slightly, so the layout is made reproducible by caching it instead
+#     (see algorithms.projection).
+
+# - https://umap-learn.readthedocs.io/en/latest/reproducibility.html
+# - https://umap-learn.readthedocs.io/en/latest/faq.html#what-is-the-difference-between-pca-and-umap
+
+VISUALIZATION_MODES = ("exact", "fast")
+
 
 def pca_df(df: pd.DataFrame, col: str) -> pd.DataFrame:
     """Apply PCA dimensionality reduction"""
@@ -14,7 +30,7 @@ def pca_df(df: pd.DataFrame, col: str) -> pd.DataFrame:
     start_time = time.time()
 
     pca = PCA(n_components=2)
-    principal_components = pca.fit_transform(df[col].tolist())
+    principal_components = pca.fit_transform(embedding_matrix(df, col))
     pca_df = pd.DataFrame(principal_components, columns=["PC1", "PC2"])  # type: ignore
 
     elapsed_time = time.time() - start_time
@@ -24,21 +40,51 @@ def pca_df(df: pd.DataFrame, col: str) -> pd.DataFrame:
     return pd.concat([df, pca_df], axis=1)
 
 
-def umap_df(df: pd.DataFrame, col: str) -> pd.DataFrame:
-    """Apply UMAP dimensionality reduction using official parameters"""
-    # Based on https://umap-learn.readthedocs.io/en/latest/
-    logger.info(f"Starting UMAP dimensionality reduction on {len(df)} samples")
-    start_time = time.time()
+def make_umap(seeded: bool = True, knn: tuple | None = None) -> umap.UMAP:
+    """UMAP with the parameters every 2-D projection uses.
 
-    reducer = umap.UMAP(
+    knn is a precomputed (indices, distances, NNDescent index), see algorithms.knn_graph.
+    """
+    return umap.UMAP(
         n_components=2,
         n_neighbors=15,  # Default from documentation
         min_dist=0.1,  # Default from documentation
         metric="euclidean",  # Default metric
-        random_state=42,
+        # a seed forces a single thread
+        random_state=42 if seeded else None,
+        n_jobs=1 if seeded else -1,
+        precomputed_knn=knn or (None, None, None),
         verbose=False,
     )
-    umap_components = reducer.fit_transform(df[col].tolist())
+
+
+def make_pca(mode: str, n_samples: int, n_features: int) -> PCA | None:
+    """Unfitted pre-reduction of the visualization mode, None when there is none"""
+    match mode:
+        case "exact":
+            return None
+        case "fast":
+            return PCA(n_components=min(FAST_PCA_COMPONENTS, n_samples, n_features))
+        case _:
+            raise ValueError(f"Invalid visualization mode: {mode}")
+
+
+def make_reducer(mode: str, n_samples: int, n_features: int) -> umap.UMAP | Pipeline:
+    """Unfitted 2-D reducer of the visualization mode"""
+    pca = make_pca(mode, n_samples, n_features)
+    if pca is None:
+        return make_umap()
+    return make_pipeline(pca, make_umap(seeded=False))
+
+
+def umap_df(df: pd.DataFrame, col: str) -> pd.DataFrame:
+    """Apply UMAP dimensionality reduction using official parameters"""
+    # Based on https://umap-learn.readthedocs.io/en/latest/
+    logger.info(f"Starting UMAP dimensionality reduction on {len(df)} samples")
+    start_time = time.time()
+
+    reducer = make_umap()
+    umap_components = reducer.fit_transform(embedding_matrix(df, col))
     umap_df = pd.DataFrame(umap_components, columns=["UMAP1", "UMAP2"])  # type: ignore
 
     elapsed_time = time.time() - start_time
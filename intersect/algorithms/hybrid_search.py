@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+from config.constants import HYBRID_CANDIDATES, HYBRID_LEXICAL_WEIGHT, RRF_K
+from algorithms.lexical_index import LexicalIndexStore
+from algorithms.lexical_search import lexical_retrieve
+from algorithms.semantic_search import VectorIndex, embedding_matrix, rescore
+
+# First stage of a two stage search: the top n of BM25 and the top n of semantic search
+# are merged into one shortlist, which is all the (slow, paid) reranker gets to see.
+#   - rrf: reciprocal rank fusion, only uses the ranks so the score scales don't matter
+#   - weighted: min-max normalized scores over the shortlist, mixed with a weight
+
+# - Cormack, Clarke & Buettcher (2009). Reciprocal rank fusion outperforms Condorcet and individual rank learning methods.
+# - https://www.elastic.co/guide/en/elasticsearch/reference/current/rrf.html
+
+FUSION_METHODS = ("rrf", "weighted")
+
+
+def reciprocal_rank_fusion(
+    rankings: list[np.ndarray], k: int = RRF_K
+) -> tuple[np.ndarray, np.ndarray]:
+    """Ids in any of the rankings (best first) ordered by the sum of 1 / (k + rank)"""
+    ids = np.concatenate(rankings)
+    contributions = np.concatenate(
+        [1.0 / (k + np.arange(1, len(ranking) + 1)) for ranking in rankings]
+    )
+    candidates, inverse = np.unique(ids, return_inverse=True)
+    fused = np.bincount(inverse, weights=contributions, minlength=len(candidates))
+
+    order = np.argsort(-fused, kind="stable")
+    return candidates[order], fused[order]
+
+
+def min_max(scores: np.ndarray) -> np.ndarray:
+    spread = scores.max() - scores.min() if len(scores) else 0
+    if spread == 0:
+        return np.zeros_like(scores, dtype=np.float64)
+    return (scores - scores.min()) / spread
+
+
+def weighted_score_fusion(
+    candidates: np.ndarray, scores: list[np.ndarray], weights: list[float]
+) -> tuple[np.ndarray, np.ndarray]:
+    """Candidates ordered by the weighted sum of their normalized scores.
+
+    scores hold one score per candidate, in the candidates' order.
+    """
+    fused = sum(weight * min_max(s) for s, weight in zip(scores, weights))
+    fused = np.asarray(fused, dtype=np.float64)
+
+    order = np.argsort(-fused, kind="stable")
+    return candidates[order], fused[order]
+
+
+def hybrid_search(
+    query: str,
+    query_embedding: list[float] | np.ndarray,
+    df: pd.DataFrame,
+    corpus_col: str = "description",
+    n: int = HYBRID_CANDIDATES,
+    fusion: str = "rrf",
+    store: LexicalIndexStore | None = None,
+    lexical_weight: float = HYBRID_LEXICAL_WEIGHT,
+    index=None,
+    lexical: tuple[np.ndarray, np.ndarray] | None = None,
+    semantic_ids: np.ndarray | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Row ids and fused scores of the union of the lexical and semantic top n, best first.
+
+    The shortlist has between n and 2n rows, depending on how much the two agree.
+    index is any vector index over df's embeddings, exact search by default.
+
+    Rankings an earlier stage already made over df's rows are passed in instead of being
+    searched again: lexical as (ids best first, score of every row) and semantic_ids
+    best first. Only their top n are used.
+    """
+    if fusion not in FUSION_METHODS:
+        raise ValueError(f"Invalid fusion method: {fusion}")
+
+    if lexical is None:
+        lexical_ids, _, lexical_scores = lexical_retrieve(
+            query, df[corpus_col].tolist(), n, store, full=True
+        )
+    else:
+        lexical_ids, lexical_scores = lexical
+    lexical_ids = lexical_ids[:n]
+
+    if semantic_ids is None:
+        index = index if index is not None else VectorIndex.from_df(df)
+        semantic_ids, _ = index.search(query_embedding, n)
+    semantic_ids = semantic_ids[:n]
+
+    if fusion == "rrf":
+        return reciprocal_rank_fusion([lexical_ids, semantic_ids])
+
+    # an approximate index only scores its own top n, the shortlist is scored exactly
+    candidates = np.union1d(lexical_ids, semantic_ids)
+    return weighted_score_fusion(
+        candidates,
+        [
+            lexical_scores[candidates],  # type: ignore
+            rescore(embedding_matrix(df), candidates, query_embedding),
+        ],
+        [lexical_weight, 1 - lexical_weight],
+    )
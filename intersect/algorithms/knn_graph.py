@@ -0,0 +1,79 @@
+import logging
+import time
+import numpy as np
+from pynndescent import NNDescent
+
+from config.constants import KNN_NEIGHBORS
+
+logger = logging.getLogger(__name__)
+
+# One nearest neighbour graph over the jobs, built once per job set and shared by:
+#   - UMAP, as precomputed_knn, instead of searching for neighbours itself
+#   - "more jobs like this", which reads a job's row of the graph
+# The NNDescent index is kept with the graph, so new vectors (the user's text) are
+# queried against it and UMAP can still transform them.
+
+# Clusters are not found on the graph: the app clusters the 2-D UMAP coordinates (see
+# algorithms.projection), benchmarks.visualization compares the two.
+
+# - https://umap-learn.readthedocs.io/en/latest/precomputed_k-nn.html
+# - https://pynndescent.readthedocs.io/en/latest/how_to_use_pynndescent.html
+
+
+class KnnGraph:
+    """Nearest neighbours of every row, each row first in its own list at distance 0"""
+
+    def __init__(self, indices: np.ndarray, distances: np.ndarray, index: NNDescent):
+        self.indices = indices
+        self.distances = distances
+        self.index = index
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    @property
+    def n_neighbors(self) -> int:
+        return self.indices.shape[1]
+
+    @classmethod
+    def build(
+        cls, matrix: np.ndarray, n_neighbors: int = KNN_NEIGHBORS, seeded: bool = True
+    ) -> "KnnGraph":
+        """Euclidean graph, built as UMAP would build its own"""
+        logger.info(f"Building {n_neighbors}-NN graph on {len(matrix)} samples")
+        start_time = time.time()
+
+        n = len(matrix)
+        # numba can't compile NNDescent over a read-only array, such as a mapped feather
+        matrix = np.require(matrix, np.float32, ["C", "W"])
+        # a seed makes NNDescent single threaded, as it does UMAP
+        index = NNDescent(
+            matrix,
+            n_neighbors=min(n_neighbors, n),
+            metric="euclidean",
+            n_trees=min(64, 5 + int(round(n**0.5 / 20.0))),
+            n_iters=max(5, int(round(np.log2(n)))),
+            max_candidates=60,
+            random_state=42 if seeded else None,
+            n_jobs=1 if seeded else -1,
+            compressed=False,
+        )
+        indices, distances = index.neighbor_graph  # type: ignore
+
+        elapsed_time = time.time() - start_time
+        logger.info(f"k-NN graph built in {elapsed_time:.2f} seconds")
+        return cls(indices, distances, index)
+
+    def umap_knn(self) -> tuple[np.ndarray, np.ndarray, NNDescent]:
+        """The precomputed_knn argument of umap.UMAP"""
+        return self.indices, self.distances, self.index
+
+    def neighbors(self, row: int, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Rows and distances of the k nearest other rows, nearest first"""
+        keep = self.indices[row] != row
+        return self.indices[row][keep][:k], self.distances[row][keep][:k]
+
+    def query(self, vectors: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Rows and distances of the k nearest rows to each vector"""
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        return self.index.query(vectors, k=min(k, len(self)))
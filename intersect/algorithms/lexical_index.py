@@ -0,0 +1,424 @@
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+import bm25s
+import Stemmer
+import numpy as np
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from scipy import sparse
+
+from config.constants import (
+    LEXICAL_INDEX_DIR,
+    LEXICAL_INDEX_MEMORY_SIZE,
+    LEXICAL_INDEX_MAX_SAVED,
+    LEXICAL_MAX_SEGMENTS,
+    LEXICAL_COMPACT_RATIO,
+)
+from algorithms.semantic_search import top_k
+
+logger = logging.getLogger(__name__)
+
+# BM25 indexes that are built once and queried many times. A saved index is a directory
+# of .npy arrays (the sparse score matrix) plus the vocabulary, so it can be memory mapped
+# and only the columns of the query's tokens are read. Query time is tokenizing the query
+# and summing those columns.
+
+# Indexes are keyed by a hash of the corpus and the tokenizer settings, so a changed
+# dataset or tokenizer builds a new index instead of reading a stale one. Old corpora
+# are never asked for again, so the store keeps the most recently used ones only.
+
+# bm25s bakes idf and the average document length into its score matrix, so any change
+# to the corpus means rebuilding it. IncrementalLexicalIndex keeps raw term counts instead
+# and scores at query time, so appending or removing documents only touches the delta.
+
+# - https://github.com/xhluca/bm25s#saving-and-loading
+# - Kamphuis et al. (2020). Which BM25 Do You Mean? A Large-Scale Reproducibility Study of Scoring Variants.
+
+TOKENIZER_VERSION = "lower-en-stopwords-english-stemmer-v1"
+
+
+def preprocess_text(text: str) -> str:
+    text = text.lower()
+    # text = re.sub(r'[^a-z\s]', '', text)
+    return text
+
+
+@lru_cache(maxsize=None)
+def get_stemmer() -> Stemmer.Stemmer:
+    return Stemmer.Stemmer("english")
+
+
+def tokenize(texts: list[str]) -> list[list[str]]:
+    """Lowercase, split, drop stop words and stem"""
+    return bm25s.tokenize(
+        [preprocess_text(text) for text in texts],
+        stopwords="en",
+        stemmer=get_stemmer(),
+        return_ids=False,
+        show_progress=False,
+    )  # type: ignore
+
+
+def corpus_hash(corpus: list[str]) -> str:
+    """Identifies a corpus and the tokenizer settings its index was built with"""
+    digest = hashlib.md5(TOKENIZER_VERSION.encode("utf-8"))
+    for doc in corpus:
+        digest.update(doc.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class LexicalIndex:
+    """BM25 index over a fixed corpus, row i of the corpus is document i"""
+
+    def __init__(self, retriever: bm25s.BM25):
+        self.retriever = retriever
+
+    @classmethod
+    def build(cls, corpus: list[str]) -> "LexicalIndex":
+        start_time = time.time()
+
+        retriever = bm25s.BM25()
+        retriever.index(tokenize(corpus), show_progress=False)
+
+        elapsed_time = time.time() - start_time
+        logger.info(f"Built BM25 index over {len(corpus)} documents in {elapsed_time:.2f} seconds")
+        return cls(retriever)
+
+    def __len__(self) -> int:
+        return int(self.retriever.scores["num_docs"])
+
+    def save(self, path: str | Path) -> None:
+        self.retriever.save(str(path), show_progress=False)
+
+    @classmethod
+    def load(cls, path: str | Path, mmap: bool = True) -> "LexicalIndex":
+        return cls(bm25s.BM25.load(str(path), mmap=mmap, show_progress=False))
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of the query for every document, in row order"""
+        query_tokens = tokenize([query])[0]
+        # bm25s fails on an empty query, e.g. one made of stop words only
+        if not query_tokens:
+            return np.zeros(len(self), dtype=np.float32)
+        return self.retriever.get_scores(query_tokens)
+
+    def search(self, query: str, k: int = 10) -> tuple[np.ndarray, np.ndarray]:
+        """Row ids and scores of the k best documents, best first"""
+        return top_k(self.scores(query), k)
+
+
+class LexicalIndexStore:
+    """Saved BM25 indexes under root/<corpus hash>, memory mapped once per process.
+
+    Only the memory_size most recently used indexes stay mapped, and only the max_saved
+    most recently used stay on disk. A saved index's modification time is its last use.
+    """
+
+    def __init__(
+        self,
+        root: str | Path = LEXICAL_INDEX_DIR,
+        memory_size: int = LEXICAL_INDEX_MEMORY_SIZE,
+        max_saved: int = LEXICAL_INDEX_MAX_SAVED,
+    ):
+        self.root = Path(root)
+        self.memory_size = memory_size
+        self.max_saved = max_saved
+        self.indexes: OrderedDict[str, LexicalIndex] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, corpus: list[str]) -> LexicalIndex:
+        """Index of the corpus, loaded from disk or built and saved on first use"""
+        key = corpus_hash(corpus)
+        with self.lock:
+            if key in self.indexes:
+                self.indexes.move_to_end(key)
+                self._touch(key)
+                return self.indexes[key]
+
+            index = self._load_or_build(key, corpus)
+            self._keep(key, index)
+            return index
+
+    def load_all(self) -> int:
+        """Memory map the most recently used saved indexes, returns how many are loaded"""
+        with self.lock:
+            # oldest first, so the most recent end up last in the LRU order
+            for path in self._saved()[-self.memory_size :]:
+                if path.name not in self.indexes:
+                    self._keep(path.name, LexicalIndex.load(path))
+            return len(self.indexes)
+
+    def prune(self) -> int:
+        """Delete the least recently used saved indexes past max_saved, returns how many"""
+        stale = self._saved()[: -self.max_saved]
+        for path in stale:
+            # mapped files stay readable after they are unlinked
+            shutil.rmtree(path, ignore_errors=True)
+        if stale:
+            logger.info(f"Deleted {len(stale)} least recently used BM25 indexes")
+        return len(stale)
+
+    def _keep(self, key: str, index: LexicalIndex) -> None:
+        self.indexes[key] = index
+        if len(self.indexes) > self.memory_size:
+            self.indexes.popitem(last=False)
+
+    def _saved(self) -> list[Path]:
+        """Saved index directories, least recently used first"""
+        if not self.root.exists():
+            return []
+        paths = [
+            path
+            for path in self.root.iterdir()
+            if path.is_dir() and not path.name.startswith(".")
+        ]
+        return sorted(paths, key=lambda path: path.stat().st_mtime)
+
+    def _touch(self, key: str) -> None:
+        # the clock rather than the file system's timestamp granularity orders the uses
+        now = time.time_ns()
+        try:
+            os.utime(self.root / key, ns=(now, now))
+        except OSError:
+            # pruned by another process, it is saved again when next built
+            pass
+
+    def _load_or_build(self, key: str, corpus: list[str]) -> LexicalIndex:
+        path = self.root / key
+        if path.exists():
+            logger.info(f"Loading BM25 index {key}")
+            self._touch(key)
+            return LexicalIndex.load(path)
+
+        index = LexicalIndex.build(corpus)
+
+        # write next to the final path and rename, so readers never see half an index
+        tmp_path = self.root / f".{key}.{os.getpid()}.tmp"
+        self.root.mkdir(parents=True, exist_ok=True)
+        index.save(tmp_path)
+        try:
+            os.replace(tmp_path, path)
+        except OSError:
+            # another process saved the same index first
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        self._touch(key)
+        self.prune()
+
+        return LexicalIndex.load(path)
+
+
+class IncrementalLexicalIndex:
+    """BM25 (Lucene variant, as bm25s) over a corpus that documents are added to and removed from.
+
+    Each add appends a segment of term counts and updates the document frequencies and
+    lengths. Removed documents are tombstoned and subtracted from the statistics. Once
+    there are too many segments or tombstones everything is merged into one segment.
+    Document ids are handed out by add and stay the same across compactions.
+    """
+
+    def __init__(
+        self,
+        k1: float = 1.5,
+        b: float = 0.75,
+        max_segments: int = LEXICAL_MAX_SEGMENTS,
+        compact_ratio: float = LEXICAL_COMPACT_RATIO,
+    ):
+        self.k1 = k1
+        self.b = b
+        self.max_segments = max_segments
+        self.compact_ratio = compact_ratio
+
+        self.vocab: dict[str, int] = {}
+        self.segments: list[sparse.csc_matrix] = []  # documents x terms counts
+        self.offsets: list[int] = []  # first row of each segment
+        self.doc_ids = np.empty(0, dtype=np.int64)  # id of every row
+        self.lengths = np.empty(0, dtype=np.float32)
+        self.alive = np.empty(0, dtype=bool)
+        self.rows: dict[int, int] = {}  # id -> row, live documents only
+        self.df = np.empty(0, dtype=np.int64)
+        self.total_length = 0.0
+        self.next_id = 0
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @property
+    def n_rows(self) -> int:
+        return len(self.doc_ids)
+
+    @property
+    def avgdl(self) -> float:
+        return self.total_length / len(self) if len(self) else 0.0
+
+    def add(self, texts: list[str]) -> np.ndarray:
+        """Append documents, returning their ids"""
+        tokens = tokenize(texts)
+        for doc in tokens:
+            for token in doc:
+                self.vocab.setdefault(token, len(self.vocab))
+
+        rows = np.repeat(np.arange(len(tokens)), [len(doc) for doc in tokens])
+        cols = np.fromiter(
+            (self.vocab[token] for doc in tokens for token in doc), dtype=np.int64, count=len(rows)
+        )
+        # duplicate (row, col) pairs are summed into term counts
+        segment = sparse.csc_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+            shape=(len(tokens), len(self.vocab)),
+        )
+
+        self.df = np.pad(self.df, (0, len(self.vocab) - len(self.df)))
+        self.df += np.diff(segment.indptr)
+
+        ids = np.arange(self.next_id, self.next_id + len(tokens))
+        lengths = np.array([len(doc) for doc in tokens], dtype=np.float32)
+        self.rows.update(zip(ids.tolist(), range(self.n_rows, self.n_rows + len(tokens))))
+        self.offsets.append(self.n_rows)
+        self.segments.append(segment)
+        self.doc_ids = np.concatenate([self.doc_ids, ids])
+        self.lengths = np.concatenate([self.lengths, lengths])
+        self.alive = np.concatenate([self.alive, np.ones(len(tokens), dtype=bool)])
+        self.total_length += float(lengths.sum())
+        self.next_id += len(tokens)
+
+        self._maybe_compact()
+        return ids
+
+    def remove(self, ids: list[int] | np.ndarray) -> int:
+        """Tombstone documents, returning how many were live"""
+        rows = np.array(
+            sorted(self.rows.pop(int(i)) for i in ids if int(i) in self.rows), dtype=np.int64
+        )
+        if not len(rows):
+            return 0
+
+        # subtract the removed documents' terms from the document frequencies
+        bounds = self.offsets[1:] + [self.n_rows]
+        for segment, start, end in zip(self.segments, self.offsets, bounds):
+            local = rows[(rows >= start) & (rows < end)] - start
+            if len(local):
+                counts = np.diff(segment[local].tocsc().indptr)
+                self.df[: len(counts)] -= counts
+
+        self.alive[rows] = False
+        self.total_length -= float(self.lengths[rows].sum())
+
+        self._maybe_compact()
+        return len(rows)
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every row, tombstoned rows are -inf"""
+        scores = np.zeros(self.n_rows, dtype=np.float32)
+        terms = [self.vocab[token] for token in tokenize([query])[0] if token in self.vocab]
+
+        avgdl = self.avgdl or 1.0
+        idf = np.log(1 + (len(self) - self.df + 0.5) / (self.df + 0.5)).astype(np.float32)
+        norm = self.k1 * (1 - self.b + self.b * self.lengths / avgdl)
+
+        # repeated query tokens count once per occurrence, as in bm25s
+        for term, count in zip(*np.unique(np.array(terms, dtype=np.int64), return_counts=True)):
+            for segment, offset in zip(self.segments, self.offsets):
+                if term >= segment.shape[1]:
+                    continue
+                start, end = segment.indptr[term], segment.indptr[term + 1]
+                rows = segment.indices[start:end] + offset
+                tf = segment.data[start:end]
+                scores[rows] += count * idf[term] * tf / (tf + norm[rows])
+
+        scores[~self.alive] = -np.inf
+        return scores
+
+    def search(self, query: str, k: int = 10) -> tuple[np.ndarray, np.ndarray]:
+        """Ids and scores of the k best live documents, best first"""
+        rows, scores = top_k(self.scores(query), min(k, len(self)))
+        return self.doc_ids[rows], scores
+
+    def compact(self) -> None:
+        """Merge the segments into one and drop the tombstoned rows"""
+        start_time = time.time()
+
+        n_terms = len(self.vocab)
+        keep = np.flatnonzero(self.alive)
+        if self.segments:
+            merged = sparse.vstack([self._widen(segment, n_terms) for segment in self.segments])
+            self.segments = [sparse.csc_matrix(merged.tocsr()[keep])]
+            self.offsets = [0]
+        self.doc_ids = self.doc_ids[keep]
+        self.lengths = self.lengths[keep]
+        self.alive = np.ones(len(keep), dtype=bool)
+        self.rows = dict(zip(self.doc_ids.tolist(), range(len(keep))))
+
+        elapsed_time = time.time() - start_time
+        logger.info(f"Compacted BM25 index to {len(keep)} documents in {elapsed_time:.3f} seconds")
+
+    def _maybe_compact(self) -> None:
+        tombstones = self.n_rows - len(self)
+        if len(self.segments) > self.max_segments or (
+            tombstones and tombstones > self.compact_ratio * self.n_rows
+        ):
+            self.compact()
+
+    @staticmethod
+    def _widen(segment: sparse.csc_matrix, n_terms: int) -> sparse.csc_matrix:
+        """Add empty columns for terms first seen in later segments"""
+        extra = n_terms - segment.shape[1]
+        indptr = np.pad(segment.indptr, (0, extra), mode="edge")
+        return sparse.csc_matrix(
+            (segment.data, segment.indices, indptr), shape=(segment.shape[0], n_terms)
+        )
+
+    def save(self, path: str | Path) -> None:
+        """Compact and write the index to a .npz file"""
+        self.compact()
+        n_terms = len(self.vocab)
+        counts = (
+            self._widen(self.segments[0], n_terms)
+            if self.segments
+            else sparse.csc_matrix((0, n_terms), dtype=np.float32)
+        )
+        np.savez(
+            path,
+            data=counts.data,
+            indices=counts.indices,
+            indptr=counts.indptr,
+            doc_ids=self.doc_ids,
+            lengths=self.lengths,
+            vocab=np.array(list(self.vocab), dtype=str),
+            params=np.array([self.k1, self.b, self.next_id], dtype=np.float64),
+        )
+
+    @classmethod
+    def load(cls, path: str | Path, **kwargs) -> "IncrementalLexicalIndex":
+        with np.load(path, allow_pickle=False) as data:
+            k1, b, next_id = data["params"]
+            index = cls(k1=float(k1), b=float(b), **kwargs)
+            index.vocab = {token: i for i, token in enumerate(data["vocab"].tolist())}
+            index.doc_ids = data["doc_ids"]
+            index.lengths = data["lengths"]
+
+            n_docs = len(index.doc_ids)
+            counts = sparse.csc_matrix(
+                (data["data"], data["indices"], data["indptr"]), shape=(n_docs, len(index.vocab))
+            )
+
+        index.segments, index.offsets = [counts], [0]
+        index.alive = np.ones(n_docs, dtype=bool)
+        index.rows = dict(zip(index.doc_ids.tolist(), range(n_docs)))
+        index.df = np.diff(counts.indptr).astype(np.int64)
+        index.total_length = float(index.lengths.sum())
+        index.next_id = int(next_id)
+        return index
+
+
+@lru_cache(maxsize=None)
+def get_lexical_index_store() -> LexicalIndexStore:
+    """Shared store, the recently used saved indexes are memory mapped when it is first used"""
+    store = LexicalIndexStore()
+    logger.info(f"Loaded {store.load_all()} saved BM25 indexes")
+    return store
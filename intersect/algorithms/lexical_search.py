@@ -1,6 +1,9 @@
+import numpy as np
 import pandas as pd
-import bm25s
-import Stemmer
+
+from config.constants import LEXICAL_TOP_K
+from algorithms.lexical_index import LexicalIndex, LexicalIndexStore
+from algorithms.semantic_search import top_k
 
 # rank_bm25 is a somewhat popular python implementation of bm25. bm25s is a more performant alternative.
 
@@ -21,38 +24,48 @@ import Stemmer
 # even though the point of tf-idf and bm25 is to deal with this, we find that the word clouds are dominated by words that are too generic to be useful.
 
 
-def lexical_search(query: str, df: pd.DataFrame, corpus_col: str) -> pd.DataFrame:
-    """Side effects:
-        - adds "i_lexical": index (int),
-        - adds "score_lexical": score (float),
+def lexical_retrieve(
+    query: str,
+    corpus: list[str],
+    k: int = LEXICAL_TOP_K,
+    store: LexicalIndexStore | None = None,
+    full: bool = False,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray | None]:
+    """Row ids and scores of the k best documents, best first, and with full=True the
+    score of every document in row order (None otherwise).
 
-    Returns:
-        - df: pd.DataFrame with the added columns
+    Without a store the index is built in memory for this search only, with one it is
+    saved and reused by every search over the same corpus.
     """
+    index = store.get(corpus) if store is not None else LexicalIndex.build(corpus)
 
-    corpus = df[corpus_col].tolist()
+    # every document is scored, only the k best are sorted
+    scores = index.scores(query)
+    ids, top_scores = top_k(scores, k)
+    return ids, top_scores, scores if full else None
 
-    preprocessed_query = preprocess_text(query)
-    preprocessed_corpus = [preprocess_text(doc) for doc in corpus]
 
-    stemmer = Stemmer.Stemmer("english")
-    corpus_tokens = bm25s.tokenize(preprocessed_corpus, stopwords="en", stemmer=stemmer)
+def lexical_search(
+    query: str,
+    df: pd.DataFrame,
+    corpus_col: str,
+    store: LexicalIndexStore | None = None,
+    k: int = LEXICAL_TOP_K,
+) -> pd.DataFrame:
+    """Side effects:
+        - adds "i_lexical": rank (int) of the k best rows, <NA> for the rest,
+        - adds "score_lexical": score (float),
 
-    retriever = bm25s.BM25()
-    retriever.index(corpus_tokens)
+    Returns:
+        - df: pd.DataFrame with the added columns, rows in their original order
+    """
+
+    ids, _, scores = lexical_retrieve(query, df[corpus_col].tolist(), k, store, full=True)
 
-    query_tokens = bm25s.tokenize(preprocessed_query, stopwords="en", stemmer=stemmer)
-    results, scores = retriever.retrieve(query_tokens, corpus=preprocessed_corpus, k=len(corpus))
+    ranks = pd.array([pd.NA] * len(df), dtype="Int64")
+    ranks[ids] = np.arange(len(ids))
 
-    # Add scores directly to the original DataFrame
     df = df.copy()
-    df["score_lexical"] = scores[0]
-    df["i_lexical"] = range(len(df))
-    
+    df["score_lexical"] = scores
+    df["i_lexical"] = ranks
     return df
-
-
-def preprocess_text(text: str) -> str:
-    text = text.lower()
-    # text = re.sub(r'[^a-z\s]', '', text)
-    return text 
\ No newline at end of file
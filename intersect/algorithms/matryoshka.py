@@ -0,0 +1,47 @@
+import numpy as np
+
+from config.constants import MATRYOSHKA_DIMENSIONS, MATRYOSHKA_CANDIDATES
+from algorithms.semantic_search import normalize_rows, top_k
+
+# text-embedding-3 models are trained with matryoshka representation learning: the first
+# dimensions carry most of the meaning, so a truncated and renormalized vector is a good
+# cheap approximation of the full one. The first pass scans a 256-d copy of the corpus
+# and only the best candidates are rescored with all 1536 dimensions.
+
+# - Kusupati et al. (2022). Matryoshka Representation Learning. arXiv:2205.13147
+# - https://openai.com/index/new-embedding-models-and-api-updates/
+
+
+def truncate(matrix: np.ndarray, dimensions: int) -> np.ndarray:
+    """First `dimensions` of each row, renormalized to unit length"""
+    return np.ascontiguousarray(normalize_rows(np.asarray(matrix)[..., :dimensions]))
+
+
+class MatryoshkaIndex:
+    """Coarse-to-fine cosine search over truncated then full embeddings"""
+
+    def __init__(
+        self,
+        matrix: np.ndarray,
+        coarse_dimensions: int = MATRYOSHKA_DIMENSIONS,
+        candidates: int = MATRYOSHKA_CANDIDATES,
+    ):
+        self.full = np.ascontiguousarray(normalize_rows(matrix))
+        self.coarse_dimensions = coarse_dimensions
+        self.coarse = truncate(self.full, coarse_dimensions)
+        self.candidates = candidates
+
+    def __len__(self) -> int:
+        return len(self.full)
+
+    def search(
+        self, query: list[float] | np.ndarray, k: int = 10
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Ids and full dimensional scores of the k most similar rows, best first"""
+        q = normalize_rows(query)
+
+        coarse_scores = self.coarse @ truncate(q, self.coarse_dimensions)
+        candidates, _ = top_k(coarse_scores, max(self.candidates, k))
+
+        ids, scores = top_k(self.full[candidates] @ q, k)
+        return candidates[ids], scores
@@ -0,0 +1,140 @@
+import logging
+import re
+import time
+import bm25s
+import numpy as np
+
+from config.constants import PASSAGE_TOKENS, PASSAGE_TOKEN_BUDGET
+from algorithms.lexical_index import tokenize
+from algorithms.semantic_search import normalize_rows
+from utils.embedding_backends import EmbeddingBackend
+from utils.embedding_cache import embed_with_cache
+
+logger = logging.getLogger(__name__)
+
+# Rerankers and llms only need the parts of a description that relate to the user's
+# text. Each description is split into short passages, the passages are scored against
+# the query and the best ones are kept, in their original order, up to a token budget.
+
+# Descriptions have their newlines collapsed by preprocessing and sentences often run
+# into each other ("...EngineerLocation: London"), so sentences are also split where a
+# lowercase letter or full stop runs into a capitalised word.
+
+# - https://docs.cohere.com/docs/reranking-best-practices#long-documents
+# - https://arxiv.org/abs/2004.12832 (passage level evidence for document ranking)
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?;])\s+|(?<=[a-z.!?])(?=[A-Z][a-z])")
+PASSAGE_SEPARATOR = " … "
+PASSAGE_METHODS = ("bm25", "embedding")
+
+
+def estimate_tokens(text: str) -> int:
+    """About four characters per token, close enough for budgets"""
+    return len(text) // 4 + 1
+
+
+def split_passages(text: str, passage_tokens: int = PASSAGE_TOKENS) -> list[str]:
+    """Consecutive sentences packed into passages of at most passage_tokens"""
+    units = []
+    for sentence in SENTENCE_BOUNDARY.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if estimate_tokens(sentence) <= passage_tokens:
+            units.append(sentence)
+            continue
+        # run-on sentences are cut into word windows
+        words, window = sentence.split(), max(1, passage_tokens * 3 // 4)
+        units.extend(" ".join(words[i : i + window]) for i in range(0, len(words), window))
+
+    passages: list[str] = []
+    for unit in units:
+        if passages and estimate_tokens(passages[-1] + " " + unit) <= passage_tokens:
+            passages[-1] += " " + unit
+        else:
+            passages.append(unit)
+    return passages
+
+
+def select_passages(passages: list[str], scores: np.ndarray, budget: int) -> str:
+    """Best scoring passages that fit the budget, joined in document order"""
+    chosen, used = [], 0
+    # stable sort, so ties (e.g. no query words at all) keep the start of the document
+    for i in np.argsort(-scores, kind="stable").tolist():
+        cost = estimate_tokens(passages[i])
+        if used + cost <= budget:
+            chosen.append(i)
+            used += cost
+    return PASSAGE_SEPARATOR.join(passages[i] for i in sorted(chosen))
+
+
+def bm25_passage_scores(query: str, passages: list[str]) -> np.ndarray:
+    """BM25 of the query over the passages of every document together"""
+    query_tokens = tokenize([query])[0]
+    # bm25s fails on an empty query, e.g. one made of stop words only
+    if not query_tokens:
+        return np.zeros(len(passages), dtype=np.float32)
+    retriever = bm25s.BM25()
+    retriever.index(tokenize(passages), show_progress=False)
+    return retriever.get_scores(query_tokens)
+
+
+def embedding_passage_scores(
+    query_embedding: list[float] | np.ndarray, passages: list[str], backend: EmbeddingBackend
+) -> np.ndarray:
+    """Cosine similarity of every passage to the query embedding"""
+    # passages repeat across searches, so they go through the embedding cache
+    matrix = normalize_rows(np.array(embed_with_cache(passages, backend=backend)))
+    return matrix @ normalize_rows(query_embedding)
+
+
+def extract_passages(
+    query: str,
+    documents: list[str],
+    budget: int = PASSAGE_TOKEN_BUDGET,
+    method: str = "bm25",
+    query_embedding: list[float] | np.ndarray | None = None,
+    backend: EmbeddingBackend | None = None,
+    passage_tokens: int = PASSAGE_TOKENS,
+) -> list[str]:
+    """Each document shortened to its passages most relevant to the query.
+
+    Documents within the budget are returned unchanged. The embedding method needs the
+    query embedding and the backend that made it.
+    """
+    if method not in PASSAGE_METHODS:
+        raise ValueError(f"Invalid passage scoring method: {method}")
+
+    start_time = time.time()
+
+    long_docs = [i for i, doc in enumerate(documents) if estimate_tokens(doc) > budget]
+    if not long_docs:
+        return list(documents)
+
+    # passages no larger than the budget, so at least one always fits
+    passage_tokens = min(passage_tokens, budget)
+    split = [split_passages(documents[i], passage_tokens) for i in long_docs]
+    passages = [passage for doc_passages in split for passage in doc_passages]
+
+    if method == "bm25":
+        scores = bm25_passage_scores(query, passages)
+    else:
+        if query_embedding is None or backend is None:
+            raise ValueError("Embedding passage scoring needs query_embedding and backend")
+        scores = embedding_passage_scores(query_embedding, passages, backend)
+
+    extracted = list(documents)
+    start = 0
+    for i, doc_passages in zip(long_docs, split):
+        end = start + len(doc_passages)
+        extracted[i] = select_passages(doc_passages, scores[start:end], budget)
+        start = end
+
+    elapsed_time = time.time() - start_time
+    before = sum(estimate_tokens(documents[i]) for i in long_docs)
+    after = sum(estimate_tokens(extracted[i]) for i in long_docs)
+    logger.info(
+        f"Extracted passages from {len(long_docs)} documents ({before} -> {after} tokens) in {elapsed_time:.2f} seconds"
+    )
+
+    return extracted
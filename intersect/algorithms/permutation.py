@@ -1,8 +1,36 @@
-from rich import print
-import re
+import asyncio
 import json
-from openai import OpenAI
+import logging
+import re
+import time
 import pandas as pd
+from collections.abc import Callable
+from functools import lru_cache
+from openai import AsyncOpenAI
+from pathlib import Path
+from tenacity import (
+    AsyncRetrying,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+
+from config.constants import (
+    PASSAGE_TOKEN_BUDGET,
+    PERMUTATION_MODEL,
+    PERMUTATION_TOP_K,
+    PERMUTATION_WINDOW,
+    PERMUTATION_STEP,
+    PERMUTATION_PASSES,
+    PERMUTATION_MAX_CONCURRENCY,
+    PERMUTATION_MAX_ATTEMPTS,
+)
+from algorithms.passages import extract_passages
+from utils.async_embedding import is_retryable
+from utils.llm_cache import LLMCache, get_llm_cache
+from utils.utils import run_blocking
+
+logger = logging.getLogger(__name__)
 
 # https://plainenglish.io/blog/improving-rag-using-llms-as-re-ranking-agents
 # https://arxiv.org/abs/2304.09542
@@ -11,61 +39,345 @@ import pandas as pd
 # https://blog.reachsumit.com/posts/2023/12/prompting-llm-for-ranking/
 # https://cookbook.openai.com/examples/search_reranking_with_cross-encoders
 
+# Sliding window listwise ranking (RankGPT). The llm only ever sees a window of items,
+# labelled 1..window in the prompt, and answers with a permutation of those labels, so
+# mapping back to rows is a lookup into the window. A pass slides the window from the
+# bottom of the list to the top, step items at a time. Consecutive windows overlap, so
+# the best items of one window are ranked again in the next one up, and the best item
+# rises to the top in a single pass wherever it starts. Each window needs the result of
+# the one below it, so the calls of a pass are made one after the other.
 
-def build_prompt(query: str, snippets: str) -> list[dict]:
-    with open("intersect/data/prompt.txt", "r") as f:
-        content = f.read()
+# Responses are cached by prompt, and can be streamed: the ranking is a json list of
+# small objects, so each object can be parsed as soon as its closing brace arrives.
+# Partial rankings of every window are reported as they arrive, in every pass, so a
+# long list is shown reordering before the last pass has finished.
 
-    content = re.sub(r"{{query}}", query, content)
-    content = re.sub(r"{{variable}}", snippets, content)
+PROMPT_PATH = Path(__file__).parent.parent / "data" / "prompt.txt"
+PLACEHOLDERS = ("{{query}}", "{{variable}}")
 
-    return [
-        {"role": "user", "content": content},
-    ]
 
+@lru_cache(maxsize=None)
+def load_prompt(path: Path = PROMPT_PATH) -> tuple[str, ...]:
+    """The template read once and split around its placeholders"""
+    return tuple(re.split(r"({{query}}|{{variable}})", path.read_text()))
 
-def permutation_openai(query: str, df: pd.DataFrame, model="gpt-4o-mini", top_k=10):
 
-    client = OpenAI()
+def build_prompt(query: str, snippets: str) -> list[dict]:
+    values = dict(zip(PLACEHOLDERS, (query, snippets)))
+    content = "".join(values.get(part, part) for part in load_prompt())
+
+    return [
+        {"role": "user", "content": content},
+    ]
 
-    df = df.sort_values("i_relevance", ascending=False)
 
+def format_items(titles: list[str], descriptions: list[str]) -> str:
+    """Items labelled 1..n, the labels the llm answers with"""
     snippets = ""
-    for index, row in df[:top_k].iterrows():
+    for label, (title, description) in enumerate(zip(titles, descriptions), start=1):
         snippets += f"""
-            <item_{index}>
-                index: {row['i_relevance']}
-                title: {row["title"]}
-                description: {row["description"]}
-            </item_{index}>
+            <item_{label}>
+                index: {label}
+                title: {title}
+                description: {description}
+            </item_{label}>
                 """
+    return snippets
+
 
-    prompt = build_prompt(query, snippets)
-    completion = client.chat.completions.create(
-        model=model,
-        messages=prompt,  # type: ignore
-        temperature=0,
+def parse_permutation(response: str, n: int) -> list[int]:
+    """Positions 0..n-1 in the order the llm ranked them.
+
+    Labels that are missing from the response keep their relative order at the end,
+    repeated or unknown labels are ignored, so the result is always a permutation.
+    """
+    cleaned_text = re.sub(
+        r"<ranking_criteria>.*?</ranking_criteria>", "", response, flags=re.DOTALL
     )
+    match = re.search(r"\[.*\]", cleaned_text, flags=re.DOTALL)
 
-    results = completion.choices[0].message.content
+    ranked = []
+    try:
+        items = json.loads(match.group(0)) if match else []
+        items = sorted(items, key=lambda item: item.get("new_rank", len(items)))
+        ranked = [int(item["index"]) - 1 for item in items if "index" in item]
+    except (ValueError, TypeError, AttributeError):
+        logger.warning("Could not parse the permutation, keeping the window order")
 
-    if results is None:
-        raise Exception("No results")
+    order = list(dict.fromkeys(i for i in ranked if 0 <= i < n))
+    seen = set(order)
+    return order + [i for i in range(n) if i not in seen]
 
-    return postprocess_permutation(results)
 
+class PermutationStreamParser:
+    """Parses a permutation response as it streams in.
 
-def postprocess_permutation(response: str) -> pd.DataFrame:
+    feed returns True when new items were ranked. ranked holds the positions seen so
+    far, in the order the llm wrote them.
+    """
 
-    cleaned_text = re.sub(
-        r"<ranking_criteria>.*?</ranking_criteria>", "", response, flags=re.DOTALL
-    )
+    CRITERIA_OPEN = "<ranking_criteria>"
+    CRITERIA_CLOSE = "</ranking_criteria>"
+
+    def __init__(self, n: int):
+        self.n = n
+        self.text = ""
+        self.ranked: list[int] = []
+        self.pos: int | None = None  # scan position inside the json list
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.object_start = 0
+
+    def feed(self, chunk: str) -> bool:
+        self.text += chunk
+        if self.pos is None:
+            self.pos = self._list_start()
+            if self.pos is None:
+                return False
+
+        found = len(self.ranked)
+        while self.pos < len(self.text):
+            char = self.text[self.pos]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char == "{":
+                if self.depth == 0:
+                    self.object_start = self.pos
+                self.depth += 1
+            elif char == "}":
+                self.depth -= 1
+                if self.depth == 0:
+                    self._add(self.text[self.object_start : self.pos + 1])
+            self.pos += 1
+        return len(self.ranked) > found
+
+    def _list_start(self) -> int | None:
+        # the list comes after the analysis, which may itself contain brackets
+        close = self.text.rfind(self.CRITERIA_CLOSE)
+        start = close + len(self.CRITERIA_CLOSE) if close != -1 else 0
+        if self.CRITERIA_OPEN in self.text[start:]:
+            return None
+        bracket = self.text.find("[", start)
+        return bracket + 1 if bracket != -1 else None
+
+    def _add(self, item_text: str) -> None:
+        try:
+            position = int(json.loads(item_text)["index"]) - 1
+        except (ValueError, TypeError, KeyError):
+            return
+        if 0 <= position < self.n and position not in self.ranked:
+            self.ranked.append(position)
+
+
+def sliding_windows(n: int, window: int, step: int) -> list[tuple[int, int]]:
+    """[start, end) windows from the bottom of n items to the top, step items apart"""
+    windows = []
+    end = n
+    while True:
+        start = max(0, end - window)
+        windows.append((start, end))
+        if start == 0:
+            return windows
+        end -= step
+
+
+class SlidingWindowRanker:
+    """Listwise llm ranking of lists of any length with overlapping sliding windows"""
+
+    def __init__(
+        self,
+        client: AsyncOpenAI | None = None,
+        model: str = PERMUTATION_MODEL,
+        window: int = PERMUTATION_WINDOW,
+        step: int = PERMUTATION_STEP,
+        passes: int = PERMUTATION_PASSES,
+        max_concurrency: int = PERMUTATION_MAX_CONCURRENCY,
+        max_attempts: int = PERMUTATION_MAX_ATTEMPTS,
+        cache: LLMCache | None = None,
+        stream: bool = False,
+    ):
+        if not 0 < step < window:
+            raise ValueError(f"Step must be between 0 and the window size, got {step}")
+
+        # retries are handled here, with backoff shared by every window
+        self.client = client or AsyncOpenAI(max_retries=0)
+        self.cache = cache
+        self.stream = stream
+        self.model = model
+        self.window = window
+        self.step = step
+        self.passes = passes
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_attempts = max_attempts
+
+    async def rank(
+        self,
+        query: str,
+        titles: list[str],
+        descriptions: list[str],
+        on_update: Callable[[list[int]], None] | None = None,
+    ) -> list[int]:
+        """Positions of the items, best first.
+
+        on_update is called with the order of every item each time the current window
+        ranks more of its items, as the responses stream in.
+        """
+        start_time = time.time()
+
+        order = list(range(len(titles)))
+        # a single window is final after one call
+        passes = 1 if len(order) <= self.window else self.passes
+
+        calls = 0
+        for _ in range(passes):
+            for start, end in sliding_windows(len(order), self.window, self.step):
+                if end - start < 2:
+                    continue
+                ranked_window = order[start:end]
+                permutation = await self._rank_window(
+                    query,
+                    [titles[j] for j in ranked_window],
+                    [descriptions[j] for j in ranked_window],
+                    self._window_update(order, start, end, on_update),
+                )
+                order[start:end] = [ranked_window[j] for j in permutation]
+                calls += 1
+
+        elapsed_time = time.time() - start_time
+        logger.info(
+            f"Ranked {len(order)} items with {calls} llm calls in {elapsed_time:.2f} seconds"
+        )
+
+        return order
+
+    @staticmethod
+    def _window_update(
+        current: list[int],
+        start: int,
+        end: int,
+        on_update: Callable[[list[int]], None] | None,
+    ) -> Callable[[list[int]], None] | None:
+        """Callback of one window, writing its partial ranking into the whole order"""
+        if on_update is None:
+            return None
+        window = current[start:end]
+
+        def update(positions: list[int]) -> None:
+            # items not ranked yet keep their place at the end of the window
+            seen = set(positions)
+            rest = [j for j in range(len(window)) if j not in seen]
+            current[start:end] = [window[j] for j in positions + rest]
+            on_update(list(current))
+
+        return update
+
+    async def _rank_window(
+        self,
+        query: str,
+        titles: list[str],
+        descriptions: list[str],
+        on_update: Callable[[list[int]], None] | None = None,
+    ) -> list[int]:
+        messages = build_prompt(query, format_items(titles, descriptions))
+
+        results = self.cache.get(self.model, messages) if self.cache is not None else None
+        if results is None:
+            retrying = AsyncRetrying(
+                retry=retry_if_exception(is_retryable),
+                wait=wait_random_exponential(multiplier=0.5, max=30),
+                stop=stop_after_attempt(self.max_attempts),
+                before_sleep=lambda state: logger.warning(
+                    f"Permutation request failed ({state.outcome.exception()}), retrying"  # type: ignore
+                ),
+                reraise=True,
+            )
+
+            async for attempt in retrying:
+                with attempt:
+                    async with self.semaphore:
+                        results = await self._complete(messages, len(titles), on_update)
+
+            if self.cache is not None:
+                self.cache.put(self.model, messages, results)  # type: ignore
+
+        permutation = parse_permutation(results, len(titles))  # type: ignore
+        if on_update is not None:
+            on_update(permutation)
+        return permutation
+
+    async def _complete(
+        self,
+        messages: list[dict],
+        n: int,
+        on_update: Callable[[list[int]], None] | None = None,
+    ) -> str:
+        if not self.stream:
+            completion = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,  # type: ignore
+                temperature=0,
+            )
+            results = completion.choices[0].message.content
+            if results is None:
+                raise Exception("No results")
+            return results
+
+        parser = PermutationStreamParser(n)
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,  # type: ignore
+            temperature=0,
+            stream=True,
+        )
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta and parser.feed(delta) and on_update is not None:
+                on_update(list(parser.ranked))
+
+        if not parser.text:
+            raise Exception("No results")
+        return parser.text
+
+
+def permutation_openai(
+    query: str,
+    df: pd.DataFrame,
+    model=PERMUTATION_MODEL,
+    top_k=PERMUTATION_TOP_K,
+    passage_budget=PASSAGE_TOKEN_BUDGET,
+    on_update: Callable[[list[int]], None] | None = None,
+    **ranker_kwargs,
+) -> pd.DataFrame:
+    """Reorders the first top_k rows by llm judgement and adds "i_permutation".
+
+    Expects df ordered by an earlier stage, rows past top_k keep their place after them.
+    Responses are cached unless cache=None is passed. on_update gets the order of the
+    first top_k row positions each time a window is ranked, or with stream=True, each
+    time a window ranks another item.
+    """
+    ranker_kwargs.setdefault("cache", get_llm_cache())
+    head = df.iloc[:top_k]
+
+    # only the parts of each description that relate to the query go in the prompt
+    descriptions = head["description"].tolist()
+    if passage_budget:
+        descriptions = extract_passages(query, descriptions, passage_budget)
+
+    async def run() -> list[int]:
+        # the client is bound to the event loop that creates it
+        ranker = SlidingWindowRanker(model=model, **ranker_kwargs)
+        return await ranker.rank(query, head["title"].tolist(), descriptions, on_update)
 
-    cleaned_text = re.sub("new_rank", "i_permutation", cleaned_text)
-    cleaned_text = re.sub("index", "i_relevance", cleaned_text)
-    
-    data = json.loads(cleaned_text.strip())
-    df = pd.DataFrame(data)
-    df = df.sort_values("i_permutation")
+    order = run_blocking(run)
 
-    return df 
\ No newline at end of file
+    df = pd.concat([head.iloc[order], df.iloc[top_k:]])
+    df["i_permutation"] = range(len(df))
+    return df
@@ -0,0 +1,277 @@
+import joblib
+import logging
+import os
+import shutil
+import threading
+import time
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+
+from config.constants import PROJECTION_DIR, PROJECTION_MEMORY_SIZE, PROJECTION_MAX_SAVED
+from algorithms.dimensionality_reduction import make_pca, make_umap
+from algorithms.semantic_search import matrix_hash
+from algorithms.knn_graph import KnnGraph
+from algorithms.clustering import hdbscan_labels
+from algorithms.cluster_labels import Clustering, class_tfidf
+from utils.utils import add_you
+
+logger = logging.getLogger(__name__)
+
+# Placing the user's text on the cluster chart used to refit UMAP over every job plus
+# that one row. The layout of the jobs doesn't depend on the user's text, so UMAP is fit
+# once per job set and the user's vector is placed with transform, which only embeds the
+# new point against the fitted graph.
+
+# Job sets are identified by the hash of their embedding matrix. Static datasets keep
+# their fitted model on disk; Reed results are kept in memory, so searching the same
+# keywords again reuses the fit while new results fall back to fitting. Sampled datasets
+# make a new job set on most searches, so both are bounded to the most recently used. Fast mode fits
+# are not seeded, so caching them is also what makes their layout reproducible.
+
+# The k-NN graph UMAP is fitted on is kept with the projection for "more jobs like this"
+# (see algorithms.knn_graph). In fast mode it is built on the PCA reduction, which is what
+# UMAP sees. Clusters and their c-TF-IDF names are computed on first use and kept (and
+# saved) with the projection too, so reruns reuse them.
+
+# Clusters are found by HDBSCAN on the 2-D coordinates. On the graph's distances it
+# marked most rows of the bundled datasets as noise (139 of 188 law jobs, against 55 on
+# the layout), see benchmarks.visualization for the comparison.
+
+# - https://umap-learn.readthedocs.io/en/latest/transform.html
+
+
+class Projection:
+    """A reducer fitted on a job set, the 2-D coordinates of its jobs and their k-NN graph"""
+
+    def __init__(
+        self,
+        reducer,
+        coordinates: np.ndarray,
+        graph: KnnGraph,
+        pca=None,
+        clustering: Clustering | None = None,
+    ):
+        self.reducer = reducer
+        self.coordinates = coordinates
+        self.graph = graph
+        self.pca = pca
+        self.clustering = clustering
+
+    def __len__(self) -> int:
+        return len(self.coordinates)
+
+    @classmethod
+    def fit(cls, matrix: np.ndarray, mode: str = "exact") -> "Projection":
+        logger.info(f"Fitting {mode} UMAP projection on {len(matrix)} samples")
+        start_time = time.time()
+
+        pca = make_pca(mode, *matrix.shape)
+        reduced = pca.fit_transform(matrix) if pca is not None else matrix
+
+        # unseeded fits run on every core, their layout is made reproducible by the store
+        seeded = mode == "exact"
+        graph = KnnGraph.build(reduced, seeded=seeded)
+        reducer = make_umap(seeded, graph.umap_knn())
+        coordinates = reducer.fit_transform(reduced)
+
+        elapsed_time = time.time() - start_time
+        logger.info(f"{mode.capitalize()} UMAP projection fitted in {elapsed_time:.2f} seconds")
+        return cls(reducer, np.asarray(coordinates, dtype=np.float32), graph, pca)
+
+    def reduce(self, vectors: np.ndarray | list) -> np.ndarray:
+        """Vectors in the space the graph and UMAP were fitted in"""
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        return self.pca.transform(vectors) if self.pca is not None else vectors
+
+    def transform(self, vectors: np.ndarray | list) -> np.ndarray:
+        """Coordinates of new vectors in the fitted layout"""
+        start_time = time.time()
+
+        vectors = self.reduce(vectors)
+        coordinates = self.reducer.transform(vectors)
+
+        elapsed_time = time.time() - start_time
+        logger.info(f"Placed {len(vectors)} points with UMAP transform in {elapsed_time:.2f} seconds")
+        return np.asarray(coordinates, dtype=np.float32)
+
+    def cluster(
+        self, documents: list[str], min_cluster_size: int = 5, n_jobs: int = 4
+    ) -> Clustering:
+        """HDBSCAN clusters of the coordinates named by c-TF-IDF, computed once per projection.
+
+        documents are the texts of the rows, in the order the projection was fitted on.
+        """
+        if self.clustering is None:
+            labels = hdbscan_labels(self.coordinates, min_cluster_size, n_jobs)
+            self.clustering = Clustering(labels, class_tfidf(documents, labels))
+        return self.clustering
+
+    def save(self, path: str | Path) -> None:
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        # one file, as the reducer and the graph share the NNDescent index
+        joblib.dump(
+            {"reducer": self.reducer, "graph": self.graph, "pca": self.pca},
+            path / "projection.joblib",
+        )
+        np.save(path / "coordinates.npy", self.coordinates)
+        if self.clustering is not None:
+            self.save_clustering(path)
+
+    def save_clustering(self, path: str | Path) -> None:
+        """Add the clustering to a saved projection"""
+        path = Path(path)
+        tmp_path = path / f".clustering.{os.getpid()}.tmp"
+        joblib.dump(self.clustering, tmp_path)
+        # not clustering.joblib, which held clusters of the graph
+        os.replace(tmp_path, path / "clusters.joblib")
+
+    @classmethod
+    def load(cls, path: str | Path) -> "Projection":
+        path = Path(path)
+        fitted = joblib.load(path / "projection.joblib")
+        clustering_path = path / "clusters.joblib"
+        return cls(
+            fitted["reducer"],
+            np.load(path / "coordinates.npy"),
+            fitted["graph"],
+            fitted["pca"],
+            joblib.load(clustering_path) if clustering_path.exists() else None,
+        )
+
+
+class ProjectionStore:
+    """Fitted projections by job set, under root/<mode>-<matrix hash> and in memory.
+
+    Only the memory_size most recently used projections stay in memory, and only the
+    max_saved most recently used stay on disk. With root=None nothing is written to disk.
+    """
+
+    def __init__(
+        self,
+        root: str | Path | None = PROJECTION_DIR,
+        memory_size: int = PROJECTION_MEMORY_SIZE,
+        max_saved: int = PROJECTION_MAX_SAVED,
+    ):
+        self.root = Path(root) if root is not None else None
+        self.memory_size = memory_size
+        self.max_saved = max_saved
+        self.projections: OrderedDict[str, Projection] = OrderedDict()
+        self.lock = threading.Lock()
+        self.fits = 0
+
+    def get(self, matrix: np.ndarray, mode: str = "exact") -> Projection:
+        """Projection of the job set, loaded from memory or disk, or fitted on first use"""
+        return self._get(f"{mode}-{matrix_hash(matrix)}", matrix, mode)
+
+    def _get(self, key: str, matrix: np.ndarray, mode: str) -> Projection:
+        with self.lock:
+            if key in self.projections:
+                self.projections.move_to_end(key)
+                self._touch(key)
+                return self.projections[key]
+
+            projection = self._load_or_fit(key, matrix, mode)
+            self.projections[key] = projection
+            if len(self.projections) > self.memory_size:
+                self.projections.popitem(last=False)
+            return projection
+
+    def cluster(
+        self, matrix: np.ndarray, documents: list[str], mode: str = "exact"
+    ) -> tuple[Projection, Clustering]:
+        """The projection of get and its named clusters, saved with it the first time"""
+        key = f"{mode}-{matrix_hash(matrix)}"
+        projection = self._get(key, matrix, mode)
+        with self.lock:
+            if projection.clustering is not None:
+                return projection, projection.clustering
+
+            clustering = projection.cluster(documents, n_jobs=-1 if mode == "fast" else 4)
+            path = self.root / key if self.root is not None else None
+            if path is not None and path.exists():
+                projection.save_clustering(path)
+            return projection, clustering
+
+    def prune(self) -> int:
+        """Delete the least recently used saved projections past max_saved, returns how many"""
+        stale = self._saved()[: -self.max_saved]
+        for path in stale:
+            shutil.rmtree(path, ignore_errors=True)
+        if stale:
+            logger.info(f"Deleted {len(stale)} least recently used UMAP projections")
+        return len(stale)
+
+    def _saved(self) -> list[Path]:
+        """Saved projection directories, least recently used first"""
+        if self.root is None or not self.root.exists():
+            return []
+        paths = [
+            path
+            for path in self.root.iterdir()
+            if path.is_dir() and not path.name.startswith(".")
+        ]
+        return sorted(paths, key=lambda path: path.stat().st_mtime)
+
+    def _touch(self, key: str) -> None:
+        if self.root is None:
+            return
+        # the clock rather than the file system's timestamp granularity orders the uses
+        now = time.time_ns()
+        try:
+            os.utime(self.root / key, ns=(now, now))
+        except OSError:
+            # pruned by another process, or not saved
+            pass
+
+    def _load_or_fit(self, key: str, matrix: np.ndarray, mode: str) -> Projection:
+        path = self.root / key if self.root is not None else None
+        if path is not None and path.exists():
+            logger.info(f"Loading UMAP projection {key}")
+            self._touch(key)
+            return Projection.load(path)
+
+        projection = Projection.fit(matrix, mode)
+        self.fits += 1
+        if path is None:
+            return projection
+
+        # write next to the final path and rename, so readers never see half a model
+        tmp_path = path.parent / f".{key}.{os.getpid()}.tmp"
+        projection.save(tmp_path)
+        try:
+            os.replace(tmp_path, path)
+        except OSError:
+            # another process saved the same projection first
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        self._touch(key)
+        self.prune()
+        return projection
+
+
+def project_with_you(
+    df: pd.DataFrame,
+    input_text: str,
+    input_embedding: list[float] | np.ndarray,
+    projection: Projection,
+) -> pd.DataFrame:
+    """df with UMAP1/UMAP2 columns and a "Your text" row placed by transform, as umap_df(add_you(df)).
+
+    projection is the store's projection of df's embeddings.
+    """
+    you = projection.transform(input_embedding)[0]
+
+    df = add_you(df.reset_index(drop=True), input_text, input_embedding)  # type: ignore
+    coordinates = np.vstack([projection.coordinates, you])
+    df["UMAP1"] = coordinates[:, 0]
+    df["UMAP2"] = coordinates[:, 1]
+    return df
+
+
+@lru_cache(maxsize=None)
+def get_projection_store(persist: bool = True) -> ProjectionStore:
+    """One store per process; persist=False keeps projections in memory only"""
+    return ProjectionStore(PROJECTION_DIR if persist else None)
@@ -0,0 +1,86 @@
+import numpy as np
+
+from config.constants import QUANTIZED_RESCORE_FACTOR
+from algorithms.semantic_search import normalize_rows, rescore, top_k
+
+# Compressed copies of the corpus embeddings for the first pass of semantic search.
+# Candidates are found on the compressed vectors and only the best k * rescore_factor
+# are rescored against the full precision vectors, which can stay memory mapped on disk.
+#   - float16: half the memory of float32
+#   - int8: symmetric per-dimension scalar quantization, a quarter of float32
+#   - binary: one sign bit per dimension compared with hamming distance, 1/32 of float32
+
+# - https://huggingface.co/blog/embedding-quantization
+# - https://www.mixedbread.ai/blog/binary-mrl
+
+QUANTIZATION_METHODS = ("float16", "int8", "binary")
+
+
+class QuantizedIndex:
+    """Approximate cosine search on quantized embeddings with full precision rescoring"""
+
+    def __init__(
+        self,
+        matrix: np.ndarray,
+        method: str = "int8",
+        rescore_factor: int = QUANTIZED_RESCORE_FACTOR,
+        chunk_size: int = 65536,
+    ):
+        if method not in QUANTIZATION_METHODS:
+            raise ValueError(f"Invalid quantization method: {method}")
+
+        self.full = matrix
+        self.method = method
+        self.rescore_factor = rescore_factor
+        self.chunk_size = chunk_size
+
+        normalized = normalize_rows(matrix)
+        if method == "float16":
+            self.codes = normalized.astype(np.float16)
+        elif method == "int8":
+            self.scale = np.abs(normalized).max(axis=0) / 127
+            self.scale[self.scale == 0] = 1
+            self.codes = np.round(normalized / self.scale).astype(np.int8)
+        else:
+            self.codes = np.packbits(normalized > 0, axis=1)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the quantized codes"""
+        return self.codes.nbytes
+
+    def approximate_scores(self, query: list[float] | np.ndarray) -> np.ndarray:
+        """Scores on the quantized vectors, higher is more similar"""
+        q = normalize_rows(query)
+        scores = np.empty(len(self.codes), dtype=np.float32)
+
+        if self.method == "binary":
+            # hamming distance: popcount of the bits that differ from the query's signs
+            q_bits = np.packbits(q > 0)
+            for i in range(0, len(self.codes), self.chunk_size):
+                chunk = self.codes[i : i + self.chunk_size]
+                distance = np.bitwise_count(chunk ^ q_bits).sum(axis=1, dtype=np.int32)
+                scores[i : i + self.chunk_size] = -distance
+            return scores
+
+        # float16 and int8 are widened a chunk at a time, numpy has no int8 matmul
+        q = q * self.scale if self.method == "int8" else q
+        for i in range(0, len(self.codes), self.chunk_size):
+            chunk = self.codes[i : i + self.chunk_size].astype(np.float32)
+            scores[i : i + self.chunk_size] = chunk @ q
+        return scores
+
+    def search(
+        self, query: list[float] | np.ndarray, k: int = 10
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Ids and full precision scores of the k most similar rows, best first"""
+        candidates, _ = top_k(self.approximate_scores(query), k * self.rescore_factor)
+
+        # sorted ids read a memory mapped full precision matrix in file order
+        candidates = np.sort(candidates)
+        full_scores = rescore(self.full, candidates, query)
+        ids, scores = top_k(full_scores, k)
+        return candidates[ids], scores
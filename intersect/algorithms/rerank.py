@@ -1,7 +1,13 @@
-import cohere
-import os
+import logging
 import pandas as pd
 
+from config.constants import RERANK_MAX_CANDIDATES, PASSAGE_TOKEN_BUDGET
+from algorithms.passages import extract_passages
+from algorithms.rerank_backends import RerankBackend, get_rerank_backend
+from utils.embedding_cache import content_hash
+from utils.rerank_cache import RerankCache, get_rerank_cache
+
+logger = logging.getLogger(__name__)
 
 # -   https://docs.cohere.com/docs/reranking-best-practices
 # -   https://osanseviero.github.io/hackerllama/blog/posts/sentence_embeddings2conclusion
@@ -10,25 +16,62 @@ import pandas as pd
 # -   cohere supports reranking for structured data
 
 
-def rerank_cohere(query: str, _df: pd.DataFrame) -> pd.DataFrame:
-    API_KEY = os.environ["COHERE_API_KEY"]
-    MODEL_NAME = "rerank-v3.5"
+def rerank_df(
+    query: str,
+    _df: pd.DataFrame,
+    backend: RerankBackend | None = None,
+    cache: RerankCache | None = None,
+    max_candidates: int = RERANK_MAX_CANDIDATES,
+    passage_budget: int = PASSAGE_TOKEN_BUDGET,
+) -> pd.DataFrame:
+    """Adds "score_reranker" to the first max_candidates rows, None for the rest.
 
-    docs = _df["description"].tolist()
-    co = cohere.Client(API_KEY)
+    Expects a shortlist ordered by an earlier stage. Only documents without a cached
+    score are sent to the backend, the RERANK_BACKEND one by default, and only their
+    passages most relevant to the query when passage_budget is set.
+    """
+    if backend is None:
+        backend = get_rerank_backend()
+    if cache is None:
+        cache = get_rerank_cache(backend.model)
+    if len(_df) > max_candidates:
+        logger.warning(f"Reranking the first {max_candidates} of {len(_df)} rows")
 
-    response = co.rerank(
-        query=query,
-        model=MODEL_NAME,
-        documents=docs,
-        # top_n=top_n,
+    candidates = _df.head(max_candidates)
+    docs = candidates["description"].tolist()
+    # postings are keyed by intersect_id, anything else by its text
+    doc_ids = (
+        candidates["intersect_id"].tolist()
+        if "intersect_id" in candidates.columns
+        else [content_hash(doc) for doc in docs]
     )
 
-    # Create a mapping of description to score
-    score_mapping = {}
-    for result in response.results:
-        score_mapping[result.index] = result.relevance_score
+    # scores of whole documents and of their passages are cached apart
+    scores = cache.get_many(query, doc_ids, passage_budget)
+    misses = {doc_id: doc for doc_id, doc in zip(doc_ids, docs) if doc_id not in scores}
+    logger.info(f"Rerank cache: {len(scores)} hits, {len(misses)} misses")
+
+    if misses:
+        if passage_budget:
+            misses = dict(
+                zip(misses.keys(), extract_passages(query, list(misses.values()), passage_budget))
+            )
+        new_scores = backend.rerank(query, misses)
+        cache.put_many(query, new_scores, passage_budget)
+        scores.update(new_scores)
 
-    # Add the score_reranker column to the original dataframe
-    _df["score_reranker"] = _df.index.map(score_mapping)
+    # Add the score_reranker column to the original dataframe, in row order
+    _df["score_reranker"] = [scores.get(doc_id) for doc_id in doc_ids] + [None] * (
+        len(_df) - len(candidates)
+    )
     return _df
+
+
+def rerank_cohere(
+    query: str,
+    _df: pd.DataFrame,
+    cache: RerankCache | None = None,
+    max_candidates: int = RERANK_MAX_CANDIDATES,
+) -> pd.DataFrame:
+    """rerank_df with Cohere, whatever RERANK_BACKEND says"""
+    return rerank_df(query, _df, get_rerank_backend("cohere"), cache, max_candidates)
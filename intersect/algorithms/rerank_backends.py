@@ -0,0 +1,305 @@
+import asyncio
+import cohere
+import httpx
+import logging
+import os
+import re
+import threading
+import time
+import numpy as np
+from abc import ABC, abstractmethod
+from cohere.core import ApiError
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from tenacity import (
+    AsyncRetrying,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+
+from config.constants import (
+    RERANK_BACKEND,
+    RERANK_MODEL,
+    RERANK_MAX_BATCH_SIZE,
+    RERANK_MAX_CONCURRENCY,
+    RERANK_MAX_ATTEMPTS,
+    LOCAL_RERANK_MODEL,
+    LOCAL_RERANK_MAX_LENGTH,
+    LOCAL_RERANK_BATCH_TOKENS,
+    LOCAL_RERANK_MAX_BATCH_SIZE,
+)
+from utils.utils import run_blocking
+
+logger = logging.getLogger(__name__)
+
+# - https://docs.cohere.com/reference/rerank
+# - https://sbert.net/docs/cross_encoder/pretrained_models.html
+# - https://huggingface.co/cross-encoder/ms-marco-MiniLM-L6-v2
+
+# relevance scores are computed per (query, document) pair, so documents can be split
+# over several requests or batches and the scores merged afterwards.
+
+
+class RerankBackend(ABC):
+    """Scores documents against a query. The model name identifies the score scale."""
+
+    name: str
+    model: str
+
+    @abstractmethod
+    def rerank(self, query: str, documents: dict[str, str]) -> dict[str, float]:
+        """Relevance score of every document, keyed by document id"""
+
+
+def is_retryable(exception: BaseException) -> bool:
+    """Retry rate limits, server errors and dropped connections"""
+    if isinstance(exception, httpx.TransportError):
+        return True
+    if isinstance(exception, ApiError) and exception.status_code is not None:
+        return exception.status_code == 429 or exception.status_code >= 500
+    return False
+
+
+class AsyncReranker:
+    """Reranks documents in batches sent concurrently, retrying transient failures"""
+
+    def __init__(
+        self,
+        client: cohere.AsyncClient | None = None,
+        model: str = RERANK_MODEL,
+        max_batch_size: int = RERANK_MAX_BATCH_SIZE,
+        max_concurrency: int = RERANK_MAX_CONCURRENCY,
+        max_attempts: int = RERANK_MAX_ATTEMPTS,
+    ):
+        self.client = client or cohere.AsyncClient(os.environ["COHERE_API_KEY"])
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_attempts = max_attempts
+
+    async def rerank(self, query: str, documents: dict[str, str]) -> dict[str, float]:
+        """Relevance score of every document, keyed by document id"""
+        if not documents:
+            return {}
+
+        start_time = time.time()
+
+        doc_ids = list(documents.keys())
+        batches = [
+            doc_ids[i : i + self.max_batch_size]
+            for i in range(0, len(doc_ids), self.max_batch_size)
+        ]
+        results = await asyncio.gather(
+            *(self._rerank_batch(query, batch, documents) for batch in batches)
+        )
+
+        scores = {}
+        for batch_scores in results:
+            scores.update(batch_scores)
+
+        elapsed_time = time.time() - start_time
+        logger.info(
+            f"Reranked {len(doc_ids)} documents in {len(batches)} requests in {elapsed_time:.2f} seconds"
+        )
+
+        return scores
+
+    async def _rerank_batch(
+        self, query: str, doc_ids: list[str], documents: dict[str, str]
+    ) -> dict[str, float]:
+        retrying = AsyncRetrying(
+            retry=retry_if_exception(is_retryable),
+            wait=wait_random_exponential(multiplier=0.5, max=30),
+            stop=stop_after_attempt(self.max_attempts),
+            before_sleep=lambda state: logger.warning(
+                f"Rerank request failed ({state.outcome.exception()}), retrying"  # type: ignore
+            ),
+            reraise=True,
+        )
+
+        async for attempt in retrying:
+            with attempt:
+                async with self.semaphore:
+                    response = await self.client.rerank(
+                        query=query,
+                        model=self.model,
+                        documents=[documents[doc_id] for doc_id in doc_ids],
+                        # retries are handled here, with backoff shared by every batch
+                        request_options={"max_retries": 0},
+                    )
+
+        # results point at positions in the batch that was sent
+        return {
+            doc_ids[result.index]: result.relevance_score
+            for result in response.results  # type: ignore
+        }
+
+
+def rerank_documents(
+    query: str, documents: dict[str, str], **reranker_kwargs
+) -> dict[str, float]:
+    """Blocking wrapper around AsyncReranker for Streamlit and scripts"""
+
+    async def run() -> dict[str, float]:
+        # the client owns an http client bound to the event loop that creates it
+        return await AsyncReranker(**reranker_kwargs).rerank(query, documents)
+
+    return run_blocking(run)
+
+
+class CohereBackend(RerankBackend):
+    """Cohere rerank api, batches sent concurrently"""
+
+    name = "cohere"
+
+    def __init__(self, model: str = RERANK_MODEL):
+        self.model = model
+
+    def rerank(self, query: str, documents: dict[str, str]) -> dict[str, float]:
+        return rerank_documents(query, documents, model=self.model)
+
+
+def length_batches(lengths: list[int], max_tokens: int, max_items: int) -> list[list[int]]:
+    """Group positions into batches of similar length.
+
+    Sorting by length first keeps padding to the longest input of each batch small, so
+    batches of short inputs can hold more of them within the same padded token budget.
+    """
+    batches: list[list[int]] = []
+    current: list[int] = []
+    for i in np.argsort(lengths, kind="stable").tolist():
+        # ascending order, so the current input is the longest of its batch
+        if current and (
+            (len(current) + 1) * lengths[i] > max_tokens or len(current) >= max_items
+        ):
+            batches.append(current)
+            current = []
+        current.append(i)
+    if current:
+        batches.append(current)
+    return batches
+
+
+class CrossEncoderBackend(RerankBackend):
+    """Cross-encoder running on the cpu.
+
+    Pairs are sorted by length and cut into batches that fit a padded token budget, which
+    are scored on a thread pool; torch releases the GIL during inference so the batches
+    run in parallel. Inputs are truncated to max_length tokens.
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        model: str = LOCAL_RERANK_MODEL,
+        max_length: int = LOCAL_RERANK_MAX_LENGTH,
+        batch_tokens: int = LOCAL_RERANK_BATCH_TOKENS,
+        max_batch_size: int = LOCAL_RERANK_MAX_BATCH_SIZE,
+        max_workers: int | None = None,
+        encoder=None,
+    ):
+        if encoder is None:
+            try:
+                from sentence_transformers import CrossEncoder
+            except ImportError as e:
+                raise ImportError(
+                    "The local reranker needs sentence-transformers. "
+                    "Install it with `uv sync --extra local`."
+                ) from e
+            encoder = CrossEncoder(model, max_length=max_length, device="cpu")
+
+        self.model = model
+        self.encoder = encoder
+        self.max_length = max_length
+        self.batch_tokens = batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+    def rerank(self, query: str, documents: dict[str, str]) -> dict[str, float]:
+        if not documents:
+            return {}
+
+        start_time = time.time()
+
+        doc_ids = list(documents.keys())
+        pairs = [(query, documents[doc_id]) for doc_id in doc_ids]
+        lengths = [self._estimate_tokens(pair) for pair in pairs]
+        batches = length_batches(lengths, self.batch_tokens, self.max_batch_size)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = executor.map(lambda batch: self._predict([pairs[i] for i in batch]), batches)
+            scores = {
+                doc_ids[i]: float(score)
+                for batch, batch_scores in zip(batches, results)
+                for i, score in zip(batch, batch_scores)
+            }
+
+        elapsed_time = time.time() - start_time
+        logger.info(
+            f"Reranked {len(pairs)} documents locally in {len(batches)} batches in {elapsed_time:.2f} seconds"
+        )
+
+        return scores
+
+    def _estimate_tokens(self, pair: tuple[str, str]) -> int:
+        # about four characters per token, without running the tokenizer twice
+        return min(self.max_length, (len(pair[0]) + len(pair[1])) // 4 + 3)
+
+    def _predict(self, pairs: list[tuple[str, str]]) -> np.ndarray:
+        return self.encoder.predict(
+            pairs, batch_size=len(pairs), show_progress_bar=False, convert_to_numpy=True
+        )
+
+
+class OverlapCrossEncoder:
+    """Stand-in for a cross-encoder model: the share of query words found in the document.
+
+    No model and no network, so it is meant for tests and load tests. seconds_per_token
+    simulates inference cost on the padded batch, which makes latency predictable.
+    """
+
+    def __init__(
+        self, max_length: int = LOCAL_RERANK_MAX_LENGTH, seconds_per_token: float = 0.0
+    ):
+        self.max_length = max_length
+        self.seconds_per_token = seconds_per_token
+        self.padded_tokens = 0
+        self.lock = threading.Lock()
+
+    def predict(self, pairs: list[tuple[str, str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        words = [
+            (re.findall(r"\w+", query.lower()), re.findall(r"\w+", doc.lower()))
+            for query, doc in pairs
+        ]
+        words = [(q, d[: max(0, self.max_length - len(q))]) for q, d in words]
+
+        padded = len(pairs) * max((len(q) + len(d) for q, d in words), default=0)
+        with self.lock:
+            self.padded_tokens += padded
+        time.sleep(self.seconds_per_token * padded)
+
+        return np.array(
+            [len(set(q) & set(d)) / len(set(q)) if q else 0.0 for q, d in words],
+            dtype=np.float32,
+        )
+
+
+def get_rerank_backend(name: str | None = None) -> RerankBackend:
+    """Backend named by the RERANK_BACKEND environment variable, cohere by default"""
+    return _create_backend(name or os.getenv("RERANK_BACKEND", RERANK_BACKEND))
+
+
+@lru_cache(maxsize=None)
+def _create_backend(name: str) -> RerankBackend:
+    """One instance per backend per process, local models are slow to load"""
+    match name:
+        case "cohere":
+            return CohereBackend()
+        case "local":
+            return CrossEncoderBackend()
+        case "overlap":
+            return CrossEncoderBackend(model="overlap", encoder=OverlapCrossEncoder())
+        case _:
+            raise ValueError(f"Invalid rerank backend: {name}")
@@ -1,16 +1,89 @@
+import hashlib
 import pandas as pd
 import numpy as np
 
+from utils.embedding_store import arrow_matrix, is_fixed_size_embedding
+
 # -   https://huggingface.co/dunzhang/stella_en_1.5B_v5
 # -   https://huggingface.co/dunzhang/stella_en_400M_v5
 # -   https://huggingface.co/intfloat/e5-mistral-7b-instruct
 # -   https://huggingface.co/BAAI/bge-reranker-base
 
 
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Scale rows (or a single vector) to unit length, leaving all-zero rows alone"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def embedding_matrix(df: pd.DataFrame, col: str = "embedding") -> np.ndarray:
+    """Stack an embedding column into one contiguous float32 matrix"""
+    if is_fixed_size_embedding(df[col]):
+        # columns loaded by embedding_store are viewed as a matrix without a copy
+        return arrow_matrix(df[col].array.__arrow_array__())
+    return np.array(df[col].tolist(), dtype=np.float32)
+
+
+def matrix_hash(matrix: np.ndarray) -> str:
+    """Identity of a job set, changes when any job or embedding does"""
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    digest = hashlib.md5(str(matrix.shape).encode("utf-8"))
+    digest.update(matrix.data)
+    return digest.hexdigest()
+
+
+def rescore(matrix: np.ndarray, ids: np.ndarray, query: list[float] | np.ndarray) -> np.ndarray:
+    """Exact cosine similarity of the query to the rows in ids only"""
+    return normalize_rows(matrix[ids]) @ normalize_rows(query)
+
+
+def top_k(scores: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Positions and values of the k highest scores, best first.
+
+    argpartition finds the k best in linear time, only those k get sorted.
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=scores.dtype)
+
+    ids = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(k)
+    ids = ids[np.argsort(-scores[ids], kind="stable")]
+    return ids, scores[ids]
+
+
+class VectorIndex:
+    """Exact cosine search over a contiguous matrix of normalized float32 embeddings"""
+
+    def __init__(self, matrix: np.ndarray):
+        self.matrix = np.ascontiguousarray(normalize_rows(matrix))
+
+    @classmethod
+    def from_df(cls, df: pd.DataFrame, col: str = "embedding") -> "VectorIndex":
+        return cls(embedding_matrix(df, col))
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    @property
+    def dimensions(self) -> int:
+        return self.matrix.shape[1]
+
+    def scores(self, query: list[float] | np.ndarray) -> np.ndarray:
+        """Cosine similarity of the query to every row, in row order"""
+        return self.matrix @ normalize_rows(query)
+
+    def search(
+        self, query: list[float] | np.ndarray, k: int = 10
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Row ids and scores of the k most similar rows, best first"""
+        return top_k(self.scores(query), k)
+
+
 def similarity_search(df: pd.DataFrame, embedding: list[float]) -> pd.DataFrame:
     """ expects a df with a column called 'embedding' """
-    
-    df["score_semantic"] = df["embedding"].apply(lambda x: np.dot(embedding, x))
+
+    df["score_semantic"] = VectorIndex.from_df(df).scores(embedding)
     return df
 
 
@@ -45,4 +118,4 @@ def similarity_search(df: pd.DataFrame, embedding: list[float]) -> pd.DataFrame:
 #         "Vector",
 #     ]
 
-#     return df 
\ No newline at end of file
+#     return df
@@ -0,0 +1,96 @@
+import logging
+import os
+import threading
+import numpy as np
+from collections import OrderedDict
+from functools import lru_cache
+
+from config.constants import (
+    VECTOR_INDEX,
+    ANN_MIN_ROWS,
+    SEMANTIC_TOP_K,
+    MATRYOSHKA_DIMENSIONS,
+    VECTOR_INDEX_MEMORY_SIZE,
+)
+from algorithms.semantic_search import VectorIndex, matrix_hash
+from algorithms.ann import IVFIndex
+from algorithms.quantization import QUANTIZATION_METHODS, QuantizedIndex
+from algorithms.matryoshka import MatryoshkaIndex
+
+logger = logging.getLogger(__name__)
+
+# The index semantic search runs on, picked by VECTOR_INDEX (or the VECTOR_INDEX env var).
+# Corpora under ANN_MIN_ROWS are searched exactly whatever the setting, a matrix-vector
+# product over them is already faster than building anything.
+#   - exact: brute force over the full precision matrix
+#   - ivf: inverted file index, only the n_probe closest lists are scanned
+#   - float16, int8, binary: a scan over quantized vectors, the best candidates are
+#     rescored at full precision
+#   - matryoshka: a scan over the first MATRYOSHKA_DIMENSIONS of every vector, the best
+#     candidates are rescored with all of them
+
+# Building an approximate index costs more than many exact searches, so indexes are kept
+# per job set (by the hash of its embedding matrix) and reused by every search over it.
+
+VECTOR_INDEXES = ("exact", "ivf", *QUANTIZATION_METHODS, "matryoshka")
+
+
+def build_vector_index(
+    matrix: np.ndarray, kind: str = VECTOR_INDEX, min_rows: int = ANN_MIN_ROWS
+):
+    """Index of the given kind, or an exact one for corpora under min_rows"""
+    if kind not in VECTOR_INDEXES:
+        raise ValueError(f"Invalid vector index: {kind}")
+    if kind == "exact" or len(matrix) < min_rows:
+        return VectorIndex(matrix)
+    if kind in QUANTIZATION_METHODS:
+        return QuantizedIndex(matrix, kind)
+    if kind == "matryoshka":
+        # vectors that are already short have nothing to truncate
+        if matrix.shape[1] <= MATRYOSHKA_DIMENSIONS:
+            return VectorIndex(matrix)
+        return MatryoshkaIndex(matrix)
+    return IVFIndex.build(matrix)
+
+
+def semantic_ranking(
+    index, query: list[float] | np.ndarray, k: int = SEMANTIC_TOP_K
+) -> tuple[np.ndarray, np.ndarray]:
+    """Row ids and scores of the ranked rows, best first.
+
+    An exact index ranks every row, an approximate one only finds its k best.
+    """
+    if isinstance(index, VectorIndex):
+        k = len(index)
+    return index.search(query, k)
+
+
+class VectorIndexStore:
+    """Vector indexes by kind and job set, the memory_size most recently used are kept"""
+
+    def __init__(self, memory_size: int = VECTOR_INDEX_MEMORY_SIZE):
+        self.memory_size = memory_size
+        self.indexes: OrderedDict[str, object] = OrderedDict()
+        self.lock = threading.Lock()
+        self.builds = 0
+
+    def get(self, matrix: np.ndarray, kind: str | None = None):
+        """Index of the matrix, built on first use"""
+        kind = kind or os.getenv("VECTOR_INDEX", VECTOR_INDEX)
+        key = f"{kind}-{matrix_hash(matrix)}"
+        with self.lock:
+            if key in self.indexes:
+                self.indexes.move_to_end(key)
+                return self.indexes[key]
+
+            index = build_vector_index(matrix, kind)
+            self.builds += 1
+            self.indexes[key] = index
+            if len(self.indexes) > self.memory_size:
+                self.indexes.popitem(last=False)
+            return index
+
+
+@lru_cache(maxsize=None)
+def get_vector_index_store() -> VectorIndexStore:
+    return VectorIndexStore()
@@ -1,17 +1,26 @@
 import pandas as pd
+import numpy as np
 import altair as alt
 import streamlit as st
 import logging
 
-from utils.utils import add_you
-from algorithms.dimensionality_reduction import pca_df, umap_df
+from algorithms.projection import (
+    Projection,
+    ProjectionStore,
+    get_projection_store,
+    project_with_you,
+)
 from algorithms.clustering import cluster_kmeans, cluster_hdbscan
+from algorithms.cluster_labels import Clustering
+from algorithms.semantic_search import embedding_matrix
 
 logger = logging.getLogger(__name__)
 
 
 def get_chart(df: pd.DataFrame, x_col: str, y_col: str) -> alt.Chart:
     """Create Altair chart for visualization"""
+    # named clusters also list their top terms
+    topic = ["Topic:N"] if "Topic" in df.columns else []
     chart = (
         alt.Chart(df)
         .mark_circle(size=100)
@@ -21,6 +30,7 @@ def get_chart(df: pd.DataFrame, x_col: str, y_col: str) -> alt.Chart:
             color="Cluster:N",
             tooltip=alt.Tooltip(
                 [
+                    *topic,
                     "title:N",
                     "days_ago:Q",
                     "score_semantic:Q",
@@ -36,19 +46,26 @@ def get_chart(df: pd.DataFrame, x_col: str, y_col: str) -> alt.Chart:
 
 
 def render_cluster_visualization(
-    df: pd.DataFrame, input_text: str, input_embedding: list[float]
-) -> None:
-    st.write("### Cluster Visualization")
-    st.write("Hover over items to see more details")
-
-    df_you = add_you(df.copy(), input_text, input_embedding)  # type: ignore
-    # df_pca = pca_df(df_you, "embedding")
-    df_umap = umap_df(df_you, "embedding")
+    df: pd.DataFrame,
+    input_text: str,
+    input_embedding: list[float],
+    mode: str = "exact",
+    store: ProjectionStore | None = None,
+) -> tuple[Projection, pd.DataFrame]:
+    """Chart of the jobs' named clusters with your text placed on it.
+
+    Returns the projection and the charted rows, the jobs in df's order then your text.
+    """
+    store = store or get_projection_store(persist=False)
+    # clusters and their names are cached with the projection
+    projection, clustering = store.cluster(
+        embedding_matrix(df, "embedding"), cluster_documents(df), mode
+    )
+    df_umap = project_with_you(df, input_text, input_embedding, projection)
 
-    # render_pca_kmeans(df_pca.copy())
-    # render_umap_kmeans(df_umap.copy())
-    # render_pca_hdbscan(df_pca.copy())
-    render_umap_hdbscan(df_umap.copy())
+    st.caption("UMAP + HDBSCAN" if mode == "exact" else "PCA + UMAP + HDBSCAN (fast)")
+    render_umap_clusters(df_umap.copy(), clustering)
+    return projection, df_umap
 
 
 def render_pca_kmeans(df_pca: pd.DataFrame) -> None:
@@ -87,12 +104,24 @@ def render_pca_hdbscan(df_pca: pd.DataFrame) -> None:
     st.altair_chart(chart, use_container_width=True)
 
 
-def render_umap_hdbscan(df_umap: pd.DataFrame) -> None:
-    """Render UMAP + HDBSCAN visualization"""
-    logger.info("Generating UMAP + HDBSCAN visualization")
-    df_clustered = cluster_hdbscan(df_umap, "UMAP", min_cluster_size=5)
-    # Convert Cluster column to string to avoid dtype incompatibility
-    df_clustered["Cluster"] = df_clustered["Cluster"].astype(str)
+def cluster_documents(df: pd.DataFrame) -> list[str]:
+    """Text of each job that its cluster is named from"""
+    return (df["title"].fillna("") + ". " + df["description"].fillna("")).tolist()
+
+
+def render_umap_clusters(df_umap: pd.DataFrame, clustering: Clustering) -> None:
+    """Render UMAP + HDBSCAN visualization with the projection's named clusters.
+
+    clustering covers the first rows of df_umap, the rows after them (your text) are noise.
+    """
+    logger.info("Generating UMAP + HDBSCAN visualization with named clusters")
+    clusters = np.full(len(df_umap), -1)
+    clusters[: len(clustering.labels)] = clustering.labels
+
+    df_clustered = df_umap
+    # legend entries are the clusters' top terms, the tooltip lists more of them
+    df_clustered["Cluster"] = [clustering.name(cluster) for cluster in clusters]
+    df_clustered["Topic"] = [", ".join(clustering.terms.get(c, [])) for c in clusters]
     df_clustered.loc[df_clustered["title"] == "Your text", "Cluster"] = " You"
     chart = get_chart(df_clustered, "UMAP1", "UMAP2")
     st.altair_chart(chart, use_container_width=True)
@@ -0,0 +1 @@
+# Offline benchmarks, run from the intersect/ directory with `python -m benchmarks.<name>`
@@ -0,0 +1,56 @@
+"""Recall@k and latency of the IVF index against exact similarity search.
+
+    cd intersect && python -m benchmarks.ann_recall --n 200000 --probes 1 4 8 16 32
+"""
+
+import argparse
+import time
+import numpy as np
+import pandas as pd
+
+from algorithms.ann import IVFIndex
+from algorithms.semantic_search import similarity_search, top_k
+from benchmarks.data import add_data_arguments, load_embeddings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_data_arguments(parser)
+    parser.add_argument("--n-lists", type=int, default=None)
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    matrix = load_embeddings(args)
+    rng = np.random.default_rng(1)
+    queries = matrix[rng.choice(len(matrix), args.queries, replace=False)]
+    queries = queries + 0.05 * rng.normal(size=queries.shape).astype(np.float32)
+    print(f"corpus: {matrix.shape[0]} x {matrix.shape[1]}, {len(queries)} queries")
+
+    # ground truth and baseline latency from the dataframe based search the app uses
+    df = pd.DataFrame({"embedding": list(matrix)})
+    start = time.perf_counter()
+    expected = []
+    for query in queries:
+        scores = similarity_search(df, query)["score_semantic"].to_numpy()
+        expected.append(set(top_k(scores, args.k)[0]))
+    exact_ms = 1000 * (time.perf_counter() - start) / len(queries)
+    print(f"similarity_search: {exact_ms:.2f} ms/query")
+
+    start = time.perf_counter()
+    index = IVFIndex.build(matrix, n_lists=args.n_lists)
+    print(f"build: {time.perf_counter() - start:.2f} s, {index.n_lists} lists")
+
+    print(f"{'n_probe':>8} {'recall@' + str(args.k):>10} {'ms/query':>10} {'speedup':>8}")
+    for n_probe in args.probes:
+        hits = 0
+        start = time.perf_counter()
+        for query, truth in zip(queries, expected):
+            found, _ = index.search(query, args.k, n_probe=n_probe)
+            hits += len(truth & set(found))
+        ms = 1000 * (time.perf_counter() - start) / len(queries)
+        recall = hits / (args.k * len(queries))
+        print(f"{n_probe:>8} {recall:>10.3f} {ms:>10.2f} {exact_ms / ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from algorithms.semantic_search import embedding_matrix, normalize_rows
+
+
+def clustered_embeddings(
+    n: int, dimensions: int = 1536, n_topics: int = 200, seed: int = 0
+) -> np.ndarray:
+    """Synthetic unit vectors grouped around topics, like job postings are"""
+    return clustered_embeddings_with_topics(n, dimensions, n_topics, seed)[0]
+
+
+def clustered_embeddings_with_topics(
+    n: int, dimensions: int = 1536, n_topics: int = 200, seed: int = 0
+) -> tuple[np.ndarray, np.ndarray]:
+    """clustered_embeddings and the topic each vector was drawn from"""
+    rng = np.random.default_rng(seed)
+    topics = rng.normal(size=(n_topics, dimensions)).astype(np.float32)
+    labels = rng.integers(n_topics, size=n)
+    vectors = topics[labels]
+    vectors += 0.6 * rng.normal(size=(n, dimensions)).astype(np.float32)
+    return normalize_rows(vectors), labels
+
+
+def feather_embeddings(paths: list[str]) -> np.ndarray:
+    """Embeddings of the bundled datasets, skipping rows without one"""
+    frames = [pd.read_feather(path, columns=["embedding"]) for path in paths]
+    df = pd.concat(frames).dropna()
+    return normalize_rows(embedding_matrix(df))
+
+
+def load_embeddings(args) -> np.ndarray:
+    if args.feather:
+        return feather_embeddings(args.feather)
+    return clustered_embeddings(args.n, args.dimensions)
+
+
+def add_data_arguments(parser) -> None:
+    parser.add_argument("--n", type=int, default=100_000, help="synthetic corpus size")
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument(
+        "--feather", nargs="*", help="use the embeddings of these feather files instead"
+    )
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
@@ -0,0 +1,61 @@
+"""Accuracy and latency of coarse-to-fine matryoshka search against full search.
+
+Truncation only works for embeddings trained for it, so run this on real vectors:
+
+    cd intersect && python -m benchmarks.matryoshka --feather data/*.feather --k 10
+"""
+
+import argparse
+import time
+import numpy as np
+
+from algorithms.matryoshka import MatryoshkaIndex, truncate
+from algorithms.semantic_search import VectorIndex
+from benchmarks.data import add_data_arguments, load_embeddings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_data_arguments(parser)
+    parser.add_argument("--coarse-dimensions", type=int, nargs="+", default=[64, 128, 256, 512])
+    parser.add_argument("--candidates", type=int, nargs="+", default=[50, 100, 300])
+    args = parser.parse_args()
+
+    matrix = load_embeddings(args)
+    rng = np.random.default_rng(1)
+    n_queries = min(args.queries, len(matrix))
+    queries = matrix[rng.choice(len(matrix), n_queries, replace=False)]
+    print(f"corpus: {matrix.shape[0]} x {matrix.shape[1]}, {n_queries} queries")
+
+    exact = VectorIndex(matrix)
+    start = time.perf_counter()
+    expected = [set(exact.search(query, args.k)[0]) for query in queries]
+    exact_ms = 1000 * (time.perf_counter() - start) / n_queries
+    print(f"full {matrix.shape[1]}-d search: {exact_ms:.2f} ms/query")
+
+    print(
+        f"{'dims':>6} {'candidates':>11} {'coarse only':>12} {'recall@' + str(args.k):>10} {'ms/query':>10}"
+    )
+    for dimensions in args.coarse_dimensions:
+        # how much the truncated vectors alone get right, before rescoring
+        coarse = VectorIndex(truncate(matrix, dimensions))
+        coarse_hits = sum(
+            len(truth & set(coarse.search(truncate(query, dimensions), args.k)[0]))
+            for query, truth in zip(queries, expected)
+        )
+
+        for candidates in args.candidates:
+            index = MatryoshkaIndex(matrix, dimensions, candidates)
+            hits = 0
+            start = time.perf_counter()
+            for query, truth in zip(queries, expected):
+                hits += len(truth & set(index.search(query, args.k)[0]))
+            ms = 1000 * (time.perf_counter() - start) / n_queries
+            print(
+                f"{dimensions:>6} {candidates:>11} {coarse_hits / (args.k * n_queries):>12.3f} "
+                f"{hits / (args.k * n_queries):>10.3f} {ms:>10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Memory, latency and recall@k of quantized search against similarity_search.
+
+    cd intersect && python -m benchmarks.quantization --n 100000 --rescore-factors 1 4 10
+"""
+
+import argparse
+import time
+import numpy as np
+import pandas as pd
+
+from algorithms.quantization import QUANTIZATION_METHODS, QuantizedIndex
+from algorithms.semantic_search import similarity_search, top_k
+from benchmarks.data import add_data_arguments, load_embeddings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_data_arguments(parser)
+    parser.add_argument("--rescore-factors", type=int, nargs="+", default=[1, 4, 10])
+    args = parser.parse_args()
+
+    matrix = load_embeddings(args)
+    rng = np.random.default_rng(1)
+    queries = matrix[rng.choice(len(matrix), args.queries, replace=False)]
+    queries = queries + 0.05 * rng.normal(size=queries.shape).astype(np.float32)
+    print(f"corpus: {matrix.shape[0]} x {matrix.shape[1]}, {len(queries)} queries")
+
+    # the app keeps float64 vectors in a dataframe column and scores them with similarity_search
+    df = pd.DataFrame({"embedding": list(matrix.astype(np.float64))})
+    start = time.perf_counter()
+    expected = []
+    for query in queries:
+        scores = similarity_search(df, query)["score_semantic"].to_numpy()
+        expected.append(set(top_k(scores, args.k)[0]))
+    exact_ms = 1000 * (time.perf_counter() - start) / len(queries)
+    float64_mb = matrix.size * 8 / 1e6
+    print(f"{'similarity_search':>18} {float64_mb:>9.1f}MB {exact_ms:>9.2f}ms")
+
+    print(f"{'method':>8} {'rescore':>8} {'memory':>10} {'ms/query':>10} {'recall@' + str(args.k):>10}")
+    for method in QUANTIZATION_METHODS:
+        index = QuantizedIndex(matrix, method)
+        for factor in args.rescore_factors:
+            index.rescore_factor = factor
+            hits = 0
+            start = time.perf_counter()
+            for query, truth in zip(queries, expected):
+                hits += len(truth & set(index.search(query, args.k)[0]))
+            ms = 1000 * (time.perf_counter() - start) / len(queries)
+            recall = hits / (args.k * len(queries))
+            print(
+                f"{method:>8} {factor:>8} {index.nbytes / 1e6:>8.1f}MB {ms:>10.2f} {recall:>10.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
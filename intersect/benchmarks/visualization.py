@@ -0,0 +1,134 @@
+"""Wall time and cluster stability of the fast visualization path against the exact one.
+
+exact is what render_umap_clusters is given today: seeded UMAP on the full embeddings and
+HDBSCAN on the layout. fast is PCA, unseeded multi-threaded UMAP and HDBSCAN on every
+core. Stability is the adjusted Rand index between the clusterings of repeated runs,
+and against the topics the synthetic vectors were drawn from.
+
+Clusters and noise are also counted for HDBSCAN on the distances of the k-NN graph UMAP
+is fitted on, which the app clustered before. On the bundled datasets it marks most rows
+as noise, run it per dataset to compare:
+
+    cd intersect && python -m benchmarks.visualization --n 5000 --runs 3
+    cd intersect && python -m benchmarks.visualization --feather data/law.feather
+"""
+
+import argparse
+import itertools
+import time
+import hdbscan
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from sklearn.metrics import adjusted_rand_score
+
+from algorithms.clustering import hdbscan_labels
+from algorithms.dimensionality_reduction import VISUALIZATION_MODES, make_reducer
+from algorithms.knn_graph import KnnGraph
+from algorithms.projection import Projection
+from benchmarks.data import (
+    add_data_arguments,
+    clustered_embeddings_with_topics,
+    feather_embeddings,
+)
+
+
+def graph_distance_matrix(graph: KnnGraph) -> sparse.csr_matrix:
+    """Symmetric sparse distances along the graph's edges, as one connected component.
+
+    Components the graph falls apart into are bridged by a single edge longer than any
+    other, so they are split off before anything else when clustering.
+    """
+    n = len(graph)
+    rows = np.repeat(np.arange(n), graph.n_neighbors)
+    cols = graph.indices.ravel()
+    keep = (cols != rows) & (cols >= 0)
+    # duplicate points are at distance 0, which a sparse matrix would drop
+    data = np.maximum(graph.distances.ravel()[keep], np.finfo(np.float32).tiny)
+    distances = sparse.csr_matrix((data, (rows[keep], cols[keep])), shape=(n, n))
+    distances = distances.maximum(distances.T)
+
+    n_components, labels = connected_components(distances, directed=False)
+    if n_components > 1:
+        first = np.unique(labels, return_index=True)[1]
+        far = 10 * distances.data.max() if distances.nnz else 1.0
+        bridges = sparse.csr_matrix(
+            (
+                np.full(n_components - 1, far),
+                (first[1:], np.full(n_components - 1, first[0])),
+            ),
+            shape=(n, n),
+        )
+        distances = distances + bridges + bridges.T
+    return distances.tocsr()  # type: ignore
+
+
+def layout_and_clusters(
+    matrix: np.ndarray, mode: str
+) -> tuple[np.ndarray, np.ndarray, float, float]:
+    """Cluster labels of the layout and of the graph, and seconds spent in the projection
+    and in clustering the layout"""
+    start = time.perf_counter()
+    projection = Projection.fit(matrix, mode)
+    reduce_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    labels = hdbscan_labels(projection.coordinates, n_jobs=-1 if mode == "fast" else 4)
+    cluster_seconds = time.perf_counter() - start
+
+    clusterer = hdbscan.HDBSCAN(min_cluster_size=5, metric="precomputed")
+    graph_labels = clusterer.fit_predict(graph_distance_matrix(projection.graph))
+
+    return labels, graph_labels, reduce_seconds, cluster_seconds
+
+
+def clusters_and_noise(labels: list[np.ndarray]) -> tuple[float, float]:
+    """Mean number of clusters and share of noise over runs"""
+    return (
+        float(np.mean([len(set(run) - {-1}) for run in labels])),
+        float(np.mean([np.mean(run == -1) for run in labels])),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_data_arguments(parser)
+    parser.set_defaults(n=5_000)
+    parser.add_argument("--topics", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.feather:
+        matrix, topics = feather_embeddings(args.feather), None
+    else:
+        matrix, topics = clustered_embeddings_with_topics(args.n, args.dimensions, args.topics)
+    print(f"corpus: {matrix.shape[0]} x {matrix.shape[1]}, {args.runs} runs per mode")
+
+    # the first fit pays for numba compilation, keep it out of the timings
+    make_reducer("fast", *matrix[:200].shape).fit_transform(matrix[:200])
+
+    print(
+        f"{'mode':>6} {'reduce s':>9} {'cluster s':>10} {'clusters':>9} {'noise':>6} "
+        f"{'run ARI':>8} {'topic ARI':>10} {'graph clusters':>15} {'graph noise':>12}"
+    )
+    for mode in VISUALIZATION_MODES:
+        runs = [layout_and_clusters(matrix, mode) for _ in range(args.runs)]
+        labels = [run[0] for run in runs]
+        between = [adjusted_rand_score(a, b) for a, b in itertools.combinations(labels, 2)]
+        truth = (
+            np.mean([adjusted_rand_score(topics, run) for run in labels])
+            if topics is not None
+            else float("nan")
+        )
+        clusters, noise = clusters_and_noise(labels)
+        graph_clusters, graph_noise = clusters_and_noise([run[1] for run in runs])
+        print(
+            f"{mode:>6} {np.mean([run[2] for run in runs]):>9.2f} "
+            f"{np.mean([run[3] for run in runs]):>10.3f} {clusters:>9.1f} {noise:>6.1%} "
+            f"{np.mean(between) if between else 1.0:>8.3f} {truth:>10.3f} "
+            f"{graph_clusters:>15.1f} {graph_noise:>12.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -44,6 +44,10 @@ def search_jobs(search_params: dict, data_source: str) -> pd.DataFrame:
                 raise ValueError(f"Invalid data source: {data_source}")
 
     api = get_api_client(data_source)
+    if isinstance(api, TheirstackAPI):
+        # embeddings stay in Arrow memory instead of a python list per job
+        return api.search_jobs_df(**search_params)
+
     jobs = api.search_jobs(**search_params)
     return pd.DataFrame([job.to_dict() for job in jobs])
 
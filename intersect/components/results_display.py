@@ -1,50 +1,93 @@
 import streamlit as st
 import pandas as pd
-from openai import OpenAI
+import numpy as np
 import logging
 
-from config.constants import TABLE_SIZE
+from config.constants import (
+    TABLE_SIZE,
+    HYBRID_CANDIDATES,
+    HYBRID_FUSION,
+    PERMUTATION_ENABLED,
+    PERMUTATION_MODEL,
+    PERMUTATION_TOP_K,
+    PERMUTATION_WINDOW,
+    VISUALIZATION_MODE,
+    SIMILAR_JOBS,
+    SIMILAR_JOBS_SHOWN,
+)
 from data_sources.types import IntersectJob
-from algorithms.semantic_search import similarity_search
-from algorithms.lexical_search import lexical_search
-from algorithms.wordcloud import render_wordcloud
-from algorithms.visualizations import render_umap_hdbscan
-from algorithms.clustering import cluster_hdbscan, cluster_kmeans
-from algorithms.rerank import rerank_cohere
-from algorithms.dimensionality_reduction import umap_df
-from utils.utils import add_index, add_you
-from utils.embedding import get_input_embeddings, get_embedding
+from algorithms.semantic_search import embedding_matrix
+from algorithms.vector_index import get_vector_index_store, semantic_ranking
+from algorithms.lexical_search import lexical_retrieve
+from algorithms.lexical_index import get_lexical_index_store
+from algorithms.hybrid_search import hybrid_search
+from algorithms.visualizations import render_cluster_visualization
+from algorithms.rerank import rerank_df
+from algorithms.rerank_backends import RerankBackend, get_rerank_backend
+from algorithms.permutation import permutation_openai
+from algorithms.projection import get_projection_store
+from algorithms.knn_graph import KnnGraph
+from utils.utils import add_index
+from utils.embedding_store import is_fixed_size_embedding, stale_embeddings
+from utils.embedding_cache import embed_with_cache
+from utils.embedding_backends import get_embedding_backend
+from utils.rerank_cache import get_rerank_cache
+from utils.llm_cache import get_llm_cache
+from utils.warmup import start_warmup
 
 
 def process_search(
-    df: pd.DataFrame, input_text: str, data_source: str = "reed"
+    df: pd.DataFrame,
+    input_text: str,
+    data_source: str = "reed",
+    hybrid_candidates: int = HYBRID_CANDIDATES,
+    fusion: str = HYBRID_FUSION,
+    visualization: str = VISUALIZATION_MODE,
+    permutation: bool = PERMUTATION_ENABLED,
 ) -> None:
     # this code has a bunch of side effects on the df
 
-    openai_client = OpenAI()
-    input_embedding = get_input_embeddings(openai_client, input_text)
+    backend = get_embedding_backend()
+    input_embedding = embed_with_cache([input_text], backend=backend)[0]
 
-    # check if embeddings are missing
-    if bool(df["embedding"].isna().any()):
+    # check if embeddings are missing, or were made by a different backend
+    missing = stale_embeddings(df, backend.space, backend.dimensions)
+    if bool(missing.any()):
+        if is_fixed_size_embedding(df["embedding"]):
+            # new embeddings are python lists, which an Arrow list column can't take
+            df["embedding"] = df["embedding"].astype(object)
         with st.spinner():
             logging.info("Missing embeddings found in data. Generating...")
-            df["embedding"] = df["description"].apply(
-                lambda x: get_embedding(openai_client, x)
+            # postings are keyed by intersect_id, only cache misses are embedded
+            keys = (
+                df.loc[missing, "intersect_id"].tolist()
+                if "intersect_id" in df.columns
+                else None
             )
+            embeddings = embed_with_cache(
+                df.loc[missing, "description"].tolist(), keys, backend
+            )
+            df.loc[missing, "embedding"] = pd.Series(embeddings, index=df.index[missing])
+    df["embedding_space"] = backend.space
 
     # Show the plot first
     st.write("### Cluster Visualization")
-    with st.spinner("📊 Creating cluster visualization..."):
-        df_you = add_you(df.copy(), input_text, input_embedding)  # type: ignore
-        # df_pca = pca_df(df_you, "embedding")
-        df_umap = umap_df(df_you, "embedding")
+    warmup = start_warmup()
+    if not warmup.done:
+        # compiling again here would only compete with the warm-up thread
+        with st.spinner("⏳ Finishing warm-up..."):
+            warmup.wait()
+    if warmup.state == "failed":
+        st.caption(f"Warm-up failed ({', '.join(warmup.errors)}), the first chart may be slow")
 
-        # render_pca_kmeans(df_pca.copy())
-        # render_umap_kmeans(df_umap.copy())
-        # render_pca_hdbscan(df_pca.copy())
-
-        st.caption("UMAP + HDBSCAN")
-        render_umap_hdbscan(df_umap.copy())
+    with st.spinner("📊 Creating cluster visualization..."):
+        # the jobs are laid out once per job set, only your text is placed each time
+        store = get_projection_store(persist=data_source != "reed")
+        # rows of the k-NN graph, which the later rankings reorder
+        df["i_knn"] = np.arange(len(df))
+        projection, df_umap = render_cluster_visualization(
+            df, input_text, input_embedding, visualization, store
+        )
 
     # with st.spinner():
     #     render_wordcloud(df)
@@ -55,15 +98,18 @@ def process_search(
         df["index"] = df["index"] + 1
         display_df(df, {"index": "Rank O"}, data_source)
 
+    # rows in their original order, which the lexical and semantic rankings point into
+    jobs = df
+
     with st.spinner():
         st.write("### Most relevant")
         st.caption("Lexical search (BM25)")
-        process_lexical_search(df, input_text, data_source)
+        lexical = process_lexical_search(jobs, input_text, data_source, hybrid_candidates)
 
     with st.spinner():
         st.write("### Most similar")
-        st.caption("Semantic search (embeddings-3-small)")
-        df = process_semantic_search(openai_client, df, input_embedding, data_source)
+        st.caption(f"Semantic search ({backend.model})")
+        df, semantic_ids = process_semantic_search(jobs, input_embedding, data_source)
 
     with st.spinner():
         st.write("### Most interesting")
@@ -71,45 +117,174 @@ def process_search(
         df = process_semantic_delta(df, data_source)
         df.sort_values(by="delta_semantic", inplace=True)
 
+    reranker = get_rerank_backend()
     with st.spinner():
         st.write("### Reranking")
-        st.caption("Cross-encoding (Cohere)")
-        df = process_reranker_search(df, input_text, data_source)
+        st.caption(
+            f"Top {hybrid_candidates} of semantic search, reranked by cross-encoding ({reranker.model})"
+        )
+        # the reranker only sees a shortlist, its scores are cached for the hybrid below
+        shortlist = jobs.iloc[semantic_ids[:hybrid_candidates]].reset_index(drop=True)
+        process_reranker_search(shortlist, input_text, data_source, reranker)
+
+    with st.spinner():
+        st.write("### Hybrid")
+        st.caption(
+            f"Top {hybrid_candidates} of lexical and semantic search, fused ({fusion}) and reranked by cross-encoding ({reranker.model})"
+        )
+        # fused from the rankings above, so neither search runs again
+        df = process_hybrid_search(
+            jobs,
+            input_text,
+            input_embedding,
+            lexical,
+            semantic_ids,
+            data_source,
+            hybrid_candidates,
+            fusion,
+            reranker,
+        )
+
+    # several llm calls per search, so only when asked for in the search options
+    if permutation:
+        st.write("### LLM permutation")
+        st.caption(
+            f"Top {PERMUTATION_TOP_K} of the hybrid ranking, reordered by an llm ({PERMUTATION_MODEL}) in sliding windows of {PERMUTATION_WINDOW}"
+        )
+        df = process_permutation(df, input_text, data_source)
+
+    st.write("### More jobs like this")
+    st.caption("Nearest neighbours of the top results, read from the graph the chart was built on")
+    process_similar_jobs(df, df_umap.iloc[:-1], projection.graph, data_source)
 
 
 def process_semantic_search(
-    client: OpenAI, df: pd.DataFrame, input_embedding: list, data_source: str = "reed"
-) -> pd.DataFrame:
+    df: pd.DataFrame, input_embedding: list, data_source: str = "reed"
+) -> tuple[pd.DataFrame, np.ndarray]:
+    """The rows reordered by similarity, and the ids of the ranked rows in df, best first"""
 
-    # Embeddings are already generated, just compute similarity
-    df = similarity_search(df, input_embedding)
-    df = add_index(df, "score_semantic", "i_semantic")
-    df.sort_values(by="score_semantic", ascending=False, inplace=True)
+    # Embeddings are already generated, just search them. Small job sets are searched
+    # exactly, large ones with the configured approximate index
+    index = get_vector_index_store().get(embedding_matrix(df, "embedding"))
+    ids, scores = semantic_ranking(index, input_embedding)
+
+    # reorder once by rank instead of writing the scores and sorting the frame,
+    # rows an approximate index did not rank follow without a score or a rank
+    rest = np.setdiff1d(np.arange(len(df)), ids)
+    df = df.iloc[np.concatenate([ids, rest])].reset_index(drop=True)
+    df["score_semantic"] = np.concatenate([scores, np.full(len(rest), np.nan)])
+    ranks = pd.array([pd.NA] * len(df), dtype="Int64")
+    ranks[: len(ids)] = np.arange(len(ids))
+    df["i_semantic"] = ranks
     new_cols = {"score_semantic": "Rank S"}
     display_df(df, new_cols, data_source)
-    return df
+    return df, ids
 
 
 def process_lexical_search(
-    df: pd.DataFrame, input_text: str, data_source: str = "reed"
-):
-    df = lexical_search(input_text, df, "description")
-    df.sort_values(by="score_lexical", ascending=False, inplace=True)
+    df: pd.DataFrame, input_text: str, data_source: str = "reed", k: int = HYBRID_CANDIDATES
+) -> tuple[np.ndarray, np.ndarray]:
+    """The ids of the k best rows in df, best first, and the score of every row"""
+    # static datasets keep their index on disk, reed results change with every search
+    store = get_lexical_index_store() if data_source != "reed" else None
+    # only the rows that are shown or fused get ranked
+    ids, scores, all_scores = lexical_retrieve(
+        input_text, df["description"].tolist(), max(k, TABLE_SIZE), store, full=True
+    )
     new_cols = {"score_lexical": "Rank L"}
-    display_df(df, new_cols, data_source)
+    display_df(df.iloc[ids].assign(score_lexical=scores), new_cols, data_source)
+    return ids, all_scores  # type: ignore
 
 
 def process_reranker_search(
-    df: pd.DataFrame, input_text: str, data_source: str = "reed"
+    df: pd.DataFrame,
+    input_text: str,
+    data_source: str = "reed",
+    reranker: RerankBackend | None = None,
 ) -> pd.DataFrame:
-    df = rerank_cohere(input_text, df)
+    reranker = reranker or get_rerank_backend()
+    df = rerank_df(input_text, df, reranker)
     df = add_index(df, "score_reranker", "i_reranker")
     df.sort_values(by="score_reranker", ascending=False, inplace=True)
     new_cols = {"score_reranker": "Rank R"}
     display_df(df, new_cols, data_source)
+
+    stats = get_rerank_cache(reranker.model).stats()
+    st.caption(
+        f"Rerank cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)"
+    )
+    return df
+
+
+def process_hybrid_search(
+    df: pd.DataFrame,
+    input_text: str,
+    input_embedding: list,
+    lexical: tuple[np.ndarray, np.ndarray],
+    semantic_ids: np.ndarray,
+    data_source: str = "reed",
+    n: int = HYBRID_CANDIDATES,
+    fusion: str = HYBRID_FUSION,
+    reranker: RerankBackend | None = None,
+) -> pd.DataFrame:
+    # df is in the order the lexical and semantic rankings were made on
+    ids, scores = hybrid_search(
+        input_text,
+        input_embedding,
+        df,
+        "description",
+        n,
+        fusion,
+        lexical=lexical,
+        semantic_ids=semantic_ids,
+    )
+
+    # only the shortlist is sent to the reranker
+    shortlist = df.iloc[ids].assign(score_hybrid=scores).reset_index(drop=True)
+    return process_reranker_search(shortlist, input_text, data_source, reranker)
+
+
+def process_permutation(
+    df: pd.DataFrame,
+    input_text: str,
+    data_source: str = "reed",
+    top_k: int = PERMUTATION_TOP_K,
+) -> pd.DataFrame:
+    # the ranking is shown while the windows of every pass stream in
+    table = st.empty()
+    head = df.iloc[:top_k].reset_index(drop=True)
+
+    def show_partial(positions: list[int]) -> None:
+        ranked = head.iloc[positions].assign(i_permutation=range(len(positions)))
+        display_df(ranked, {"i_permutation": "Rank P"}, data_source, table)
+
+    with st.spinner():
+        df = permutation_openai(
+            input_text, df, top_k=top_k, stream=True, on_update=show_partial
+        )
+    display_df(df, {"i_permutation": "Rank P"}, data_source, table)
+
+    cache = get_llm_cache()
+    st.caption(f"LLM cache: {cache.hits} hits, {cache.misses} misses")
     return df
 
 
+def process_similar_jobs(
+    df: pd.DataFrame,
+    jobs: pd.DataFrame,
+    graph: KnnGraph,
+    data_source: str = "reed",
+    shown: int = SIMILAR_JOBS_SHOWN,
+    k: int = SIMILAR_JOBS,
+) -> None:
+    # jobs are the graph's rows in order, df rows point into them through i_knn
+    for _, row in df.head(shown).iterrows():
+        neighbors, distances = graph.neighbors(int(row["i_knn"]), k)
+        with st.expander(f"More jobs like {row['title']}"):
+            similar = jobs.iloc[neighbors].assign(distance_knn=distances)
+            display_df(similar, {"distance_knn": "Distance"}, data_source)
+
+
 def process_semantic_delta(df: pd.DataFrame, data_source: str) -> pd.DataFrame:
     df["delta_semantic"] = df["index"] - df["i_semantic"]
     df.sort_values(by="delta_semantic", ascending=False, inplace=True)
@@ -118,8 +293,10 @@ def process_semantic_delta(df: pd.DataFrame, data_source: str) -> pd.DataFrame:
     return df
 
 
-def display_df(df: pd.DataFrame, display_cols: dict, data_source: str) -> None:
+def display_df(
+    df: pd.DataFrame, display_cols: dict, data_source: str, container=st
+) -> None:
     display_columns = IntersectJob.get_display_columns()
     display_cols.update(display_columns)
     _df = df.rename(columns=display_cols)
-    st.dataframe(_df[display_cols.values()].head(TABLE_SIZE), hide_index=True)
+    container.dataframe(_df[display_cols.values()].head(TABLE_SIZE), hide_index=True)
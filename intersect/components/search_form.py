@@ -1,6 +1,15 @@
 import streamlit as st
 from utils.read_pdf import get_text_from_pdf
-from config.constants import DEFAULT_INPUT_TEXT, DEFAULT_KEYWORDS
+from config.constants import (
+    DEFAULT_INPUT_TEXT,
+    DEFAULT_KEYWORDS,
+    HYBRID_CANDIDATES,
+    HYBRID_FUSION,
+    PERMUTATION_ENABLED,
+    VISUALIZATION_MODE,
+)
+from algorithms.hybrid_search import FUSION_METHODS
+from algorithms.dimensionality_reduction import VISUALIZATION_MODES
 
 
 def render_search_form():
@@ -65,6 +74,39 @@ def render_search_form():
                     "Full time only", value=True, help="Show only full-time positions"
                 )
 
+            col1, col2 = st.columns(2)
+
+            with col1:
+                hybrid_candidates = st.number_input(
+                    "Hybrid candidates",
+                    min_value=1,
+                    max_value=100,
+                    step=5,
+                    value=HYBRID_CANDIDATES,
+                    help="Jobs taken from each of keyword and semantic search for reranking. Fewer is faster.",
+                )
+
+            with col2:
+                fusion = st.selectbox(
+                    "Hybrid fusion",
+                    FUSION_METHODS,
+                    index=FUSION_METHODS.index(HYBRID_FUSION),
+                    help="Reciprocal rank fusion or weighted score fusion",
+                )
+
+            visualization = st.selectbox(
+                "Cluster visualization",
+                VISUALIZATION_MODES,
+                index=VISUALIZATION_MODES.index(VISUALIZATION_MODE),
+                help="Fast reduces the embeddings with PCA first and uses every core",
+            )
+
+            permutation = st.checkbox(
+                "LLM permutation",
+                value=PERMUTATION_ENABLED,
+                help="Reorder the hybrid ranking with an llm. Slower, and costs several llm calls per search",
+            )
+
         st.write("")
         st.write("## About you")
 
@@ -97,4 +139,8 @@ def render_search_form():
             "full_time": full_time,
             "input_text": input_text,
             "data_source": data_source,
+            "hybrid_candidates": hybrid_candidates,
+            "fusion": fusion,
+            "visualization": visualization,
+            "permutation": permutation,
         }
@@ -18,4 +18,97 @@ DISPLAY_COLUMNS = {
     "expiration_date": "Expires",
     'description': 'Description',
     'job_url': 'URL',
-}
\ No newline at end of file
+}
+
+# Embedding constants
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_MAX_INPUT_TOKENS = 8000  # per text, model limit is 8191
+EMBEDDING_MAX_BATCH_TOKENS = 300_000  # per request, api limit
+EMBEDDING_MAX_BATCH_SIZE = 2048  # inputs per request, api limit
+EMBEDDING_REQUESTS_PER_MINUTE = 3000  # tier 1 account limits
+EMBEDDING_TOKENS_PER_MINUTE = 1_000_000
+EMBEDDING_MAX_CONCURRENCY = 8
+EMBEDDING_MAX_ATTEMPTS = 6
+EMBEDDING_DIMENSIONS = 1536
+EMBEDDING_CACHE_MAX_ROWS = 200_000
+EMBEDDING_CACHE_LRU_SIZE = 10_000
+EMBEDDING_CHUNK_OVERLAP = 200  # tokens shared by consecutive windows of long texts
+EMBEDDING_PASSAGE_TOKENS = 512  # window size for passage level vectors
+EMBEDDING_BACKEND = "openai"  # openai, local or hashing; overridden by the EMBEDDING_BACKEND env var
+LOCAL_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+LOCAL_EMBEDDING_BATCH_SIZE = 32
+HASHING_EMBEDDING_DIMENSIONS = 384
+
+# Vector search constants
+VECTOR_INDEX = "ivf"  # exact, ivf, float16, int8, binary or matryoshka; overridden by the VECTOR_INDEX env var
+VECTOR_INDEX_MEMORY_SIZE = 8  # indexes kept in memory, one per job set and kind
+SEMANTIC_TOP_K = 100  # rows ranked by an approximate index, the rest are left unranked
+ANN_MIN_ROWS = 20_000  # below this brute force search is fast enough, whatever the index
+ANN_N_PROBE = 8  # lists scanned per query, the recall/latency knob of the IVF index
+QUANTIZED_RESCORE_FACTOR = 4  # candidates rescored at full precision per result
+MATRYOSHKA_DIMENSIONS = 256  # dimensions scanned in the first pass of coarse-to-fine search
+MATRYOSHKA_CANDIDATES = 300  # candidates rescored with every dimension
+
+# Lexical search constants
+LEXICAL_INDEX_DIR = "lexical_index"  # saved BM25 indexes, one directory per corpus
+LEXICAL_INDEX_MEMORY_SIZE = 8  # indexes kept memory mapped, least recently used are dropped
+LEXICAL_INDEX_MAX_SAVED = 32  # indexes kept on disk, least recently used are deleted
+LEXICAL_MAX_SEGMENTS = 8  # appended batches kept apart before they are merged
+LEXICAL_COMPACT_RATIO = 0.25  # fraction of removed documents that triggers a compaction
+LEXICAL_TOP_K = 100  # documents ranked by lexical search, the rest only get a score
+
+# Hybrid search constants
+HYBRID_CANDIDATES = 20  # top n taken from each of lexical and semantic search
+HYBRID_FUSION = "rrf"  # rrf or weighted
+HYBRID_LEXICAL_WEIGHT = 0.5  # share of the lexical score in weighted fusion
+RRF_K = 60  # damping constant of reciprocal rank fusion, 60 in the original paper
+
+# Reranking constants
+RERANK_BACKEND = "cohere"  # cohere, local or overlap; overridden by the RERANK_BACKEND env var
+RERANK_MODEL = "rerank-v3.5"
+RERANK_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+RERANK_CACHE_MAX_ROWS = 500_000
+RERANK_MAX_CANDIDATES = 200  # rows past this are not reranked, pass a shortlist
+RERANK_MAX_BATCH_SIZE = 100  # documents per request, the api allows up to 1000
+RERANK_MAX_CONCURRENCY = 8
+RERANK_MAX_ATTEMPTS = 5
+LOCAL_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L6-v2"
+LOCAL_RERANK_MAX_LENGTH = 512  # tokens per (query, document) pair, longer ones are truncated
+LOCAL_RERANK_BATCH_TOKENS = 8192  # padded tokens per batch
+LOCAL_RERANK_MAX_BATCH_SIZE = 32
+
+# LLM permutation constants
+PERMUTATION_ENABLED = False  # off by default, it makes several llm calls per search
+PERMUTATION_MODEL = "gpt-4o-mini"
+PERMUTATION_TOP_K = 50  # rows reordered by the llm, the rest keep their place
+PERMUTATION_WINDOW = 10  # items per prompt
+PERMUTATION_STEP = 5  # items the window slides up by, consecutive windows overlap by the rest
+PERMUTATION_PASSES = 1  # each pass brings the best item to the top
+PERMUTATION_MAX_CONCURRENCY = 8
+PERMUTATION_MAX_ATTEMPTS = 5
+LLM_CACHE_MAX_ROWS = 10_000  # cached responses, least recently used are evicted
+
+# Projection constants
+PROJECTION_DIR = "projections"  # fitted UMAP models, one directory per job set
+PROJECTION_MEMORY_SIZE = 8  # fitted models kept in memory, least recently used are dropped
+PROJECTION_MAX_SAVED = 32  # fitted models kept on disk, least recently used are deleted
+VISUALIZATION_MODE = "exact"  # exact (seeded, single thread) or fast (pca, all cores)
+FAST_PCA_COMPONENTS = 50  # dimensions kept by pca before umap in fast mode
+
+# k-NN graph constants
+KNN_NEIGHBORS = 15  # UMAP's n_neighbors, so the graph can be fed to it
+SIMILAR_JOBS = 5  # neighbours listed under "more jobs like this"
+SIMILAR_JOBS_SHOWN = 5  # top results that get a "more jobs like this"
+
+# Cluster labelling constants
+CLUSTER_TOP_TERMS = 8  # c-TF-IDF terms kept per cluster, shown in tooltips
+CLUSTER_LEGEND_TERMS = 3  # terms in a cluster's legend entry
+
+# Warm-up constants
+NUMBA_CACHE_DIR = ".numba_cache"  # compiled umap/pynndescent functions, kept across restarts
+WARMUP_ROWS = 64  # size of the fits that trigger compilation at startup
+WARMUP_DIMENSIONS = 64
+
+# Passage extraction constants
+PASSAGE_TOKENS = 64  # size of the passages a description is split into
+PASSAGE_TOKEN_BUDGET = 256  # per description sent to a reranker or llm, 0 sends it whole
@@ -1,10 +1,12 @@
 import pandas as pd
 import json
+import pyarrow as pa
 from typing import Optional, Dict, Any, List
 from pathlib import Path
 
 from .types import IntersectJob
 from .adapters import theirstack_jobs_to_intersect_jobs
+from utils.embedding_store import is_fixed_size_embedding, read_feather
 
 
 class TheirstackAPI:
@@ -13,6 +15,8 @@ class TheirstackAPI:
     def __init__(self, data_path: str):
         """Initialize the Theirstack API client"""
         self.data_path = Path(__file__).parent.parent / data_path
+        self.embeddings: pa.ChunkedArray | None = None
+        self.embedding_space: str | None = None
         self._load_data()
 
     def _load_data(self):
@@ -20,7 +24,14 @@ class TheirstackAPI:
         try:
             # Try to load as feather first, fallback to CSV
             if self.data_path.suffix == ".feather":
-                self.df = pd.read_feather(self.data_path)
+                # embeddings are memory mapped rather than loaded as python lists
+                self.df = read_feather(self.data_path)
+                # kept out of the rows, search_jobs_df attaches it as an Arrow column
+                if "embedding" in self.df.columns and is_fixed_size_embedding(
+                    self.df["embedding"]
+                ):
+                    self.embeddings = self.df.pop("embedding").array.__arrow_array__()
+                    self.embedding_space = self.df.attrs.get("embedding_space")
                 # For feather files, JSON columns should already be parsed
                 # If they're still strings, parse them
                 if "company" in self.df.columns and isinstance(
@@ -81,15 +92,38 @@ class TheirstackAPI:
             full_time: Filter for full-time jobs
 
         Returns:
-            List of job dictionaries
+            List of job dictionaries, without embeddings when the file stores them as
+            FixedSizeList (use search_jobs_df)
+        """
+        return self._to_jobs(self._sample(results_to_take))
+
+    def search_jobs_df(self, results_to_take: int = 100, **filters) -> pd.DataFrame:
+        """Same jobs as search_jobs, as a dataframe whose embedding column stays in Arrow.
+
+        The sampled embeddings are taken from the memory mapped column in one Arrow
+        call, so no Python list is made per job. Filters are ignored, as in search_jobs.
         """
+        filtered_df = self._sample(results_to_take)
+        df = pd.DataFrame([job.to_dict() for job in self._to_jobs(filtered_df)])
+
+        if self.embeddings is not None:
+            # the loaded frame has a RangeIndex, so its labels are row positions
+            embeddings = self.embeddings.take(pa.array(filtered_df.index.to_numpy()))
+            df["embedding"] = pd.Series(pd.arrays.ArrowExtensionArray(embeddings), index=df.index)
+            # the model the file's embeddings were made with, when it was recorded
+            df["embedding_space"] = self.embedding_space
+        return df
+
+    def _sample(self, results_to_take: int) -> pd.DataFrame:
         # Load entire dataset without filtering
-        filtered_df = self.df.copy()
+        filtered_df = self.df
 
         # Only limit results if specified
         if results_to_take and results_to_take < len(filtered_df):
             filtered_df = filtered_df.sample(results_to_take)
+        return filtered_df
 
+    def _to_jobs(self, filtered_df: pd.DataFrame) -> list[IntersectJob]:
         # Convert to list of dictionaries with essential columns
         jobs = []
         for _, row in filtered_df.iterrows():
@@ -112,7 +146,7 @@ class TheirstackAPI:
                 "posted": row["date_posted"],
             }
 
-            # Include embedding if it exists in the feather file
+            # Include embedding if the file stores it as lists (not migrated yet)
             if "embedding" in row:
                 job["embedding"] = row["embedding"]
 
@@ -2,6 +2,11 @@ import streamlit as st
 from dotenv import load_dotenv
 import logging
 
+from utils.warmup import enable_compile_cache, start_warmup
+
+# before anything imports numba
+enable_compile_cache()
+
 from components.search_form import render_search_form
 from components.job_search import build_search_params, search_jobs, display_job_stats
 from components.results_display import process_search
@@ -17,6 +22,9 @@ logging.basicConfig(
 
 load_dotenv()
 
+# compile umap and hdbscan in the background while the form is filled in
+start_warmup()
+
 st.title("Intersect")
 
 st.write(
@@ -47,6 +55,14 @@ if form_data["submit"]:
         st.write("Tables and figures are interactive. Double click the description to read it.")
 
         display_job_stats(df)
-        process_search(df, form_data["input_text"], form_data["data_source"])
+        process_search(
+            df,
+            form_data["input_text"],
+            form_data["data_source"],
+            form_data["hybrid_candidates"],
+            form_data["fusion"],
+            form_data["visualization"],
+            form_data["permutation"],
+        )
 
 render_footer()
@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import time
+from openai import (
+    AsyncOpenAI,
+    APIConnectionError,
+    APIStatusError,
+    RateLimitError,
+)
+from tenacity import (
+    AsyncRetrying,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+
+from config.constants import (
+    EMBEDDING_MODEL,
+    EMBEDDING_MAX_BATCH_TOKENS,
+    EMBEDDING_MAX_BATCH_SIZE,
+    EMBEDDING_REQUESTS_PER_MINUTE,
+    EMBEDDING_TOKENS_PER_MINUTE,
+    EMBEDDING_MAX_CONCURRENCY,
+    EMBEDDING_MAX_ATTEMPTS,
+)
+from utils.embedding import (
+    count_tokens,
+    dimensions_option,
+    make_batches,
+    validate_text,
+)
+from utils.utils import run_blocking
+
+logger = logging.getLogger(__name__)
+
+# https://platform.openai.com/docs/guides/rate-limits
+# https://tenacity.readthedocs.io/en/latest/
+
+
+def is_retryable(exception: BaseException) -> bool:
+    """Retry rate limits, server errors and dropped connections"""
+    if isinstance(exception, (RateLimitError, APIConnectionError)):
+        return True
+    if isinstance(exception, APIStatusError):
+        return exception.status_code >= 500
+    return False
+
+
+class RateLimiter:
+    """Token bucket limiting both requests per minute and tokens per minute"""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.capacity = (float(requests_per_minute), float(tokens_per_minute))
+        self.available = list(self.capacity)
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self.updated_at
+        self.updated_at = now
+        for i, capacity in enumerate(self.capacity):
+            self.available[i] = min(capacity, self.available[i] + elapsed * capacity / 60)
+
+    async def acquire(self, n_tokens: int) -> None:
+        """Wait until one request of n_tokens fits in the budget"""
+        # a single request larger than the budget would otherwise wait forever
+        needed = (1.0, min(float(n_tokens), self.capacity[1]))
+
+        async with self.lock:
+            while True:
+                self._refill()
+                missing = [need - have for need, have in zip(needed, self.available)]
+                if all(m <= 0 for m in missing):
+                    self.available = [
+                        have - need for have, need in zip(self.available, needed)
+                    ]
+                    return
+                wait = max(m * 60 / c for m, c in zip(missing, self.capacity) if m > 0)
+                await asyncio.sleep(wait)
+
+
+class AsyncEmbeddingEngine:
+    """Embeds batches of texts concurrently within the account's rate limits"""
+
+    def __init__(
+        self,
+        client: AsyncOpenAI | None = None,
+        model: str = EMBEDDING_MODEL,
+        dimensions: int | None = None,
+        requests_per_minute: int = EMBEDDING_REQUESTS_PER_MINUTE,
+        tokens_per_minute: int = EMBEDDING_TOKENS_PER_MINUTE,
+        max_concurrency: int = EMBEDDING_MAX_CONCURRENCY,
+        max_attempts: int = EMBEDDING_MAX_ATTEMPTS,
+        max_batch_tokens: int = EMBEDDING_MAX_BATCH_TOKENS,
+        max_batch_size: int = EMBEDDING_MAX_BATCH_SIZE,
+    ):
+        # retries are handled here so they count against the rate limiter
+        self.client = client or AsyncOpenAI(max_retries=0)
+        self.model = model
+        self.dimensions = dimensions
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_attempts = max_attempts
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+
+    async def embed(
+        self, texts: list[str], token_counts: list[int] | None = None
+    ) -> list[list[float]]:
+        """Embed texts, returning the embeddings in input order.
+
+        token_counts can be passed when the caller has already tokenized the texts.
+        """
+        if not texts:
+            return []
+
+        start_time = time.time()
+
+        if token_counts is None:
+            token_counts = count_tokens(texts, self.model)
+        for text, n_tokens in zip(texts, token_counts):
+            validate_text(text, n_tokens)
+
+        batches = make_batches(token_counts, self.max_batch_tokens, self.max_batch_size)
+        results = await asyncio.gather(
+            *(
+                self._embed_batch(
+                    [texts[i] for i in batch], sum(token_counts[i] for i in batch)
+                )
+                for batch in batches
+            )
+        )
+
+        embeddings: list[list[float]] = [[] for _ in texts]
+        for batch, batch_embeddings in zip(batches, results):
+            for i, embedding in zip(batch, batch_embeddings):
+                embeddings[i] = embedding
+
+        elapsed_time = time.time() - start_time
+        logger.info(
+            f"Embedded {len(texts)} texts in {len(batches)} requests in {elapsed_time:.2f} seconds"
+        )
+
+        return embeddings
+
+    async def _embed_batch(self, texts: list[str], n_tokens: int) -> list[list[float]]:
+        retrying = AsyncRetrying(
+            retry=retry_if_exception(is_retryable),
+            wait=wait_random_exponential(multiplier=0.5, max=30),
+            stop=stop_after_attempt(self.max_attempts),
+            before_sleep=lambda state: logger.warning(
+                f"Embedding request failed ({state.outcome.exception()}), retrying"  # type: ignore
+            ),
+            reraise=True,
+        )
+
+        async for attempt in retrying:
+            with attempt:
+                await self.limiter.acquire(n_tokens)
+                async with self.semaphore:
+                    res = await self.client.embeddings.create(
+                        model=self.model,
+                        input=texts,
+                        encoding_format="float",
+                        **dimensions_option(self.dimensions),
+                    )
+
+        data = sorted(res.data, key=lambda item: item.index)  # type: ignore
+        return [item.embedding for item in data]
+
+
+def embed_texts(
+    texts: list[str], token_counts: list[int] | None = None, **engine_kwargs
+) -> list[list[float]]:
+    """Blocking wrapper around AsyncEmbeddingEngine for Streamlit and scripts"""
+
+    async def run() -> list[list[float]]:
+        # the engine owns an http client bound to the event loop that creates it
+        return await AsyncEmbeddingEngine(**engine_kwargs).embed(texts, token_counts)
+
+    return run_blocking(run)
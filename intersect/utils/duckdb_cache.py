@@ -0,0 +1,125 @@
+import duckdb
+import logging
+import threading
+import pandas as pd
+from functools import lru_cache
+
+from config.constants import DB_NAME
+
+logger = logging.getLogger(__name__)
+
+# The embedding, rerank and llm caches are tables in the app's DuckDB file. They share
+# one connection per file, the storage of rows by key and the eviction: rows past their
+# ttl are deleted and, once a table grows past max_rows, the least recently used ones.
+# Subclasses only declare their table and add the lookups for their key.
+
+# - https://duckdb.org/docs/api/python/overview.html
+
+
+@lru_cache(maxsize=None)
+def connect(path: str = DB_NAME) -> tuple[duckdb.DuckDBPyConnection, threading.Lock]:
+    """One connection per database file per process, and the lock that guards it.
+
+    duckdb connections must not be shared between threads without a lock.
+    """
+    return duckdb.connect(path), threading.Lock()
+
+
+class DuckDBCache:
+    """Rows by key in a DuckDB table, least recently used evicted past max_rows.
+
+    Subclasses set TABLE, COLUMNS (every column but last_used, in insert order), KEY
+    (the primary key columns) and ITEMS (what a row holds, for the logs). With a
+    ttl_seconds, COLUMNS must include a created_at TIMESTAMP and older rows are
+    ignored by fresh() lookups and deleted on eviction.
+    """
+
+    TABLE: str
+    COLUMNS: str
+    KEY: str
+    ITEMS: str
+
+    def __init__(self, path: str = DB_NAME, max_rows: int = 0, ttl_seconds: int | None = None):
+        self.max_rows = max_rows
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.conn, self.lock = connect(path)
+        with self.lock:
+            self._create_table()
+
+    def _create_table(self) -> None:
+        self.conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {self.TABLE} (
+                {self.COLUMNS},
+                last_used TIMESTAMP,
+                PRIMARY KEY ({self.KEY})
+            )
+            """
+        )
+        # a table from an older layout is dropped, a cache can always be filled again
+        columns = [row[0] for row in self.conn.execute(f"DESCRIBE {self.TABLE}").fetchall()]
+        expected = [column.split()[0] for column in self.COLUMNS.split(",")] + ["last_used"]
+        if columns != expected:
+            logger.warning(f"Dropping {self.TABLE}, its columns changed")
+            self.conn.execute(f"DROP TABLE {self.TABLE}")
+            self._create_table()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict[str, float]:
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate}
+
+    def count(self, where: str = "TRUE", params: list | None = None) -> int:
+        """Rows matching the condition"""
+        with self.lock:
+            result = self.conn.execute(
+                f"SELECT count(*) FROM {self.TABLE} WHERE {where}", params or []
+            ).fetchone()
+        return result[0] if result else 0
+
+    def fresh(self) -> str:
+        """Condition on rows younger than the ttl, for the WHERE of a lookup"""
+        if self.ttl_seconds is None:
+            return "TRUE"
+        return f"created_at > now()::TIMESTAMP - to_seconds({int(self.ttl_seconds)})"
+
+    def touch(self, where: str, params: list) -> None:
+        """Mark rows as used now, call with the lock held"""
+        self.conn.execute(f"UPDATE {self.TABLE} SET last_used = now() WHERE {where}", params)
+
+    def insert(self, rows: pd.DataFrame, select: str, params: list) -> None:
+        """INSERT OR REPLACE the result of select, which reads the rows as new_rows.
+
+        select lists the COLUMNS and then last_used. Evicts once the rows are in.
+        """
+        with self.lock:
+            self.conn.register("new_rows", rows)
+            try:
+                self.conn.execute(
+                    f"INSERT OR REPLACE INTO {self.TABLE} {select} FROM new_rows", params
+                )
+            finally:
+                self.conn.unregister("new_rows")
+            self._evict()
+
+    def _evict(self) -> None:
+        if self.ttl_seconds is not None:
+            self.conn.execute(f"DELETE FROM {self.TABLE} WHERE NOT ({self.fresh()})")
+
+        result = self.conn.execute(f"SELECT count(*) FROM {self.TABLE}").fetchone()
+        excess = (result[0] if result else 0) - self.max_rows
+        if excess > 0:
+            self.conn.execute(
+                f"""
+                DELETE FROM {self.TABLE} WHERE rowid IN (
+                    SELECT rowid FROM {self.TABLE} ORDER BY last_used LIMIT ?
+                )
+                """,
+                [excess],
+            )
+            logger.info(f"Evicted {excess} {self.ITEMS}")
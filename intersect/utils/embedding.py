@@ -1,39 +1,131 @@
 import pandas as pd
 from dotenv import load_dotenv
 from openai import OpenAI
+from functools import lru_cache
 import tiktoken
 import time
 
+from config.constants import (
+    EMBEDDING_MODEL,
+    EMBEDDING_MAX_INPUT_TOKENS,
+    EMBEDDING_MAX_BATCH_TOKENS,
+    EMBEDDING_MAX_BATCH_SIZE,
+)
 
-def get_embedding(client: OpenAI, text: str, model="text-embedding-3-small"):
 
-    def num_tokens_from_string(string: str, model="text-embedding-3-small") -> int:
-        encoding = tiktoken.encoding_for_model(model)
-        num_tokens = len(encoding.encode(string))
-        return num_tokens
+@lru_cache(maxsize=None)
+def get_encoding(model: str = EMBEDDING_MODEL) -> tiktoken.Encoding:
+    """Load the tokenizer for a model once per process"""
+    return tiktoken.encoding_for_model(model)
 
+
+def num_tokens_from_string(string: str, model: str = EMBEDDING_MODEL) -> int:
+    return len(get_encoding(model).encode(string))
+
+
+def count_tokens(texts: list[str], model: str = EMBEDDING_MODEL) -> list[int]:
+    return [len(tokens) for tokens in get_encoding(model).encode_batch(texts)]
+
+
+def validate_text(text: str | None, num_tokens: int) -> None:
     if text is None:
         raise Exception("Text is None")
 
     if text == "":
         raise Exception("Text is empty")
 
-    if num_tokens_from_string(text) > 8000:
+    if num_tokens > EMBEDDING_MAX_INPUT_TOKENS:
         raise Exception("Text too long")
 
-    res = client.embeddings.create(model=model, input=text, encoding_format="float")
+
+def dimensions_option(dimensions: int | None) -> dict:
+    """text-embedding-3 models can return shortened (matryoshka) embeddings"""
+    return {"dimensions": dimensions} if dimensions else {}
+
+
+def get_embedding(
+    client: OpenAI, text: str, model=EMBEDDING_MODEL, dimensions: int | None = None
+):
+
+    validate_text(text, num_tokens_from_string(text, model) if text else 0)
+
+    res = client.embeddings.create(
+        model=model,
+        input=text,
+        encoding_format="float",
+        **dimensions_option(dimensions),
+    )
 
     return res.data[0].embedding
 
 
+def make_batches(
+    token_counts: list[int],
+    max_tokens: int = EMBEDDING_MAX_BATCH_TOKENS,
+    max_items: int = EMBEDDING_MAX_BATCH_SIZE,
+) -> list[list[int]]:
+    """Group consecutive positions into batches that fit the per-request limits"""
+    batches = []
+    batch: list[int] = []
+    batch_tokens = 0
+
+    for i, n_tokens in enumerate(token_counts):
+        if batch and (batch_tokens + n_tokens > max_tokens or len(batch) >= max_items):
+            batches.append(batch)
+            batch = []
+            batch_tokens = 0
+        batch.append(i)
+        batch_tokens += n_tokens
+
+    if batch:
+        batches.append(batch)
+
+    return batches
+
+
+def get_embeddings(
+    client: OpenAI,
+    texts: list[str],
+    model=EMBEDDING_MODEL,
+    dimensions: int | None = None,
+) -> list[list[float]]:
+    """Embed many texts with as few requests as the api limits allow.
+
+    Returns the embeddings in the same order as the input texts.
+    """
+    if not texts:
+        return []
+
+    token_counts = count_tokens(texts, model)
+    for text, n_tokens in zip(texts, token_counts):
+        validate_text(text, n_tokens)
+
+    embeddings: list[list[float]] = [[] for _ in texts]
+    for batch in make_batches(token_counts):
+        res = client.embeddings.create(
+            model=model,
+            input=[texts[i] for i in batch],
+            encoding_format="float",
+            **dimensions_option(dimensions),
+        )
+        # the api returns one item per input, tagged with its position in the batch
+        for item in res.data:
+            embeddings[batch[item.index]] = item.embedding
+
+    return embeddings
+
+
 def generate_embeddings(df: pd.DataFrame) -> pd.DataFrame:
     """Generate embeddings for all jobs in the database. Requires a column called 'description'."""
 
+    # imported here as the embedding cache builds on the helpers in this module
+    from utils.embedding_cache import embed_with_cache
+
     load_dotenv()
-    client = OpenAI()
 
     start_time = time.time()
-    df["embedding"] = df["description"].apply(lambda x: get_embedding(client, x))
+    embeddings = embed_with_cache(df["description"].tolist())
+    df["embedding"] = pd.Series(embeddings, index=df.index)
     end_time = time.time()
 
     print(
@@ -0,0 +1,164 @@
+import hashlib
+import logging
+import os
+import re
+import time
+import numpy as np
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from config.constants import (
+    EMBEDDING_BACKEND,
+    EMBEDDING_MODEL,
+    EMBEDDING_DIMENSIONS,
+    LOCAL_EMBEDDING_MODEL,
+    LOCAL_EMBEDDING_BATCH_SIZE,
+    HASHING_EMBEDDING_DIMENSIONS,
+)
+from utils.long_documents import embed_long_texts
+
+logger = logging.getLogger(__name__)
+
+# - https://sbert.net/docs/sentence_transformer/pretrained_models.html
+# - https://scikit-learn.org/stable/modules/feature_extraction.html#feature-hashing
+
+
+class EmbeddingBackend(ABC):
+    """Turns texts into vectors. The (model, dimensions) pair identifies the vector space."""
+
+    name: str
+    model: str
+    dimensions: int
+
+    @property
+    def space(self) -> str:
+        """Tag kept with stored embeddings, the same only for vectors that can be compared"""
+        return f"{self.model}:{self.dimensions}"
+
+    @abstractmethod
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        """Embed texts, returning the embeddings in input order"""
+
+
+class OpenAIBackend(EmbeddingBackend):
+    """OpenAI embeddings api, through the async engine with long text pooling.
+
+    Fewer dimensions than the model's native size returns shortened embeddings.
+    """
+
+    name = "openai"
+
+    def __init__(self, model: str = EMBEDDING_MODEL, dimensions: int = EMBEDDING_DIMENSIONS):
+        self.model = model
+        self.dimensions = dimensions
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        # only ask for shortened vectors, so models without the option keep working
+        dimensions = self.dimensions if self.dimensions != EMBEDDING_DIMENSIONS else None
+        return embed_long_texts(texts, model=self.model, dimensions=dimensions)
+
+
+class LocalBackend(EmbeddingBackend):
+    """sentence-transformers model running on the cpu.
+
+    Texts are split into batches which are encoded on a thread pool; torch releases
+    the GIL during inference so the batches run in parallel.
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        model: str = LOCAL_EMBEDDING_MODEL,
+        batch_size: int = LOCAL_EMBEDDING_BATCH_SIZE,
+        max_workers: int | None = None,
+    ):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "The local embedding backend needs sentence-transformers. "
+                "Install it with `uv sync --extra local`."
+            ) from e
+
+        self.model = model
+        self.batch_size = batch_size
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.encoder = SentenceTransformer(model, device="cpu")
+        self.dimensions = int(self.encoder.get_sentence_embedding_dimension())  # type: ignore
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        start_time = time.time()
+
+        batches = [
+            texts[i : i + self.batch_size] for i in range(0, len(texts), self.batch_size)
+        ]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = executor.map(self._encode, batches)
+            embeddings = [vector for batch in results for vector in batch]
+
+        elapsed_time = time.time() - start_time
+        logger.info(f"Embedded {len(texts)} texts locally in {elapsed_time:.2f} seconds")
+
+        return embeddings
+
+    def _encode(self, batch: list[str]) -> list[list[float]]:
+        vectors = self.encoder.encode(
+            batch, batch_size=len(batch), normalize_embeddings=True, convert_to_numpy=True
+        )
+        return vectors.tolist()  # type: ignore
+
+
+class HashingBackend(EmbeddingBackend):
+    """Deterministic feature hashing of words and word pairs.
+
+    No model and no network, so it is meant for tests, benchmarks and load tests
+    rather than for relevance.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dimensions: int = HASHING_EMBEDDING_DIMENSIONS):
+        self.model = "hashing"
+        self.dimensions = dimensions
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed_one(text) for text in texts]
+
+    def _embed_one(self, text: str) -> list[float]:
+        words = re.findall(r"\w+", text.lower())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+        vector = np.zeros(self.dimensions, dtype=np.float64)
+        for feature in features:
+            digest = int.from_bytes(
+                hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little"
+            )
+            # the lowest bit picks the sign so collisions tend to cancel out
+            sign = 1.0 if digest & 1 else -1.0
+            vector[(digest >> 1) % self.dimensions] += sign
+
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+
+def get_embedding_backend(name: str | None = None) -> EmbeddingBackend:
+    """Backend named by the EMBEDDING_BACKEND environment variable, openai by default"""
+    return _create_backend(name or os.getenv("EMBEDDING_BACKEND", EMBEDDING_BACKEND))
+
+
+@lru_cache(maxsize=None)
+def _create_backend(name: str) -> EmbeddingBackend:
+    """One instance per backend per process, local models are slow to load"""
+    match name:
+        case "openai":
+            return OpenAIBackend()
+        case "local":
+            return LocalBackend()
+        case "hashing":
+            return HashingBackend()
+        case _:
+            raise ValueError(f"Invalid embedding backend: {name}")
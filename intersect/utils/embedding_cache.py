@@ -0,0 +1,149 @@
+import hashlib
+import logging
+import pandas as pd
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional
+
+from config.constants import (
+    DB_NAME,
+    EMBEDDING_MODEL,
+    EMBEDDING_DIMENSIONS,
+    EMBEDDING_CACHE_MAX_ROWS,
+    EMBEDDING_CACHE_LRU_SIZE,
+)
+from utils.embedding_backends import EmbeddingBackend, get_embedding_backend
+from utils.duckdb_cache import DuckDBCache
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(text: str) -> str:
+    """Same hash as IntersectJob.intersect_id, so job ids can be used as cache keys"""
+    return hashlib.md5(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache(DuckDBCache):
+    """Embeddings keyed by (content hash, model, dimensions).
+
+    An in-process LRU sits in front of a DuckDB table. When the table grows past
+    max_rows the least recently used rows are evicted.
+    """
+
+    TABLE = "embedding_cache"
+    COLUMNS = "content_hash VARCHAR, model VARCHAR, dimensions INTEGER, embedding FLOAT[]"
+    KEY = "content_hash, model, dimensions"
+    ITEMS = "embeddings from the cache"
+
+    def __init__(
+        self,
+        path: str = DB_NAME,
+        model: str = EMBEDDING_MODEL,
+        dimensions: int = EMBEDDING_DIMENSIONS,
+        max_rows: int = EMBEDDING_CACHE_MAX_ROWS,
+        lru_size: int = EMBEDDING_CACHE_LRU_SIZE,
+    ):
+        super().__init__(path, max_rows)
+        self.model = model
+        self.dimensions = dimensions
+        self.lru_size = lru_size
+        self.lru: OrderedDict[str, list[float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return self.count("model = ? AND dimensions = ?", [self.model, self.dimensions])
+
+    def get_many(self, keys: list[str]) -> dict[str, list[float]]:
+        """Return the cached embeddings for the keys that are present"""
+        found = {}
+        with self.lock:
+            missing = []
+            for key in dict.fromkeys(keys):
+                if key in self.lru:
+                    self.lru.move_to_end(key)
+                    found[key] = self.lru[key]
+                else:
+                    missing.append(key)
+
+            if missing:
+                rows = self.conn.execute(
+                    f"""
+                    SELECT content_hash, embedding FROM {self.TABLE}
+                    WHERE model = ? AND dimensions = ? AND list_contains(?, content_hash)
+                    """,
+                    [self.model, self.dimensions, missing],
+                ).fetchall()
+                if rows:
+                    self.touch(
+                        "model = ? AND dimensions = ? AND list_contains(?, content_hash)",
+                        [self.model, self.dimensions, [key for key, _ in rows]],
+                    )
+                for key, embedding in rows:
+                    found[key] = embedding
+                    self._remember(key, embedding)
+
+            self.hits += len(found)
+            self.misses += len(dict.fromkeys(keys)) - len(found)
+
+        return found
+
+    def put_many(self, items: dict[str, list[float]]) -> None:
+        """Insert or replace embeddings, then evict if the table is over budget"""
+        if not items:
+            return
+
+        new_rows = pd.DataFrame(
+            {"content_hash": list(items.keys()), "embedding": list(items.values())}
+        )
+        self.insert(
+            new_rows,
+            "SELECT content_hash, ?, ?, embedding::FLOAT[], now()",
+            [self.model, self.dimensions],
+        )
+        with self.lock:
+            for key, embedding in items.items():
+                self._remember(key, embedding)
+
+    def _remember(self, key: str, embedding: list[float]) -> None:
+        self.lru[key] = embedding
+        self.lru.move_to_end(key)
+        while len(self.lru) > self.lru_size:
+            self.lru.popitem(last=False)
+
+
+@lru_cache(maxsize=None)
+def get_embedding_cache(
+    model: str = EMBEDDING_MODEL, dimensions: int = EMBEDDING_DIMENSIONS
+) -> EmbeddingCache:
+    """One cache per model configuration per process"""
+    return EmbeddingCache(model=model, dimensions=dimensions)
+
+
+def embed_with_cache(
+    texts: list[str],
+    keys: Optional[list[str]] = None,
+    backend: Optional[EmbeddingBackend] = None,
+    cache: Optional[EmbeddingCache] = None,
+) -> list[list[float]]:
+    """Embed texts, only sending cache misses to the backend.
+
+    keys default to the content hash of each text. Returns embeddings in input order.
+    """
+    if backend is None:
+        backend = get_embedding_backend()
+    if cache is None:
+        cache = get_embedding_cache(backend.model, backend.dimensions)
+    if keys is None:
+        keys = [content_hash(text) for text in texts]
+
+    found = cache.get_many(keys)
+
+    # the same text can appear more than once, embed it only once
+    misses = {key: text for key, text in zip(keys, texts) if key not in found}
+    logger.info(f"Embedding cache: {len(found)} hits, {len(misses)} misses")
+
+    if misses:
+        embedded = dict(zip(misses.keys(), backend.embed(list(misses.values()))))
+        cache.put_many(embedded)
+        found.update(embedded)
+
+    return [found[key] for key in keys]
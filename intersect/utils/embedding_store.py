@@ -0,0 +1,149 @@
+import argparse
+import logging
+import os
+import time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Embeddings are stored as an Arrow FixedSizeList<float32> column in uncompressed feather
+# files. These are memory mapped on load and the column turns into a numpy matrix
+# without copying or creating a Python object per row. They remain readable by plain
+# pd.read_feather.
+
+# Models with the same number of dimensions make vectors that can't be compared, so the
+# column's metadata records the space the vectors are in (EmbeddingBackend.space). Files
+# written without it are only checked by their dimensions.
+
+# Migrate the bundled datasets with:
+#     cd intersect && python -m utils.embedding_store data/*.feather
+
+
+def to_fixed_size_list(embeddings: pd.Series) -> pa.FixedSizeListArray:
+    """Convert a column of lists/arrays (None for missing) to FixedSizeList<float32>"""
+    present = embeddings.notna().to_numpy()
+    if not present.any():
+        raise ValueError("No embeddings to store")
+
+    dimensions = len(embeddings[present].iloc[0])
+    matrix = np.zeros((len(embeddings), dimensions), dtype=np.float32)
+    matrix[present] = np.array(embeddings[present].tolist(), dtype=np.float32)
+
+    return pa.FixedSizeListArray.from_arrays(
+        pa.array(matrix.ravel()), dimensions, mask=pa.array(~present)
+    )
+
+
+def arrow_matrix(array: pa.ChunkedArray | pa.FixedSizeListArray) -> np.ndarray:
+    """View a FixedSizeList<float32> array as an (n, d) matrix; missing rows are zeros.
+
+    Zero-copy when the array is a single chunk, which it is after a memory mapped read.
+    """
+    if isinstance(array, pa.ChunkedArray):
+        array = array.combine_chunks()  # type: ignore
+
+    dimensions = array.type.list_size
+    values = array.values.slice(array.offset * dimensions, len(array) * dimensions)
+    return values.to_numpy(zero_copy_only=values.null_count == 0).reshape(-1, dimensions)
+
+
+def is_fixed_size_embedding(series: pd.Series) -> bool:
+    dtype = series.dtype
+    return isinstance(dtype, pd.ArrowDtype) and pa.types.is_fixed_size_list(
+        dtype.pyarrow_dtype
+    )
+
+
+def write_feather(
+    df: pd.DataFrame, path: str | Path, col: str = "embedding", space: str | None = None
+) -> None:
+    """Write df with col as FixedSizeList<float32>, uncompressed so it can be memory mapped.
+
+    space is the tag of the model that made the embeddings, kept in the column's metadata.
+    """
+    table = pa.Table.from_pandas(df.drop(columns=[col]), preserve_index=False)
+    embeddings = to_fixed_size_list(df[col])
+    metadata = {b"space": space.encode("utf-8")} if space else None
+    table = table.append_column(pa.field(col, embeddings.type, metadata=metadata), [embeddings])
+    feather.write_feather(table, str(path), compression="uncompressed")
+
+
+def read_feather(path: str | Path, col: str = "embedding") -> pd.DataFrame:
+    """Memory map a feather file, keeping col as an Arrow backed column.
+
+    Use algorithms.semantic_search.embedding_matrix to get the matrix out of it. The
+    space the embeddings were written with, if any, is in df.attrs["embedding_space"].
+    """
+    start_time = time.time()
+
+    table = feather.read_table(str(path), memory_map=True)
+    embeddings = table.column(col)
+    metadata = table.schema.field(col).metadata or {}
+    df = table.drop_columns([col]).to_pandas()
+    if b"space" in metadata:
+        df.attrs["embedding_space"] = metadata[b"space"].decode("utf-8")
+
+    if pa.types.is_fixed_size_list(embeddings.type):
+        df[col] = pd.Series(pd.arrays.ArrowExtensionArray(embeddings), index=df.index)
+    else:
+        # not migrated yet, fall back to the per-row objects
+        logger.warning(f"{path} stores {col} as {embeddings.type}, run the migration")
+        df[col] = embeddings.to_pandas()
+
+    elapsed_time = time.time() - start_time
+    logger.info(f"Loaded {len(df)} rows from {path} in {elapsed_time:.3f} seconds")
+
+    return df
+
+
+def stale_embeddings(
+    df: pd.DataFrame, space: str, dimensions: int, col: str = "embedding"
+) -> pd.Series:
+    """Rows whose embedding is missing or was made in another space.
+
+    The space of each row is in the "embedding_space" column. Rows without one are
+    only compared by their number of dimensions.
+    """
+    if is_fixed_size_embedding(df[col]):
+        # Arrow columns are checked without making an object per row
+        list_size = df[col].dtype.pyarrow_dtype.list_size
+        stale = df[col].isna() | (list_size != dimensions)
+    else:
+        stale = df[col].apply(
+            lambda x: not isinstance(x, (list, np.ndarray)) or len(x) != dimensions
+        )
+
+    if "embedding_space" in df.columns:
+        spaces = df["embedding_space"]
+        stale = stale | (spaces.notna() & (spaces != space))
+    return stale
+
+
+def migrate(path: str | Path, col: str = "embedding", space: str | None = None) -> None:
+    """Rewrite a feather file with col as FixedSizeList<float32>"""
+    df = pd.read_feather(path)
+    if col not in df.columns or df[col].isna().all():
+        print(f"{path}: no {col} column, skipped")
+        return
+
+    before = os.path.getsize(path)
+    tmp_path = f"{path}.tmp"
+    write_feather(df, tmp_path, col, space)
+    os.replace(tmp_path, path)
+
+    print(f"{path}: {before / 1e6:.1f} MB -> {os.path.getsize(path) / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate feather embeddings")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--col", default="embedding")
+    parser.add_argument("--space", help="model:dimensions of the stored embeddings")
+    args = parser.parse_args()
+
+    for path in args.paths:
+        migrate(path, args.col, args.space)
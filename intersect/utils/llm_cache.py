@@ -0,0 +1,60 @@
+import hashlib
+import json
+import logging
+import pandas as pd
+from functools import lru_cache
+
+from config.constants import DB_NAME, LLM_CACHE_MAX_ROWS
+from utils.duckdb_cache import DuckDBCache
+
+logger = logging.getLogger(__name__)
+
+# Completions requested with temperature=0 are treated as deterministic, so the same
+# messages to the same model get the stored response back instead of a new call.
+
+
+def prompt_hash(messages: list[dict]) -> str:
+    return hashlib.md5(json.dumps(messages, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class LLMCache(DuckDBCache):
+    """Responses keyed by (model, prompt hash) in a DuckDB table.
+
+    When the table grows past max_rows the least recently used rows are evicted.
+    """
+
+    TABLE = "llm_cache"
+    COLUMNS = "model VARCHAR, prompt_hash VARCHAR, response VARCHAR"
+    KEY = "model, prompt_hash"
+    ITEMS = "responses from the llm cache"
+
+    def __init__(self, path: str = DB_NAME, max_rows: int = LLM_CACHE_MAX_ROWS):
+        super().__init__(path, max_rows)
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def get(self, model: str, messages: list[dict]) -> str | None:
+        key = prompt_hash(messages)
+        with self.lock:
+            row = self.conn.execute(
+                f"SELECT response FROM {self.TABLE} WHERE model = ? AND prompt_hash = ?",
+                [model, key],
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.touch("model = ? AND prompt_hash = ?", [model, key])
+            self.hits += 1
+        return row[0]
+
+    def put(self, model: str, messages: list[dict], response: str) -> None:
+        new_rows = pd.DataFrame({"response": [response]})
+        self.insert(new_rows, "SELECT ?, ?, response, now()", [model, prompt_hash(messages)])
+
+
+@lru_cache(maxsize=None)
+def get_llm_cache() -> LLMCache:
+    """One cache per process"""
+    return LLMCache()
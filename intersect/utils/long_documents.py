@@ -0,0 +1,124 @@
+import logging
+import numpy as np
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from config.constants import (
+    EMBEDDING_MODEL,
+    EMBEDDING_MAX_INPUT_TOKENS,
+    EMBEDDING_CHUNK_OVERLAP,
+)
+from utils.embedding import get_encoding
+from utils.async_embedding import embed_texts
+
+logger = logging.getLogger(__name__)
+
+# Long postings and pdf cvs can go over the model's input limit. Instead of failing,
+# the text is split into overlapping token windows which are embedded in one batch
+# and mean pooled (weighted by window length) into a single normalized vector.
+
+
+@dataclass
+class ChunkedEmbedding:
+    """Pooled embedding of a text plus the vectors of the windows it was split into"""
+
+    embedding: list[float]
+    chunks: list[list[float]]
+    chunk_texts: list[str]
+
+
+def chunk_tokens(
+    tokens: list[int],
+    window: int = EMBEDDING_MAX_INPUT_TOKENS,
+    overlap: int = EMBEDDING_CHUNK_OVERLAP,
+) -> list[list[int]]:
+    """Split tokens into windows of at most `window` tokens sharing `overlap` tokens"""
+    if window <= overlap:
+        raise ValueError("window must be larger than overlap")
+
+    if len(tokens) <= window:
+        return [tokens]
+
+    step = window - overlap
+    chunks = []
+    for start in range(0, len(tokens), step):
+        chunks.append(tokens[start : start + window])
+        if start + window >= len(tokens):
+            break
+    return chunks
+
+
+def pool_embeddings(embeddings: list[list[float]], weights: list[int]) -> list[float]:
+    """Weighted mean of the chunk vectors, normalized to unit length"""
+    matrix = np.asarray(embeddings, dtype=np.float64)
+    pooled = np.average(matrix, axis=0, weights=np.asarray(weights, dtype=np.float64))
+    norm = np.linalg.norm(pooled)
+    if norm > 0:
+        pooled /= norm
+    return pooled.tolist()
+
+
+def embed_chunks(
+    texts: list[str],
+    window: int = EMBEDDING_MAX_INPUT_TOKENS,
+    overlap: int = EMBEDDING_CHUNK_OVERLAP,
+    embed_fn: Optional[Callable[[list[str]], list[list[float]]]] = None,
+    model: str = EMBEDDING_MODEL,
+    **engine_kwargs,
+) -> list[ChunkedEmbedding]:
+    """Embed every window of every text in one batch and pool them per text.
+
+    Use a small window (e.g. EMBEDDING_PASSAGE_TOKENS) for passage level scoring.
+    engine_kwargs go to embed_texts when no embed_fn is given.
+    """
+    if not texts:
+        return []
+
+    for text in texts:
+        if not text:
+            raise Exception("Text is None or empty")
+
+    encoding = get_encoding(model)
+
+    chunk_texts: list[str] = []
+    chunk_counts: list[int] = []
+    spans: list[tuple[int, int]] = []
+    for tokens in encoding.encode_batch(texts):
+        start = len(chunk_texts)
+        for chunk in chunk_tokens(tokens, window, overlap):
+            chunk_texts.append(encoding.decode(chunk))
+            chunk_counts.append(len(chunk))
+        spans.append((start, len(chunk_texts)))
+
+    if len(chunk_texts) > len(texts):
+        logger.info(f"Split {len(texts)} texts into {len(chunk_texts)} windows")
+
+    if embed_fn is None:
+        # the texts were already tokenized above, no need to count them again
+        embeddings = embed_texts(
+            chunk_texts, token_counts=chunk_counts, model=model, **engine_kwargs
+        )
+    else:
+        embeddings = embed_fn(chunk_texts)
+
+    results = []
+    for start, end in spans:
+        chunks = embeddings[start:end]
+        results.append(
+            ChunkedEmbedding(
+                embedding=pool_embeddings(chunks, chunk_counts[start:end]),
+                chunks=chunks,
+                chunk_texts=chunk_texts[start:end],
+            )
+        )
+    return results
+
+
+def embed_long_texts(
+    texts: list[str],
+    embed_fn: Optional[Callable[[list[str]], list[list[float]]]] = None,
+    **engine_kwargs,
+) -> list[list[float]]:
+    """Like embed_texts, but texts over the input limit are chunked and pooled"""
+    chunked = embed_chunks(texts, embed_fn=embed_fn, **engine_kwargs)
+    return [result.embedding for result in chunked]
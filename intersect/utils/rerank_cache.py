@@ -0,0 +1,97 @@
+import logging
+import pandas as pd
+from functools import lru_cache
+
+from config.constants import (
+    DB_NAME,
+    RERANK_MODEL,
+    RERANK_CACHE_MAX_ROWS,
+    RERANK_CACHE_TTL_SECONDS,
+)
+from utils.embedding_cache import content_hash
+from utils.duckdb_cache import DuckDBCache
+
+logger = logging.getLogger(__name__)
+
+# Relevance scores only mean something for one (query, document) pair, so they are keyed
+# by the hash of the query text and the document's intersect_id. Resubmitting the same
+# text with other keywords then only sends the postings that weren't scored before.
+# Documents may be cut down to their passages before they are scored, so the passage
+# token budget is part of the key too (0 for whole documents).
+# Scores expire after a ttl, as rerank models behind the same name get updated.
+
+
+class RerankCache(DuckDBCache):
+    """Rerank scores keyed by (model, query hash, passage budget, document id) in a DuckDB table.
+
+    Rows older than ttl_seconds are ignored and deleted. When the table grows past
+    max_rows the least recently used rows are evicted.
+    """
+
+    TABLE = "rerank_cache"
+    COLUMNS = (
+        "model VARCHAR, query_hash VARCHAR, passage_budget INTEGER, doc_id VARCHAR,"
+        " score DOUBLE, created_at TIMESTAMP"
+    )
+    KEY = "model, query_hash, passage_budget, doc_id"
+    ITEMS = "scores from the rerank cache"
+
+    def __init__(
+        self,
+        path: str = DB_NAME,
+        model: str = RERANK_MODEL,
+        ttl_seconds: int = RERANK_CACHE_TTL_SECONDS,
+        max_rows: int = RERANK_CACHE_MAX_ROWS,
+    ):
+        super().__init__(path, max_rows, ttl_seconds)
+        self.model = model
+
+    def __len__(self) -> int:
+        return self.count("model = ?", [self.model])
+
+    def get_many(
+        self, query: str, doc_ids: list[str], passage_budget: int = 0
+    ) -> dict[str, float]:
+        """Return the fresh cached scores of the query for the doc_ids that are present"""
+        doc_ids = list(dict.fromkeys(doc_ids))
+        with self.lock:
+            rows = self.conn.execute(
+                f"""
+                SELECT doc_id, score FROM {self.TABLE}
+                WHERE model = ? AND query_hash = ? AND passage_budget = ?
+                AND list_contains(?, doc_id) AND {self.fresh()}
+                """,
+                [self.model, content_hash(query), passage_budget, doc_ids],
+            ).fetchall()
+            if rows:
+                self.touch(
+                    "model = ? AND query_hash = ? AND passage_budget = ? AND list_contains(?, doc_id)",
+                    [
+                        self.model,
+                        content_hash(query),
+                        passage_budget,
+                        [doc_id for doc_id, _ in rows],
+                    ],
+                )
+            self.hits += len(rows)
+            self.misses += len(doc_ids) - len(rows)
+
+        return dict(rows)
+
+    def put_many(self, query: str, scores: dict[str, float], passage_budget: int = 0) -> None:
+        """Insert or replace scores, then evict expired rows and rows over budget"""
+        if not scores:
+            return
+
+        new_rows = pd.DataFrame({"doc_id": list(scores.keys()), "score": list(scores.values())})
+        self.insert(
+            new_rows,
+            "SELECT ?, ?, ?, doc_id, score, now(), now()",
+            [self.model, content_hash(query), passage_budget],
+        )
+
+
+@lru_cache(maxsize=None)
+def get_rerank_cache(model: str = RERANK_MODEL) -> RerankCache:
+    """One cache per rerank model per process"""
+    return RerankCache(model=model)
@@ -1,10 +1,33 @@
+import asyncio
+import concurrent.futures
 import pandas as pd
 import logging
 import numpy as np
+from typing import Awaitable, Callable, TypeVar
+
+from utils.embedding_store import is_fixed_size_embedding
+
+T = TypeVar("T")
+
+
+def run_blocking(run: Callable[[], Awaitable[T]]) -> T:
+    """Run a coroutine function to completion from synchronous code like Streamlit"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(run())  # type: ignore
+
+    # already inside an event loop (e.g. a notebook), so run on a separate thread
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, run()).result()  # type: ignore
 
 
 def add_you(df: pd.DataFrame, input_text: str, vector: list[float]) -> pd.DataFrame:
 
+    if is_fixed_size_embedding(df["embedding"]):
+        # an Arrow list column can't take a python list, so the chart's copy goes back to objects
+        df["embedding"] = df["embedding"].astype(object)
+
     new_row_index = len(df)
     df.loc[new_row_index, "title"] = "Your text"
     df.loc[new_row_index, "description"] = input_text
@@ -0,0 +1,128 @@
+import logging
+import os
+import sys
+import threading
+import time
+from collections.abc import Callable
+from functools import lru_cache
+
+from config.constants import NUMBA_CACHE_DIR, WARMUP_ROWS, WARMUP_DIMENSIONS
+
+logger = logging.getLogger(__name__)
+
+# umap and pynndescent compile their numba functions the first time they are called,
+# which a fresh Streamlit worker would otherwise do inside the first user's search.
+# At startup a background thread runs tiny fits through the same code paths a search
+# takes, so the compilation is done before anyone asks for a chart.
+
+# Functions marked cache=True (most of pynndescent, little of umap) are also written to
+# NUMBA_CACHE_DIR, so later processes load them from disk instead of compiling. The
+# directory has to be set before numba is first imported, which is why this module only
+# imports the algorithms inside the steps.
+
+# - https://numba.readthedocs.io/en/stable/reference/envvars.html#numba-cache-dir
+# - https://numba.readthedocs.io/en/stable/developer/caching.html
+
+
+def enable_compile_cache(path: str = NUMBA_CACHE_DIR) -> None:
+    """Keep numba's compiled functions on disk, unless the environment already says where.
+
+    Streamlit runs the script again on every interaction, by then the first run has set
+    the directory and numba is imported, so later calls return without a word.
+    """
+    if "NUMBA_CACHE_DIR" in os.environ:
+        return
+    if "numba" in sys.modules:
+        logger.warning("numba was imported before its cache directory was set")
+    os.environ["NUMBA_CACHE_DIR"] = os.path.abspath(path)
+
+
+def warm_projection(mode: str) -> None:
+    """k-NN graph, UMAP fit and transform of the visualization mode"""
+    import numpy as np
+    from algorithms.projection import Projection
+
+    rng = np.random.default_rng(0)
+    matrix = rng.normal(size=(WARMUP_ROWS, WARMUP_DIMENSIONS)).astype(np.float32)
+
+    projection = Projection.fit(matrix, mode)
+    projection.transform(matrix[:1])
+
+
+def warm_hdbscan() -> None:
+    """HDBSCAN on 2-D coordinates, as the cluster chart uses it"""
+    import numpy as np
+    import pandas as pd
+    from algorithms.clustering import cluster_hdbscan
+
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.normal(size=(WARMUP_ROWS, 2)), columns=["UMAP1", "UMAP2"])  # type: ignore
+    cluster_hdbscan(df, "UMAP")
+
+
+WARMUP_STEPS: dict[str, Callable[[], None]] = {
+    "exact projection": lambda: warm_projection("exact"),
+    "fast projection": lambda: warm_projection("fast"),
+    "hdbscan": warm_hdbscan,
+}
+
+
+class Warmup:
+    """Runs the warm-up steps once on a daemon thread and reports how far it got.
+
+    A failed step is logged and the rest still run, the app works without warm-up.
+    """
+
+    def __init__(self, steps: dict[str, Callable[[], None]] | None = None):
+        self.steps = steps if steps is not None else WARMUP_STEPS
+        self.state = "pending"
+        self.timings: dict[str, float] = {}
+        self.errors: dict[str, str] = {}
+        self.finished = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="warmup", daemon=True)
+
+    def start(self) -> "Warmup":
+        if self.state == "pending":
+            self.state = "running"
+            self.thread.start()
+        return self
+
+    def run(self) -> None:
+        start_time = time.time()
+        for name, step in self.steps.items():
+            step_start = time.time()
+            try:
+                step()
+            except Exception as e:
+                logger.exception(f"Warm-up step {name} failed")
+                self.errors[name] = str(e)
+            self.timings[name] = time.time() - step_start
+
+        self.state = "failed" if self.errors else "done"
+        self.finished.set()
+
+        elapsed_time = time.time() - start_time
+        logger.info(f"Warm-up {self.state} in {elapsed_time:.2f} seconds: {self.timings}")
+
+    @property
+    def done(self) -> bool:
+        return self.finished.is_set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Block until the warm-up has finished, returns False on timeout"""
+        return self.finished.wait(timeout)
+
+    def status(self) -> dict:
+        return {
+            "state": self.state,
+            "finished_steps": list(self.timings),
+            "pending_steps": [name for name in self.steps if name not in self.timings],
+            "seconds": dict(self.timings),
+            "errors": dict(self.errors),
+        }
+
+
+@lru_cache(maxsize=None)
+def start_warmup() -> Warmup:
+    """The process' warm-up, started on the first call"""
+    return Warmup().start()
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# the app imports its modules relative to the intersect/ directory
+sys.path.insert(0, str(Path(__file__).parent.parent / "intersect"))
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from algorithms.ann import IVFIndex
+from algorithms.semantic_search import VectorIndex
+
+
+def clustered_vectors(n: int = 2000, d: int = 32, n_clusters: int = 20, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, d))
+    vectors = centers[rng.integers(n_clusters, size=n)] + 0.3 * rng.normal(size=(n, d))
+    return vectors.astype(np.float32)
+
+
+def recall(index, exact: VectorIndex, queries: np.ndarray, k: int = 10, **kwargs) -> float:
+    hits = 0
+    for query in queries:
+        expected, _ = exact.search(query, k)
+        found, _ = index.search(query, k, **kwargs)
+        hits += len(set(expected) & set(found))
+    return hits / (k * len(queries))
+
+
+@pytest.fixture(scope="module")
+def vectors():
+    return clustered_vectors()
+
+
+@pytest.fixture(scope="module")
+def index(vectors):
+    return IVFIndex.build(vectors, n_lists=32, n_probe=4)
+
+
+class TestIVFIndex:
+    """Test the approximate index against exact search"""
+
+    def test_probing_every_list_is_exact(self, vectors, index):
+        exact = VectorIndex(vectors)
+        assert recall(index, exact, vectors[:20], n_probe=index.n_lists) == 1.0
+
+    def test_recall_improves_with_n_probe(self, vectors, index):
+        exact = VectorIndex(vectors)
+        low = recall(index, exact, vectors[:50], n_probe=1)
+        high = recall(index, exact, vectors[:50], n_probe=8)
+        assert high >= low
+        assert high > 0.9
+
+    def test_incremental_insert(self, vectors):
+        index = IVFIndex.build(vectors, n_lists=16)
+        new = clustered_vectors(n=5, seed=1)
+
+        ids = index.add(new)
+
+        assert list(ids) == list(range(len(vectors), len(vectors) + 5))
+        found, scores = index.search(new[2], k=1)
+        assert found[0] == ids[2]
+        assert scores[0] == pytest.approx(1.0, abs=1e-5)
+
+    def test_save_and_load(self, tmp_path, vectors, index):
+        path = tmp_path / "index.npz"
+        index.save(path)
+        loaded = IVFIndex.load(path)
+
+        assert len(loaded) == len(index)
+        for query in vectors[:5]:
+            assert list(loaded.search(query, 10)[0]) == list(index.search(query, 10)[0])
+
@@ -0,0 +1,170 @@
+import asyncio
+import json
+import threading
+import time
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from openai import AsyncOpenAI
+
+from utils import embedding
+from utils.async_embedding import AsyncEmbeddingEngine, RateLimiter, embed_texts
+
+
+class FakeEncoding:
+    """Counts one token per whitespace separated word"""
+
+    def encode(self, text):
+        return text.split()
+
+    def encode_batch(self, texts):
+        return [self.encode(text) for text in texts]
+
+
+class FakeEmbeddingsServer(ThreadingHTTPServer):
+    """Local stand-in for the embeddings endpoint with injected latency and failures"""
+
+    def __init__(self, latency: float = 0.0, failures: int = 0, status: int = 429):
+        super().__init__(("127.0.0.1", 0), FakeEmbeddingsHandler)
+        self.latency = latency
+        self.failures = failures
+        self.status = status
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class FakeEmbeddingsHandler(BaseHTTPRequestHandler):
+    server: FakeEmbeddingsServer
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(self.server.latency)
+
+        with self.server.lock:
+            self.server.requests += 1
+            fail = self.server.failures > 0
+            if fail:
+                self.server.failures -= 1
+
+        if fail:
+            self._send(self.server.status, {"error": {"message": "slow down"}})
+            return
+
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        data = [
+            {"object": "embedding", "index": i, "embedding": [float(len(text)), 1.0]}
+            for i, text in enumerate(inputs)
+        ]
+        self._send(
+            200,
+            {
+                "object": "list",
+                "data": data,
+                "model": body["model"],
+                "usage": {"prompt_tokens": 0, "total_tokens": 0},
+            },
+        )
+
+    def _send(self, status: int, payload: dict):
+        content = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def fake_encoding(monkeypatch):
+    monkeypatch.setattr(embedding, "get_encoding", lambda model=None: FakeEncoding())
+
+
+@pytest.fixture
+def make_server():
+    servers = []
+
+    def start(**kwargs) -> FakeEmbeddingsServer:
+        server = FakeEmbeddingsServer(**kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def make_engine(server: FakeEmbeddingsServer, **kwargs) -> AsyncEmbeddingEngine:
+    client = AsyncOpenAI(api_key="test", base_url=server.base_url, max_retries=0)
+    return AsyncEmbeddingEngine(client=client, **kwargs)
+
+
+class TestAsyncEmbeddingEngine:
+    """Test the engine against a local fake embeddings server"""
+
+    def test_results_keep_input_order(self, make_server):
+        server = make_server()
+        engine = make_engine(server, max_batch_size=2)
+        texts = ["a", "bb", "ccc", "dddd", "eeeee"]
+
+        embeddings = asyncio.run(engine.embed(texts))
+
+        assert [e[0] for e in embeddings] == [1.0, 2.0, 3.0, 4.0, 5.0]
+        assert server.requests == 3
+
+    def test_batches_run_concurrently(self, make_server):
+        server = make_server(latency=0.5)
+        engine = make_engine(server, max_batch_size=1, max_concurrency=8)
+
+        start = time.monotonic()
+        asyncio.run(engine.embed([f"text {i}" for i in range(8)]))
+        elapsed = time.monotonic() - start
+
+        assert server.requests == 8
+        assert elapsed < 8 * 0.5 / 2
+
+    @pytest.mark.parametrize("status", [429, 500, 503])
+    def test_retries_transient_errors(self, make_server, status):
+        server = make_server(failures=2, status=status)
+        engine = make_engine(server)
+
+        embeddings = asyncio.run(engine.embed(["hello"]))
+
+        assert embeddings == [[5.0, 1.0]]
+        assert server.requests == 3
+
+    def test_does_not_retry_client_errors(self, make_server):
+        server = make_server(failures=1, status=400)
+        engine = make_engine(server)
+
+        with pytest.raises(Exception):
+            asyncio.run(engine.embed(["hello"]))
+        assert server.requests == 1
+
+    def test_sync_wrapper(self, make_server):
+        server = make_server()
+        client = AsyncOpenAI(api_key="test", base_url=server.base_url, max_retries=0)
+
+        assert embed_texts(["abc"], client=client) == [[3.0, 1.0]]
+
+
+class TestRateLimiter:
+    """Test the requests and tokens per minute budget"""
+
+    def test_waits_when_token_budget_is_spent(self):
+        async def run() -> float:
+            limiter = RateLimiter(requests_per_minute=1000, tokens_per_minute=600)
+            await limiter.acquire(600)
+            start = time.monotonic()
+            await limiter.acquire(5)  # refills at 10 tokens per second
+            return time.monotonic() - start
+
+        assert 0.3 < asyncio.run(run()) < 1.5
@@ -0,0 +1,43 @@
+import numpy as np
+
+from algorithms.cluster_labels import Clustering, class_tfidf
+
+DOCUMENTS = [
+    "Nurse. Care for patients on the ward, nursing shifts",
+    "Staff nurse. Ward nursing and patient care",
+    "Nurse practitioner. Patients, ward rounds",
+    "Python developer. Build python services and data pipelines",
+    "Data engineer. Python pipelines for data",
+    "Backend developer. Python services",
+    "Chef. Cook in a busy kitchen",
+]
+
+
+class TestClassTfidf:
+    """Test that clusters are named by the terms that set them apart"""
+
+    def test_top_terms_are_distinctive(self):
+        terms = class_tfidf(DOCUMENTS, np.array([0, 0, 0, 1, 1, 1, -1]), n_terms=3)
+
+        assert set(terms) == {0, 1}
+        assert terms[0][0] in {"nurse", "ward", "patients", "nursing"}
+        assert "python" in terms[1]
+        # terms of the noise row don't name anything
+        assert not {"chef", "kitchen"} & set(terms[0] + terms[1])
+
+    def test_shared_terms_rank_below_own_terms(self):
+        documents = ["python nurse nurse", "python chef chef"]
+        terms = class_tfidf(documents, np.array([0, 1]))
+        assert terms[0][0] == "nurse" and terms[1][0] == "chef"
+
+    def test_only_noise(self):
+        assert class_tfidf(DOCUMENTS, np.full(len(DOCUMENTS), -1)) == {}
+
+    def test_only_stop_words(self):
+        assert class_tfidf(["the and", "of the"], np.array([0, 1])) == {0: [], 1: []}
+
+
+def test_legend_names():
+    clustering = Clustering(np.array([0, -1]), {0: ["nurse", "ward", "patients", "care"]})
+    assert clustering.name(0) == "0: nurse, ward, patients"
+    assert clustering.name(-1) == "-1"
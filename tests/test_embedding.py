@@ -0,0 +1,135 @@
+import pytest
+import numpy as np
+from types import SimpleNamespace
+
+from utils import embedding, long_documents
+from utils.embedding import make_batches, get_embeddings
+from utils.long_documents import chunk_tokens, embed_chunks, embed_long_texts
+from utils.embedding_backends import HashingBackend, get_embedding_backend
+
+
+class FakeEncoding:
+    """Counts one token per whitespace separated word"""
+
+    def encode(self, text):
+        return text.split()
+
+    def encode_batch(self, texts):
+        return [self.encode(text) for text in texts]
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.calls = []
+
+    def create(self, model, input, encoding_format):
+        self.calls.append(input)
+        # return items out of order to check they are mapped back by index
+        data = [
+            SimpleNamespace(index=i, embedding=[float(len(text.split()))])
+            for i, text in enumerate(input)
+        ]
+        return SimpleNamespace(data=list(reversed(data)))
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(embedding, "get_encoding", lambda model=None: FakeEncoding())
+    return SimpleNamespace(embeddings=FakeEmbeddings())
+
+
+class TestMakeBatches:
+    """Test packing texts into requests"""
+
+    def test_respects_token_limit(self):
+        assert make_batches([3, 3, 3, 3], max_tokens=6, max_items=10) == [[0, 1], [2, 3]]
+
+    def test_respects_item_limit(self):
+        assert make_batches([1, 1, 1], max_tokens=100, max_items=2) == [[0, 1], [2]]
+
+    def test_empty(self):
+        assert make_batches([]) == []
+
+
+class TestGetEmbeddings:
+    """Test batched embedding requests"""
+
+    def test_results_keep_input_order(self, client):
+        texts = ["one", "two words", "three words here"]
+        assert get_embeddings(client, texts) == [[1.0], [2.0], [3.0]]  # type: ignore
+
+    def test_single_request_for_small_inputs(self, client):
+        get_embeddings(client, ["a", "b", "c"])  # type: ignore
+        assert len(client.embeddings.calls) == 1
+
+    def test_rejects_empty_text(self, client):
+        with pytest.raises(Exception, match="Text is empty"):
+            get_embeddings(client, ["a", ""])  # type: ignore
+
+
+class TestLongDocuments:
+    """Test chunking and pooling of texts over the input limit"""
+
+    def test_chunk_tokens_overlap(self):
+        chunks = chunk_tokens(list(range(10)), window=4, overlap=1)
+        assert chunks == [[0, 1, 2, 3], [3, 4, 5, 6], [6, 7, 8, 9]]
+
+    def test_short_text_is_one_chunk(self):
+        assert chunk_tokens([1, 2], window=4, overlap=1) == [[1, 2]]
+
+    def test_long_text_does_not_fail(self, monkeypatch):
+        monkeypatch.setattr(long_documents, "get_encoding", lambda model=None: FakeEncoding())
+        calls = []
+
+        def embed_fn(texts):
+            calls.append(texts)
+            return [[1.0, float(i)] for i in range(len(texts))]
+
+        long_text = " ".join(["word"] * (embedding.EMBEDDING_MAX_INPUT_TOKENS * 2))
+        [vector] = embed_long_texts([long_text], embed_fn=embed_fn)
+
+        assert len(calls) == 1 and len(calls[0]) == 3
+        assert np.linalg.norm(vector) == pytest.approx(1.0)
+
+    def test_passage_chunks(self, monkeypatch):
+        monkeypatch.setattr(long_documents, "get_encoding", lambda model=None: FakeEncoding())
+
+        results = embed_chunks(
+            ["a b c d e", "f"],
+            window=3,
+            overlap=1,
+            embed_fn=lambda texts: [[1.0, 0.0] for _ in texts],
+        )
+
+        assert results[0].chunk_texts == ["a b c", "c d e"]
+        assert results[1].chunk_texts == ["f"]
+        assert results[1].embedding == [1.0, 0.0]
+
+
+class TestEmbeddingBackends:
+    """Test backend selection and the offline hashing backend"""
+
+    def test_hashing_is_deterministic_and_normalized(self):
+        backend = HashingBackend(dimensions=64)
+        first, second = backend.embed(["python developer", "python developer"])
+
+        assert first == second
+        assert len(first) == 64
+        assert np.linalg.norm(first) == pytest.approx(1.0)
+
+    def test_hashing_similar_texts_score_higher(self):
+        query, close, far = HashingBackend().embed(
+            ["senior python developer", "python developer", "registered nurse"]
+        )
+        assert np.dot(query, close) > np.dot(query, far)
+
+    def test_backend_selected_by_env(self, monkeypatch):
+        monkeypatch.setenv("EMBEDDING_BACKEND", "hashing")
+        assert get_embedding_backend().name == "hashing"
+
+    def test_invalid_backend(self):
+        with pytest.raises(ValueError):
+            get_embedding_backend("nope")
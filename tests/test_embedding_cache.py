@@ -0,0 +1,88 @@
+import pytest
+
+from utils.embedding_cache import EmbeddingCache, embed_with_cache, content_hash
+from utils.embedding_backends import EmbeddingBackend
+
+
+class CountingEmbedder(EmbeddingBackend):
+    name = "counting"
+    model = "counting"
+    dimensions = 2
+
+    def __init__(self):
+        self.calls = []
+
+    def embed(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text)), 0.5] for text in texts]
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "test.duckdb")
+
+
+class TestEmbeddingCache:
+    """Test the DuckDB backed embedding cache"""
+
+    def test_put_and_get(self, db_path):
+        cache = EmbeddingCache(db_path, dimensions=2)
+        cache.put_many({"a": [1.0, 2.0], "b": [3.0, 4.0]})
+
+        assert cache.get_many(["a", "c"]) == {"a": [1.0, 2.0]}
+
+    def test_persists_across_instances(self, db_path):
+        EmbeddingCache(db_path, dimensions=2).put_many({"a": [1.0, 2.0]})
+        cache = EmbeddingCache(db_path, dimensions=2)
+
+        assert cache.get_many(["a"]) == {"a": [1.0, 2.0]}
+
+    def test_keyed_on_model_and_dimensions(self, db_path):
+        EmbeddingCache(db_path, model="m1", dimensions=2).put_many({"a": [1.0, 2.0]})
+
+        assert EmbeddingCache(db_path, model="m2", dimensions=2).get_many(["a"]) == {}
+        assert EmbeddingCache(db_path, model="m1", dimensions=3).get_many(["a"]) == {}
+
+    def test_evicts_past_max_rows(self, db_path):
+        cache = EmbeddingCache(db_path, dimensions=1, max_rows=2, lru_size=0)
+        cache.put_many({"a": [1.0]})
+        cache.put_many({"b": [2.0]})
+        cache.put_many({"c": [3.0]})
+
+        assert len(cache) == 2
+        assert "a" not in cache.get_many(["a", "b", "c"])
+
+    def test_lru_is_bounded(self, db_path):
+        cache = EmbeddingCache(db_path, dimensions=1, lru_size=2)
+        cache.put_many({"a": [1.0], "b": [2.0], "c": [3.0]})
+
+        assert list(cache.lru) == ["b", "c"]
+
+
+class TestEmbedWithCache:
+    """Test that only cache misses are embedded"""
+
+    def test_only_misses_are_embedded(self, db_path):
+        cache = EmbeddingCache(db_path, dimensions=2)
+        embedder = CountingEmbedder()
+
+        embed_with_cache(["one", "two"], backend=embedder, cache=cache)
+        result = embed_with_cache(["two", "three", "one"], backend=embedder, cache=cache)
+
+        assert embedder.calls == [["one", "two"], ["three"]]
+        assert result == [[3.0, 0.5], [5.0, 0.5], [3.0, 0.5]]
+
+    def test_duplicates_are_embedded_once(self, db_path):
+        cache = EmbeddingCache(db_path, dimensions=2)
+        embedder = CountingEmbedder()
+
+        embed_with_cache(["same", "same"], backend=embedder, cache=cache)
+
+        assert embedder.calls == [["same"]]
+
+    def test_custom_keys(self, db_path):
+        cache = EmbeddingCache(db_path, dimensions=2)
+        embed_with_cache(["text"], keys=["job-1"], backend=CountingEmbedder(), cache=cache)
+
+        assert "job-1" in cache.get_many(["job-1"])
+        assert cache.get_many([content_hash("text")]) == {}
@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.embedding_store import (
+    is_fixed_size_embedding,
+    migrate,
+    read_feather,
+    stale_embeddings,
+    write_feather,
+)
+from utils.embedding_backends import HashingBackend
+from data_sources.theirstack_client import TheirstackAPI
+from algorithms.semantic_search import embedding_matrix
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame(
+        {
+            "title": ["a", "b", "c"],
+            "embedding": [np.array([1.0, 2.0]), None, np.array([3.0, 4.0])],
+        }
+    )
+
+
+class TestEmbeddingStore:
+    """Test the FixedSizeList<float32> feather format"""
+
+    def test_roundtrip(self, tmp_path, df):
+        path = tmp_path / "jobs.feather"
+        write_feather(df, path)
+        loaded = read_feather(path)
+
+        assert loaded["title"].tolist() == ["a", "b", "c"]
+        assert loaded["embedding"].isna().tolist() == [False, True, False]
+        matrix = embedding_matrix(loaded)
+        assert matrix.dtype == np.float32
+        assert matrix.tolist() == [[1.0, 2.0], [0.0, 0.0], [3.0, 4.0]]
+
+    def test_matrix_is_zero_copy(self, tmp_path, df):
+        path = tmp_path / "jobs.feather"
+        write_feather(df, path)
+
+        matrix = embedding_matrix(read_feather(path))
+
+        assert not matrix.flags["OWNDATA"]
+
+    def test_matrix_after_reordering(self, tmp_path, df):
+        path = tmp_path / "jobs.feather"
+        write_feather(df, path)
+
+        loaded = read_feather(path).iloc[[2, 0]]
+
+        assert embedding_matrix(loaded).tolist() == [[3.0, 4.0], [1.0, 2.0]]
+
+    def test_migrate_keeps_pandas_compatibility(self, tmp_path, df):
+        path = tmp_path / "jobs.feather"
+        df.to_feather(path)
+
+        migrate(path)
+
+        loaded = pd.read_feather(path)
+        assert list(loaded["embedding"].iloc[0]) == [1.0, 2.0]
+        assert loaded["embedding"].iloc[1] is None
+
+
+class TestStaleEmbeddings:
+    """Test that embeddings are only reused within the space they were made in"""
+
+    def test_untagged_rows_are_checked_by_dimensions(self, df):
+        assert stale_embeddings(df, "model:2", 2).tolist() == [False, True, False]
+        assert stale_embeddings(df, "model:3", 3).all()
+
+    def test_same_dimensions_from_another_model(self, df):
+        df["embedding_space"] = ["model:2", None, "other:2"]
+        assert stale_embeddings(df, "model:2", 2).tolist() == [False, True, True]
+
+    def test_space_survives_the_file(self, tmp_path, df):
+        path = tmp_path / "test.feather"
+        write_feather(df, path, space="other:2")
+        assert read_feather(path).attrs["embedding_space"] == "other:2"
+
+
+class TestTheirstackEmbeddings:
+    """Test that sampled jobs keep their embeddings as an Arrow column"""
+
+    def test_search_jobs_df(self, tmp_path):
+        path = tmp_path / "theirstack.feather"
+        write_feather(theirstack_jobs(20), path)
+
+        df = TheirstackAPI(str(path)).search_jobs_df(results_to_take=5)
+
+        assert is_fixed_size_embedding(df["embedding"])
+        expected = [int(title.split()[-1]) for title in df["title"]]
+        assert embedding_matrix(df)[:, 0].tolist() == expected
+        assert df["embedding_space"].isna().all()
+
+    def test_search_jobs_df_keeps_the_space(self, tmp_path):
+        path = tmp_path / "theirstack.feather"
+        write_feather(theirstack_jobs(3), path, space=HashingBackend(4).space)
+
+        df = TheirstackAPI(str(path)).search_jobs_df(results_to_take=2)
+        assert df["embedding_space"].tolist() == [HashingBackend(4).space] * 2
+        assert not stale_embeddings(df, HashingBackend(4).space, 4).any()
+        assert stale_embeddings(df, "other:4", 4).all()
+
+
+def theirstack_jobs(n: int) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "id": range(n),
+            "job_title": [f"job {i}" for i in range(n)],
+            "description": ["description"] * n,
+            "company": ['{"name": "company"}'] * n,
+            "location": ["london"] * n,
+            "salary_string": [None] * n,
+            "salary_currency": ["GBP"] * n,
+            "url": ["https://example.com"] * n,
+            "date_posted": ["2025-01-01"] * n,
+            "embedding": [np.full(4, i, dtype=np.float32) for i in range(n)],
+        }
+    )
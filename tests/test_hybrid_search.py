@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from algorithms.hybrid_search import (
+    hybrid_search,
+    reciprocal_rank_fusion,
+    weighted_score_fusion,
+)
+
+
+class TestFusion:
+    """Test rank and score fusion on hand made rankings"""
+
+    def test_rrf_rewards_agreement(self):
+        ids, scores = reciprocal_rank_fusion([np.array([0, 1, 2]), np.array([1, 3, 0])])
+        assert ids.tolist()[:2] == [1, 0]
+        assert set(ids.tolist()) == {0, 1, 2, 3}
+        assert np.all(np.diff(scores) <= 0)
+
+    def test_rrf_score(self):
+        ids, scores = reciprocal_rank_fusion([np.array([5]), np.array([5])], k=60)
+        assert ids.tolist() == [5]
+        assert scores[0] == pytest.approx(2 / 61)
+
+    def test_weighted_fusion_follows_weights(self):
+        lexical = np.array([30.0, 10.0, 0.0])
+        semantic = np.array([0.1, 0.3, 0.2])
+        ids, _ = weighted_score_fusion(np.arange(3), [lexical, semantic], [0.9, 0.1])
+        assert ids.tolist() == [0, 1, 2]
+
+        ids, _ = weighted_score_fusion(np.arange(3), [lexical, semantic], [0.1, 0.9])
+        assert ids[0] == 1
+
+
+class TestHybridSearch:
+    """Test that the shortlist is the union of both top n"""
+
+    @pytest.fixture
+    def df(self):
+        return pd.DataFrame(
+            {
+                "description": [
+                    "python developer",
+                    "nurse in london",
+                    "gardener",
+                    "python and java engineer",
+                ],
+                "embedding": [[1, 0, 0], [0, 1, 0], [0.1, 0.9, 0], [0.9, 0.1, 0.1]],
+            }
+        )
+
+    @pytest.mark.parametrize("fusion", ["rrf", "weighted"])
+    def test_union_of_candidates(self, df, fusion):
+        # lexical prefers python rows, semantic prefers the nurse and gardener
+        ids, scores = hybrid_search("python", [0, 1, 0], df, n=1, fusion=fusion)
+        assert set(ids.tolist()) == {0, 1} or set(ids.tolist()) == {3, 1}
+        assert len(ids) == len(scores) == 2
+
+    def test_shortlist_size(self, df):
+        ids, _ = hybrid_search("python", [1, 0, 0], df, n=2)
+        assert 2 <= len(ids) <= 4
+
+    @pytest.mark.parametrize("fusion", ["rrf", "weighted"])
+    def test_earlier_rankings_are_reused(self, df, fusion, mocker):
+        retrieve = mocker.patch("algorithms.hybrid_search.lexical_retrieve")
+        lexical = (np.array([0, 3, 1, 2]), np.array([2.0, 1.0, 0.0, 0.0]))
+
+        ids, _ = hybrid_search(
+            "python", [0, 1, 0], df, n=1, fusion=fusion, lexical=lexical, semantic_ids=np.array([1, 2])
+        )
+
+        retrieve.assert_not_called()
+        assert set(ids.tolist()) == {0, 1}
+
+    def test_invalid_fusion(self, df):
+        with pytest.raises(ValueError):
+            hybrid_search("python", [1, 0, 0], df, fusion="borda")
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from scipy.sparse.csgraph import connected_components
+
+from algorithms.knn_graph import KnnGraph
+from algorithms.projection import Projection
+from benchmarks.visualization import graph_distance_matrix
+
+
+@pytest.fixture(scope="module")
+def blobs():
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(3, 16)) * 10
+    labels = np.arange(90) % 3
+    return (centers[labels] + rng.normal(size=(90, 16))).astype(np.float32), labels
+
+
+@pytest.fixture(scope="module")
+def graph(blobs):
+    return KnnGraph.build(blobs[0], n_neighbors=10)
+
+
+class TestKnnGraph:
+    """Test the neighbour lookups of the shared graph"""
+
+    def test_neighbors_are_exact_and_exclude_the_row(self, blobs, graph):
+        matrix = blobs[0]
+        rows, distances = graph.neighbors(7, 5)
+
+        expected = np.argsort(np.linalg.norm(matrix - matrix[7], axis=1))[1:6]
+        assert 7 not in rows
+        assert set(rows) == set(expected)
+        assert np.all(np.diff(distances) >= 0)
+
+    def test_query_finds_the_closest_rows(self, blobs, graph):
+        rows, _ = graph.query(blobs[0][12] + 0.001, 1)
+        assert rows[0][0] == 12
+
+    def test_distance_matrix_bridges_components(self, blobs, graph):
+        # the blobs are far apart, so the graph falls apart into one component each
+        distances = graph_distance_matrix(graph)
+        assert connected_components(distances, directed=False)[0] == 1
+        assert (distances != distances.T).nnz == 0
+
+    def test_read_only_matrix(self, blobs, graph):
+        # embedding_matrix of a memory mapped feather can't be written to
+        matrix = blobs[0].copy()
+        matrix.flags.writeable = False
+        rows, _ = KnnGraph.build(matrix, n_neighbors=10).neighbors(7, 5)
+        np.testing.assert_array_equal(rows, graph.neighbors(7, 5)[0])
+
+
+def test_projection_fits_umap_on_the_graph(blobs):
+    projection = Projection.fit(blobs[0])
+
+    assert projection.graph.n_neighbors == 15
+    np.testing.assert_array_equal(projection.reducer._knn_indices, projection.graph.indices)
@@ -0,0 +1,165 @@
+import numpy as np
+import pandas as pd
+
+from algorithms.lexical_index import (
+    IncrementalLexicalIndex,
+    LexicalIndex,
+    LexicalIndexStore,
+    corpus_hash,
+)
+from algorithms.lexical_search import lexical_retrieve, lexical_search
+
+CORPUS = [
+    "Senior Python developer building data pipelines",
+    "Registered nurse for a London hospital",
+    "Machine learning engineer, Python and PyTorch",
+    "Accountant with audit experience",
+]
+
+
+class TestLexicalIndexStore:
+    """Test that saved indexes are reused and score like a fresh one"""
+
+    def test_saved_index_scores_like_in_memory(self, tmp_path):
+        store = LexicalIndexStore(tmp_path)
+        saved = store.get(CORPUS)
+        fresh = LexicalIndex.build(CORPUS)
+
+        docs, scores = saved.search("python developer")
+        expected_docs, expected_scores = fresh.search("python developer")
+        assert np.array_equal(docs, expected_docs)
+        assert np.allclose(scores, expected_scores)
+
+    def test_index_is_built_once_per_corpus(self, tmp_path):
+        LexicalIndexStore(tmp_path).get(CORPUS)
+        assert [p.name for p in tmp_path.iterdir()] == [corpus_hash(CORPUS)]
+
+        # a new process memory maps the saved index instead of rebuilding it
+        store = LexicalIndexStore(tmp_path)
+        assert store.load_all() == 1
+        assert store.get(CORPUS) is store.indexes[corpus_hash(CORPUS)]
+
+    def test_changed_corpus_gets_a_new_index(self, tmp_path):
+        store = LexicalIndexStore(tmp_path)
+        store.get(CORPUS)
+        store.get(CORPUS + ["Python tutor"])
+        assert len(list(tmp_path.iterdir())) == 2
+
+    def test_memory_is_bounded(self, tmp_path):
+        store = LexicalIndexStore(tmp_path, memory_size=1)
+        store.get(CORPUS)
+        store.get(CORPUS[:2])
+        assert list(store.indexes) == [corpus_hash(CORPUS[:2])]
+
+    def test_least_recently_used_are_deleted(self, tmp_path):
+        store = LexicalIndexStore(tmp_path, max_saved=2)
+        store.get(CORPUS)
+        store.get(CORPUS[:2])
+        store.get(CORPUS)  # used again, so the next save deletes CORPUS[:2]
+        store.get(CORPUS[:3])
+
+        saved = {p.name for p in tmp_path.iterdir()}
+        assert saved == {corpus_hash(CORPUS), corpus_hash(CORPUS[:3])}
+
+    def test_load_all_maps_the_most_recent(self, tmp_path):
+        store = LexicalIndexStore(tmp_path)
+        for n in range(1, 4):
+            store.get(CORPUS[:n])
+
+        store = LexicalIndexStore(tmp_path, memory_size=2)
+        assert store.load_all() == 2
+        assert list(store.indexes) == [corpus_hash(CORPUS[:2]), corpus_hash(CORPUS[:3])]
+
+    def test_query_without_known_words(self, tmp_path):
+        scores = LexicalIndexStore(tmp_path).get(CORPUS).scores("zebra")
+        assert not scores.any()
+
+    def test_query_of_stop_words_only(self, tmp_path):
+        scores = LexicalIndexStore(tmp_path).get(CORPUS).scores("to be or not to be")
+        assert len(scores) == len(CORPUS)
+        assert not scores.any()
+
+    def test_lexical_search_with_store(self, tmp_path):
+        df = pd.DataFrame({"description": CORPUS})
+        with_store = lexical_search("python", df, "description", LexicalIndexStore(tmp_path))
+        in_memory = lexical_search("python", df, "description")
+        assert np.allclose(with_store["score_lexical"], in_memory["score_lexical"])
+
+
+class TestLexicalRetrieve:
+    """Test that top-k results and scores line up with the rows"""
+
+    def test_scores_are_in_row_order(self):
+        df = pd.DataFrame({"description": CORPUS})
+        df = lexical_search("nurse london", df, "description")
+        assert df["score_lexical"].idxmax() == 1
+        assert df.loc[1, "i_lexical"] == 0
+        assert df.loc[3, "score_lexical"] == 0
+
+    def test_top_k_ids(self):
+        ids, scores, full = lexical_retrieve("python", CORPUS, k=2)
+        assert sorted(ids.tolist()) == [0, 2]
+        assert scores[0] >= scores[1] > 0
+        assert full is None
+
+    def test_full_scores_match_top_k(self):
+        ids, scores, full = lexical_retrieve("python engineer", CORPUS, k=3, full=True)
+        assert full is not None and len(full) == len(CORPUS)
+        assert np.allclose(full[ids], scores)
+
+    def test_only_top_k_rows_are_ranked(self):
+        df = lexical_search("python", pd.DataFrame({"description": CORPUS}), "description", k=2)
+        assert df["i_lexical"].notna().sum() == 2
+
+
+def random_postings(n: int = 300, seed: int = 0) -> list[str]:
+    rng = np.random.default_rng(seed)
+    words = "python java nurse london engineer data senior manager sales audit cloud".split()
+    return [" ".join(rng.choice(words, rng.integers(3, 20))) for _ in range(n)]
+
+
+class TestIncrementalLexicalIndex:
+    """Test appends and removals against a BM25 index rebuilt from scratch"""
+
+    def test_matches_rebuilt_index(self):
+        docs = random_postings()
+        index = IncrementalLexicalIndex(max_segments=3)
+        ids = np.concatenate([index.add(docs[i : i + 37]) for i in range(0, len(docs), 37)])
+        index.remove(ids[::3])
+
+        live = [doc for i, doc in enumerate(docs) if i % 3]
+        rebuilt = LexicalIndex.build(live)
+        for query in ["python engineer", "london nurse nurse"]:
+            _, scores = index.search(query, 10)
+            _, expected = rebuilt.search(query, 10)
+            assert np.allclose(scores, expected, atol=1e-5)
+
+    def test_ids_survive_compaction(self):
+        index = IncrementalLexicalIndex(compact_ratio=0.5)
+        ids = index.add(["python developer", "nurse", "python nurse", "accountant"])
+        index.remove([ids[0]])
+        assert index.n_rows == 4
+
+        index.remove([ids[1], ids[3]])  # more than half removed, compacts
+        assert index.n_rows == 1
+        found, _ = index.search("python", 5)
+        assert found.tolist() == [ids[2]]
+
+    def test_removed_documents_are_not_returned(self):
+        index = IncrementalLexicalIndex()
+        ids = index.add(["python developer", "python engineer"])
+        index.remove([ids[0]])
+        found, _ = index.search("python", 5)
+        assert found.tolist() == [ids[1]]
+        assert index.remove([ids[0]]) == 0
+
+    def test_save_and_load(self, tmp_path):
+        index = IncrementalLexicalIndex()
+        ids = index.add(random_postings(50))
+        index.remove(ids[:10])
+        index.save(tmp_path / "index.npz")
+
+        loaded = IncrementalLexicalIndex.load(tmp_path / "index.npz")
+        assert len(loaded) == 40
+        assert np.array_equal(loaded.search("data cloud", 5)[0], index.search("data cloud", 5)[0])
+        assert loaded.add(["new posting"])[0] == 50
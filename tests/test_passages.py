@@ -0,0 +1,99 @@
+import pandas as pd
+import pytest
+
+from algorithms.passages import (
+    PASSAGE_SEPARATOR,
+    estimate_tokens,
+    extract_passages,
+    split_passages,
+)
+from algorithms.rerank import rerank_df
+from algorithms.rerank_backends import CrossEncoderBackend, OverlapCrossEncoder
+from utils.embedding_backends import HashingBackend
+from utils.rerank_cache import RerankCache
+
+FILLER = "We are a fast growing company with a great culture and free snacks. " * 20
+DESCRIPTION = (
+    "Job Title: Data EngineerLocation: Leeds. "
+    + FILLER
+    + "You will build Python pipelines on Spark and Airflow. "
+    + FILLER
+)
+
+
+class TestSplitPassages:
+    """Test sentence splitting and packing"""
+
+    def test_run_on_sentences_are_split(self):
+        passages = split_passages("Job Title: EngineerLocation: London", passage_tokens=5)
+        assert passages == ["Job Title: Engineer", "Location: London"]
+
+    def test_passages_fit(self):
+        passages = split_passages(DESCRIPTION, passage_tokens=40)
+        assert all(estimate_tokens(p) <= 40 for p in passages)
+        assert "".join(passages).replace(" ", "") == DESCRIPTION.replace(" ", "")
+
+
+class TestExtractPassages:
+    """Test that the relevant passages are kept within the budget"""
+
+    def test_relevant_passage_is_kept(self):
+        [extracted] = extract_passages("python airflow pipelines", [DESCRIPTION], budget=64)
+        assert "Python pipelines on Spark and Airflow" in extracted
+        assert estimate_tokens(extracted) <= 64 + 2 * len(PASSAGE_SEPARATOR)
+
+    def test_passages_keep_document_order(self):
+        [extracted] = extract_passages("data engineer leeds python", [DESCRIPTION], budget=128)
+        assert extracted.index("Leeds") < extracted.index("Python")
+
+    def test_short_documents_are_unchanged(self):
+        assert extract_passages("python", ["short text"], budget=64) == ["short text"]
+
+    def test_no_matching_words_keeps_the_start(self):
+        [extracted] = extract_passages("zebra", [DESCRIPTION], budget=32)
+        assert extracted.startswith("Job Title")
+
+    def test_query_of_stop_words_only(self):
+        [extracted] = extract_passages("to be or not to be", [DESCRIPTION], budget=32)
+        assert extracted.startswith("Job Title")
+
+    def test_embedding_scoring(self, monkeypatch, tmp_path):
+        import utils.embedding_cache as embedding_cache
+
+        cache = embedding_cache.EmbeddingCache(str(tmp_path / "test.duckdb"), dimensions=384)
+        monkeypatch.setattr(embedding_cache, "get_embedding_cache", lambda *args: cache)
+        monkeypatch.setattr("algorithms.passages.embed_with_cache", embedding_cache.embed_with_cache)
+
+        backend = HashingBackend()
+        query = "python pipelines on spark and airflow"
+        [extracted] = extract_passages(
+            query,
+            [DESCRIPTION],
+            budget=64,
+            method="embedding",
+            query_embedding=backend.embed([query])[0],
+            backend=backend,
+        )
+        assert "Airflow" in extracted
+
+    def test_embedding_scoring_needs_query_embedding(self):
+        with pytest.raises(ValueError):
+            extract_passages("python", [DESCRIPTION], budget=32, method="embedding")
+
+
+class TestRerankWithPassages:
+    """Test that rerankers get the extracted passages"""
+
+    def test_reranker_sees_passages(self, tmp_path):
+        encoder = OverlapCrossEncoder()
+        sent = []
+        predict = encoder.predict
+        encoder.predict = lambda pairs, **kwargs: sent.extend(pairs) or predict(pairs)  # type: ignore
+
+        backend = CrossEncoderBackend(model="overlap", encoder=encoder)
+        cache = RerankCache(str(tmp_path / "test.duckdb"), model="overlap")
+        df = pd.DataFrame({"description": [DESCRIPTION]})
+        rerank_df("airflow", df, backend, cache, passage_budget=64)
+
+        assert len(sent[0][1]) < len(DESCRIPTION) / 4
+        assert "Airflow" in sent[0][1]
@@ -0,0 +1,202 @@
+import asyncio
+import json
+import re
+import time
+import pandas as pd
+import pytest
+from types import SimpleNamespace
+
+from config.constants import PERMUTATION_TOP_K, PERMUTATION_WINDOW
+from algorithms.permutation import (
+    PermutationStreamParser,
+    SlidingWindowRanker,
+    build_prompt,
+    parse_permutation,
+    permutation_openai,
+    sliding_windows,
+)
+from utils.llm_cache import LLMCache
+
+
+class FakeChat:
+    """Ranks the items of a prompt by the number in their title, like a perfect llm"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+        self.completions = self
+
+    @property
+    def chat(self):
+        return self
+
+    async def create(self, model, messages, temperature, stream=False):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        items = re.findall(r"index: (\d+)\s+title: job (\d+)", messages[0]["content"])
+        ranked = sorted(items, key=lambda item: -int(item[1]))
+        answer = [{"new_rank": rank, "index": int(label)} for rank, (label, _) in enumerate(ranked)]
+        content = f"<ranking_criteria>higher is [better]</ranking_criteria>{json.dumps(answer)}"
+        if stream:
+            return self.stream(content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    async def stream(self, content: str, chunk_size: int = 7):
+        for i in range(0, len(content), chunk_size):
+            delta = SimpleNamespace(content=content[i : i + chunk_size])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+def rank(scores: list[int], **kwargs) -> list[int]:
+    titles = [f"job {score}" for score in scores]
+    ranker = SlidingWindowRanker(FakeChat(**kwargs.pop("fake", {})), **kwargs)  # type: ignore
+    order = asyncio.run(ranker.rank("query", titles, ["description"] * len(titles)))
+    return [scores[i] for i in order]
+
+
+class TestParsePermutation:
+    """Test that any response gives a permutation of the window"""
+
+    def test_orders_by_new_rank(self):
+        response = '[{"new_rank": 1, "index": 1}, {"new_rank": 0, "index": 3}]'
+        assert parse_permutation(response, 3) == [2, 0, 1]
+
+    def test_ignores_bad_labels(self):
+        response = '[{"new_rank": 0, "index": 2}, {"new_rank": 1, "index": 2}, {"new_rank": 2, "index": 9}]'
+        assert parse_permutation(response, 3) == [1, 0, 2]
+
+    def test_unparseable_keeps_order(self):
+        assert parse_permutation("sorry, I can't do that", 3) == [0, 1, 2]
+
+
+class TestSlidingWindowRanker:
+    """Test window ranking against a fake llm"""
+
+    def test_single_window_is_sorted(self):
+        assert rank([3, 1, 2], window=10, passes=1) == [3, 2, 1]
+
+    def test_best_item_rises_from_the_bottom_in_one_pass(self):
+        scores = list(range(40))
+        ranked = rank(scores, window=10, step=5, passes=1)
+        assert ranked[0] == 39
+
+    def test_long_list_is_sorted_with_enough_passes(self):
+        scores = list(range(40))  # worst case: reversed
+        assert rank(scores, window=10, step=5, passes=8) == sorted(scores, reverse=True)
+
+    def test_nearly_sorted_list_needs_few_passes(self):
+        scores = [39 - i for i in range(40)]
+        scores[3], scores[12] = scores[12], scores[3]
+        assert rank(scores, window=10, step=5, passes=2) == sorted(scores, reverse=True)
+
+    def test_windows_overlap_from_the_bottom(self):
+        assert sliding_windows(20, 10, 5) == [(10, 20), (5, 15), (0, 10)]
+        assert sliding_windows(12, 10, 5) == [(2, 12), (0, 7)]
+        assert sliding_windows(3, 10, 5) == [(0, 3)]
+
+    def test_step_must_be_smaller_than_the_window(self):
+        with pytest.raises(ValueError):
+            SlidingWindowRanker(FakeChat(), window=10, step=10)  # type: ignore
+
+
+class TestPermutationStreamParser:
+    """Test that items are parsed as soon as they are complete"""
+
+    def test_items_arrive_before_the_list_closes(self):
+        parser = PermutationStreamParser(3)
+        assert not parser.feed('<ranking_criteria>see [2]</ranking_criteria>[{"new_rank": 0, "ind')
+        assert parser.feed('ex": 3}, {"new_rank": 1,')
+        assert parser.ranked == [2]
+        parser.feed(' "index": 1}, {"new_rank": 2, "index": 2}]')
+        assert parser.ranked == [2, 0, 1]
+
+    def test_waits_for_the_criteria_to_close(self):
+        parser = PermutationStreamParser(2)
+        assert not parser.feed('<ranking_criteria>[{"index": 2}]')
+        parser.feed('</ranking_criteria>[{"index": 1}]')
+        assert parser.ranked == [0]
+
+    def test_ignores_braces_in_strings_and_bad_labels(self):
+        parser = PermutationStreamParser(2)
+        parser.feed('[{"note": "}{", "index": 2}, {"index": 7}, {"index": 2}]')
+        assert parser.ranked == [1]
+
+
+class TestStreamingAndCache:
+    """Test streamed responses and the response cache"""
+
+    def test_stream_reports_partial_rankings(self):
+        updates = []
+        ranker = SlidingWindowRanker(FakeChat(), window=10, stream=True)  # type: ignore
+        titles = ["job 1", "job 3", "job 2"]
+        order = asyncio.run(ranker.rank("query", titles, [""] * 3, updates.append))
+
+        assert order == [1, 2, 0]
+        assert updates[0] == [1, 0, 2]
+        assert updates[-1] == order
+
+    def test_stream_reports_every_pass_of_a_long_list(self):
+        updates = []
+        ranker = SlidingWindowRanker(FakeChat(), window=4, step=2, passes=2, stream=True)  # type: ignore
+        titles = [f"job {i}" for i in range(10)]
+        order = asyncio.run(ranker.rank("query", titles, [""] * 10, updates.append))
+
+        assert all(sorted(update) == list(range(10)) for update in updates)
+        # the first item of the bottom window arrives before any window is complete
+        assert updates[0] == [0, 1, 2, 3, 4, 5, 9, 6, 7, 8]
+        assert updates[-1] == order
+
+    def test_cached_windows_skip_the_llm(self, tmp_path):
+        cache = LLMCache(str(tmp_path / "test.duckdb"))
+        client = FakeChat()
+        ranker = SlidingWindowRanker(client, window=10, passes=2, cache=cache)  # type: ignore
+        titles = [f"job {i}" for i in range(15)]
+
+        first = asyncio.run(ranker.rank("query", titles, [""] * 15))
+        calls = client.calls
+        second = asyncio.run(ranker.rank("query", titles, [""] * 15))
+
+        assert first == second
+        assert client.calls == calls
+        assert cache.hits == calls and len(cache) == calls
+
+    def test_cache_evicts_least_recently_used(self, tmp_path):
+        cache = LLMCache(str(tmp_path / "test.duckdb"), max_rows=2)
+        for i in range(3):
+            cache.put("model", build_prompt(f"query {i}", ""), f"response {i}")
+            time.sleep(0.01)
+
+        assert len(cache) == 2
+        assert cache.get("model", build_prompt("query 0", "")) is None
+        assert cache.get("model", build_prompt("query 2", "")) == "response 2"
+        assert cache.get("other model", build_prompt("query 2", "")) is None
+
+
+class TestPermutationOpenai:
+    """Test the DataFrame wrapper"""
+
+    def test_rows_past_top_k_keep_their_place(self):
+        df = pd.DataFrame({"title": [f"job {i}" for i in range(6)], "description": ["d"] * 6})
+        ranked = permutation_openai(
+            "query", df, top_k=4, client=FakeChat(), passes=1, cache=None
+        )
+        assert ranked["title"].tolist() == ["job 3", "job 2", "job 1", "job 0", "job 4", "job 5"]
+        assert ranked["i_permutation"].tolist() == list(range(6))
+
+    def test_app_defaults_stream_partial_rankings(self):
+        n = PERMUTATION_TOP_K
+        df = pd.DataFrame({"title": [f"job {i}" for i in range(n)], "description": ["d"] * n})
+        updates = []
+        ranked = permutation_openai(
+            "query", df, client=FakeChat(), stream=True, cache=None, on_update=updates.append
+        )
+
+        assert n > PERMUTATION_WINDOW
+        assert len(updates) > PERMUTATION_TOP_K
+        assert all(sorted(update) == list(range(n)) for update in updates)
+        assert df["title"].iloc[updates[-1]].tolist() == ranked["title"].tolist()
+
+
+def test_prompt_keeps_backslashes():
+    content = build_prompt(r"C:\new \1", "items")[0]["content"]
+    assert r"C:\new \1" in content and "{{query}}" not in content
@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pathlib import Path
+
+from algorithms.projection import ProjectionStore, matrix_hash, project_with_you
+from algorithms.semantic_search import embedding_matrix
+from algorithms.visualizations import cluster_documents
+from utils.embedding_store import read_feather
+
+DATA_DIR = Path(__file__).parent.parent / "intersect" / "data"
+
+
+TOPICS = ["nurse", "chef", "pilot"]
+
+
+@pytest.fixture(scope="module")
+def matrix():
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(3, 16)) * 5
+    return (centers[np.arange(60) % 3] + rng.normal(size=(60, 16))).astype(np.float32)
+
+
+def jobs(matrix: np.ndarray) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "title": [f"job {i}" for i in range(len(matrix))],
+            "description": ["d"] * len(matrix),
+            "embedding": list(matrix),
+        }
+    )
+
+
+class TestProjectionStore:
+    """Test that UMAP is fit once per job set"""
+
+    def test_same_jobs_reuse_the_fit(self, matrix):
+        store = ProjectionStore(root=None)
+        first = store.get(matrix)
+        assert store.get(matrix.copy()) is first
+        assert store.fits == 1
+
+        store.get(matrix[:-1])
+        assert store.fits == 2
+
+    def test_memory_only_store_is_bounded(self, matrix):
+        store = ProjectionStore(root=None, memory_size=1)
+        store.get(matrix)
+        store.get(matrix[:-1])
+        store.get(matrix)
+        assert store.fits == 3
+
+    def test_saved_store_is_bounded(self, matrix, tmp_path):
+        store = ProjectionStore(tmp_path, memory_size=1, max_saved=2)
+        for n in (60, 59, 58):
+            store.get(matrix[:n])
+        assert len(store.projections) == 1
+        saved = sorted(path.name for path in tmp_path.iterdir())
+        assert saved == sorted(f"exact-{matrix_hash(matrix[:n])}" for n in (59, 58))
+
+    def test_saved_projection_is_loaded(self, matrix, tmp_path):
+        fitted = ProjectionStore(tmp_path).get(matrix)
+        assert (tmp_path / f"exact-{matrix_hash(matrix)}").is_dir()
+
+        store = ProjectionStore(tmp_path)
+        loaded = store.get(matrix)
+        assert store.fits == 0
+        np.testing.assert_array_equal(loaded.coordinates, fitted.coordinates)
+        np.testing.assert_allclose(
+            loaded.transform(matrix[:1]), fitted.transform(matrix[:1]), atol=1e-4
+        )
+
+    def test_modes_are_cached_apart(self, matrix):
+        store = ProjectionStore(root=None)
+        fast = store.get(matrix, "fast")
+        assert store.get(matrix, "fast") is fast
+        assert store.get(matrix) is not fast
+        assert fast.coordinates.shape == (len(matrix), 2)
+
+    def test_unknown_mode(self, matrix):
+        with pytest.raises(ValueError):
+            ProjectionStore(root=None).get(matrix, "slow")
+
+
+class TestProjectionClustering:
+    """Test that clusters and their names are kept with the projection"""
+
+    def test_clusters_are_computed_once(self, matrix):
+        store = ProjectionStore(root=None)
+        documents = [f"{TOPICS[i % 3]} jobs" for i in range(len(matrix))]
+        projection, clustering = store.cluster(matrix, documents)
+
+        assert len(clustering.labels) == len(matrix)
+        assert set(clustering.labels) == {0, 1, 2}
+        for cluster, terms in clustering.terms.items():
+            rows = np.flatnonzero(clustering.labels == cluster)
+            assert terms[0] == TOPICS[rows[0] % 3]
+
+        assert store.cluster(matrix, [])[1] is clustering
+        assert projection.clustering is clustering
+
+    def test_clusters_are_saved_with_the_projection(self, matrix, tmp_path):
+        documents = [TOPICS[i % 3] for i in range(len(matrix))]
+        _, clustering = ProjectionStore(tmp_path).cluster(matrix, documents)
+
+        loaded = ProjectionStore(tmp_path).get(matrix)
+        assert loaded.clustering is not None
+        np.testing.assert_array_equal(loaded.clustering.labels, clustering.labels)
+        assert loaded.clustering.terms == clustering.terms
+
+    @pytest.mark.parametrize("mode, min_clusters", [("exact", 4), ("fast", 2)])
+    def test_bundled_jobs_are_mostly_clustered(self, mode, min_clusters):
+        # HDBSCAN on the k-NN graph left about 75% of these jobs as noise in 2 clusters, the
+        # layout leaves about 30% in 8. Unseeded fast fits vary, up to 41% noise, and some
+        # lay the jobs out as 2 clusters with next to no noise
+        df = read_feather(DATA_DIR / "law.feather")
+        df = df[df["embedding"].notna()]
+        _, clustering = ProjectionStore(root=None).cluster(
+            embedding_matrix(df), cluster_documents(df), mode
+        )
+
+        assert np.mean(clustering.labels == -1) < 0.5
+        assert len(set(clustering.labels) - {-1}) >= min_clusters
+
+
+@pytest.mark.parametrize("mode", ["exact", "fast"])
+def test_you_is_placed_near_its_cluster(matrix, mode):
+    projection = ProjectionStore(root=None).get(matrix, mode)
+    df = project_with_you(jobs(matrix), "my cv", matrix[4] + 0.01, projection)
+
+    assert len(df) == len(matrix) + 1
+    assert df["title"].iloc[-1] == "Your text"
+    coordinates = df[["UMAP1", "UMAP2"]].to_numpy()
+    centroids = [coordinates[:-1][np.arange(60) % 3 == c].mean(axis=0) for c in range(3)]
+    distances = np.linalg.norm(np.array(centroids) - coordinates[-1], axis=1)
+    assert distances.argmin() == 4 % 3
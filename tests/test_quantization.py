@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from algorithms.quantization import QuantizedIndex
+from algorithms.semantic_search import VectorIndex
+
+
+@pytest.fixture(scope="module")
+def matrix():
+    rng = np.random.default_rng(0)
+    topics = rng.normal(size=(10, 128))
+    vectors = topics[rng.integers(10, size=3000)] + 0.8 * rng.normal(size=(3000, 128))
+    return vectors.astype(np.float32)
+
+
+def recall(index: QuantizedIndex, matrix: np.ndarray, k: int = 10) -> float:
+    exact = VectorIndex(matrix)
+    hits = 0
+    for query in matrix[:30]:
+        hits += len(set(exact.search(query, k)[0]) & set(index.search(query, k)[0]))
+    return hits / (k * 30)
+
+
+class TestQuantizedIndex:
+    """Test quantized candidate search with full precision rescoring"""
+
+    @pytest.mark.parametrize(
+        "method, rescore_factor", [("float16", 1), ("int8", 2), ("binary", 20)]
+    )
+    def test_recall_with_rescoring(self, matrix, method, rescore_factor):
+        index = QuantizedIndex(matrix, method, rescore_factor=rescore_factor)
+        assert recall(index, matrix) >= 0.9
+
+    def test_scores_are_full_precision(self, matrix):
+        ids, scores = QuantizedIndex(matrix, "binary").search(matrix[5], k=3)
+        exact = VectorIndex(matrix).scores(matrix[5])
+
+        assert ids[0] == 5
+        assert np.allclose(scores, exact[ids], atol=1e-5)
+
+    def test_memory(self, matrix):
+        assert QuantizedIndex(matrix, "int8").nbytes == matrix.nbytes // 4
+        assert QuantizedIndex(matrix, "binary").nbytes == matrix.nbytes // 32
+
+    def test_invalid_method(self, matrix):
+        with pytest.raises(ValueError):
+            QuantizedIndex(matrix, "int4")
@@ -0,0 +1,141 @@
+import asyncio
+import random
+import time
+import cohere
+import pandas as pd
+from types import SimpleNamespace
+
+from algorithms.rerank import rerank_df
+from algorithms.rerank_backends import (
+    AsyncReranker,
+    CrossEncoderBackend,
+    OverlapCrossEncoder,
+    is_retryable,
+    length_batches,
+)
+from utils.rerank_cache import RerankCache
+
+
+class SlowReranker:
+    """Fake async client with latency, optionally failing the first calls"""
+
+    def __init__(self, latency: float = 0.0, failures: int = 0):
+        self.latency = latency
+        self.failures = failures
+        self.batches: list[list[str]] = []
+        self.request_options: list[dict] = []
+
+    async def rerank(self, query, model, documents, request_options=None):
+        self.request_options.append(request_options)
+        if self.failures > 0:
+            self.failures -= 1
+            raise cohere.TooManyRequestsError(body=None)
+        self.batches.append(list(documents))
+        await asyncio.sleep(self.latency)
+        results = [
+            SimpleNamespace(index=i, relevance_score=float(doc.split()[-1]))
+            for i, doc in enumerate(documents)
+        ]
+        return SimpleNamespace(results=results[::-1])
+
+
+def documents(n: int) -> dict[str, str]:
+    return {f"id{i}": f"doc {i}" for i in range(n)}
+
+
+class TestAsyncReranker:
+    """Test batching, concurrency and retries against a fake client"""
+
+    def test_scores_are_merged_by_id(self):
+        client = SlowReranker()
+        reranker = AsyncReranker(client, max_batch_size=3)  # type: ignore
+        scores = asyncio.run(reranker.rerank("q", documents(10)))
+
+        assert scores == {f"id{i}": float(i) for i in range(10)}
+        assert [len(batch) for batch in client.batches] == [3, 3, 3, 1]
+
+    def test_batches_run_concurrently(self):
+        client = SlowReranker(latency=0.5)
+        reranker = AsyncReranker(client, max_batch_size=10, max_concurrency=8)  # type: ignore
+
+        start = time.time()
+        asyncio.run(reranker.rerank("q", documents(80)))
+        assert time.time() - start < 8 * 0.5 / 2
+
+    def test_rate_limits_are_retried(self):
+        client = SlowReranker(failures=2)
+        reranker = AsyncReranker(client, max_batch_size=5)  # type: ignore
+        scores = asyncio.run(reranker.rerank("q", documents(5)))
+        assert len(scores) == 5
+
+    def test_sdk_retries_are_disabled(self):
+        client = SlowReranker()
+        reranker = AsyncReranker(client, max_batch_size=5)  # type: ignore
+        asyncio.run(reranker.rerank("q", documents(10)))
+        assert client.request_options == [{"max_retries": 0}] * 2
+
+    def test_default_client(self, monkeypatch):
+        monkeypatch.setenv("COHERE_API_KEY", "test-key")
+        reranker = AsyncReranker()
+        assert isinstance(reranker.client, cohere.AsyncClient)
+
+    def test_client_errors_are_not_retried(self):
+        assert not is_retryable(cohere.BadRequestError(body=None))
+        assert is_retryable(cohere.InternalServerError(body=None))
+
+    def test_empty(self):
+        reranker = AsyncReranker(SlowReranker())  # type: ignore
+        assert asyncio.run(reranker.rerank("q", {})) == {}
+
+
+def local_backend(**kwargs) -> CrossEncoderBackend:
+    encoder = OverlapCrossEncoder(max_length=kwargs.pop("max_length", 512))
+    return CrossEncoderBackend(model="overlap", encoder=encoder, **kwargs)
+
+
+class TestLengthBatches:
+    """Test padding-aware batching"""
+
+    def test_batches_hold_similar_lengths(self):
+        lengths = [100, 5, 90, 6, 7, 95]
+        batches = length_batches(lengths, max_tokens=200, max_items=8)
+        assert batches == [[1, 3, 4], [2, 5], [0]]
+
+    def test_every_position_once(self):
+        lengths = list(range(50, 0, -1))
+        batches = length_batches(lengths, max_tokens=100, max_items=4)
+        assert sorted(i for batch in batches for i in batch) == list(range(50))
+        assert all(len(batch) * max(lengths[i] for i in batch) <= 100 for batch in batches)
+
+
+class TestCrossEncoderBackend:
+    """Test the local reranker with the stand-in model"""
+
+    def test_scores_by_id(self):
+        docs = {"a": "python developer", "b": "nurse in london", "c": "python nurse"}
+        scores = local_backend().rerank("python nurse", docs)
+        assert scores == {"a": 0.5, "b": 0.5, "c": 1.0}
+
+    def test_sorting_by_length_reduces_padding(self):
+        rng = random.Random(0)
+        docs = {str(i): "word " * rng.randint(1, 200) for i in range(64)}
+
+        sorted_backend = local_backend(batch_tokens=2048, max_batch_size=8)
+        sorted_backend.rerank("word", docs)
+        unsorted = OverlapCrossEncoder()
+        pairs = [("word", doc) for doc in docs.values()]
+        for i in range(0, len(pairs), 8):
+            unsorted.predict(pairs[i : i + 8])
+
+        assert sorted_backend.encoder.padded_tokens < 0.75 * unsorted.padded_tokens
+
+    def test_long_documents_are_truncated(self):
+        docs = {"a": "filler " * 100 + "python"}
+        assert local_backend(max_length=50).rerank("python", docs)["a"] == 0.0
+        assert local_backend(max_length=512).rerank("python", docs)["a"] == 1.0
+
+    def test_rerank_df(self, tmp_path):
+        df = pd.DataFrame({"description": ["nurse", "python developer", "python"]})
+        cache = RerankCache(str(tmp_path / "test.duckdb"), model="overlap")
+        df = rerank_df("python developer", df, local_backend(), cache)
+        assert df["score_reranker"].tolist() == [0.0, 1.0, 0.5]
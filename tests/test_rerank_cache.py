@@ -0,0 +1,119 @@
+import duckdb
+import pandas as pd
+import pytest
+from types import SimpleNamespace
+
+from algorithms import rerank, rerank_backends
+from utils.rerank_cache import RerankCache
+from utils.embedding_cache import EmbeddingCache
+from utils.llm_cache import LLMCache
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "test.duckdb")
+
+
+class TestRerankCache:
+    """Test the DuckDB backed rerank score cache"""
+
+    def test_put_and_get(self, db_path):
+        cache = RerankCache(db_path)
+        cache.put_many("my cv", {"a": 0.9, "b": 0.1})
+
+        assert cache.get_many("my cv", ["a", "c"]) == {"a": 0.9}
+        assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+    def test_keyed_on_query_and_model(self, db_path):
+        RerankCache(db_path, model="a").put_many("my cv", {"a": 0.9})
+
+        assert RerankCache(db_path, model="a").get_many("other cv", ["a"]) == {}
+        assert RerankCache(db_path, model="b").get_many("my cv", ["a"]) == {}
+
+    def test_expired_scores_are_misses(self, db_path):
+        cache = RerankCache(db_path, ttl_seconds=0)
+        cache.put_many("my cv", {"a": 0.9})
+
+        assert cache.get_many("my cv", ["a"]) == {}
+        assert len(cache) == 0
+
+    def test_passage_budgets_are_cached_apart(self, db_path):
+        cache = RerankCache(db_path)
+        cache.put_many("my cv", {"a": 0.9}, passage_budget=0)
+        assert cache.get_many("my cv", ["a"], passage_budget=256) == {}
+        cache.put_many("my cv", {"a": 0.4}, passage_budget=256)
+        assert cache.get_many("my cv", ["a"], passage_budget=0) == {"a": 0.9}
+        assert cache.get_many("my cv", ["a"], passage_budget=256) == {"a": 0.4}
+
+    def test_table_from_an_older_layout_is_replaced(self, db_path):
+        conn = duckdb.connect(db_path)
+        conn.execute("CREATE TABLE rerank_cache (model VARCHAR, query_hash VARCHAR, doc_id VARCHAR)")
+        conn.close()
+
+        cache = RerankCache(db_path)
+        cache.put_many("my cv", {"a": 0.9})
+        assert cache.get_many("my cv", ["a"]) == {"a": 0.9}
+
+    def test_caches_share_one_connection(self, db_path):
+        caches = [RerankCache(db_path), EmbeddingCache(db_path, dimensions=2), LLMCache(db_path)]
+        assert len({id(cache.conn) for cache in caches}) == 1
+        assert len({id(cache.lock) for cache in caches}) == 1
+
+    def test_evicts_least_recently_used(self, db_path):
+        cache = RerankCache(db_path, max_rows=2)
+        cache.put_many("q", {"a": 0.1})
+        cache.put_many("q", {"b": 0.2})
+        cache.get_many("q", ["a"])
+        cache.put_many("q", {"c": 0.3})
+
+        assert len(cache) == 2
+        assert set(cache.get_many("q", ["a", "b", "c"])) == {"a", "c"}
+
+
+class FakeCohere:
+    """Scores documents by length and records what was sent"""
+
+    calls: list[list[str]] = []
+
+    def __init__(self, api_key=None):
+        pass
+
+    async def rerank(self, query, model, documents, request_options=None):
+        FakeCohere.calls.append(list(documents))
+        results = [
+            SimpleNamespace(index=i, relevance_score=len(doc) / 100)
+            for i, doc in enumerate(documents)
+        ]
+        return SimpleNamespace(results=results[::-1])
+
+
+class TestRerankCohere:
+    """Test that only uncached documents are sent to Cohere"""
+
+    @pytest.fixture(autouse=True)
+    def fake_cohere(self, monkeypatch):
+        monkeypatch.setenv("COHERE_API_KEY", "test")
+        monkeypatch.setattr(rerank_backends.cohere, "AsyncClient", FakeCohere)
+        FakeCohere.calls = []
+
+    def test_only_misses_are_sent(self, db_path):
+        cache = RerankCache(db_path)
+
+        df = pd.DataFrame(
+            {"intersect_id": ["x", "y"], "description": ["short", "a longer one"]},
+            index=[7, 3],
+        )
+        first = rerank.rerank_cohere("my cv", df.copy(), cache)
+        assert first["score_reranker"].tolist() == [0.05, 0.12]
+
+        df.loc[5] = ["z", "third"]
+        second = rerank.rerank_cohere("my cv", df.copy(), cache)
+        assert FakeCohere.calls == [["short", "a longer one"], ["third"]]
+        assert second["score_reranker"].tolist() == [0.05, 0.12, 0.05]
+
+    def test_only_candidates_are_reranked(self, db_path):
+        df = pd.DataFrame({"intersect_id": ["x", "y", "z"], "description": ["a", "bb", "ccc"]})
+        df = rerank.rerank_cohere("my cv", df, RerankCache(db_path), max_candidates=2)
+        assert FakeCohere.calls == [["a", "bb"]]
+        assert df["score_reranker"].tolist()[:2] == [0.01, 0.02]
+        assert pd.isna(df["score_reranker"].iloc[2])
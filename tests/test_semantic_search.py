@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+from algorithms.semantic_search import VectorIndex, similarity_search, top_k
+from algorithms.matryoshka import MatryoshkaIndex
+
+
+def random_df(n: int = 50, d: int = 16, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, d))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return pd.DataFrame({"embedding": list(vectors)})
+
+
+class TestTopK:
+    """Test partial top-k selection"""
+
+    def test_matches_full_sort(self):
+        scores = np.random.default_rng(1).normal(size=100)
+        ids, values = top_k(scores, 10)
+
+        assert list(ids) == list(np.argsort(-scores)[:10])
+        assert np.all(np.diff(values) <= 0)
+
+    def test_k_larger_than_corpus(self):
+        ids, _ = top_k(np.array([0.1, 0.3, 0.2]), 10)
+        assert list(ids) == [1, 2, 0]
+
+    def test_empty(self):
+        ids, values = top_k(np.array([]), 5)
+        assert len(ids) == 0 and len(values) == 0
+
+
+class TestVectorIndex:
+    """Test exact search over the float32 matrix"""
+
+    def test_matrix_is_contiguous_float32(self):
+        index = VectorIndex.from_df(random_df())
+        assert index.matrix.dtype == np.float32
+        assert index.matrix.flags["C_CONTIGUOUS"]
+        assert index.matrix.shape == (50, 16)
+
+    def test_search_matches_dot_product(self):
+        df = random_df()
+        query = df["embedding"].iloc[7]
+
+        ids, scores = VectorIndex.from_df(df).search(query, k=5)
+        expected = np.argsort([-np.dot(query, x) for x in df["embedding"]])[:5]
+
+        assert ids[0] == 7
+        assert abs(scores[0] - 1.0) < 1e-5
+        assert list(ids) == list(expected)
+
+    def test_similarity_search_keeps_row_order(self):
+        df = random_df()
+        query = df["embedding"].iloc[3]
+
+        df = similarity_search(df, query)
+
+        expected = [np.dot(query, x) for x in df["embedding"]]
+        assert np.allclose(df["score_semantic"], expected, atol=1e-5)
+
+
+class TestMatryoshkaIndex:
+    """Test coarse-to-fine search"""
+
+    def test_enough_candidates_is_exact(self):
+        df = random_df(n=200, d=32)
+        matrix = np.array(df["embedding"].tolist())
+        index = MatryoshkaIndex(matrix, coarse_dimensions=8, candidates=200)
+
+        for query in matrix[:10]:
+            expected, _ = VectorIndex(matrix).search(query, 5)
+            assert list(index.search(query, 5)[0]) == list(expected)
+
+    def test_truncated_copy_is_normalized(self):
+        matrix = np.array(random_df(d=32)["embedding"].tolist())
+        index = MatryoshkaIndex(matrix, coarse_dimensions=8)
+
+        assert index.coarse.shape == (50, 8)
+        assert np.allclose(np.linalg.norm(index.coarse, axis=1), 1.0, atol=1e-5)
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from algorithms.ann import IVFIndex
+from algorithms.quantization import QuantizedIndex
+from algorithms.matryoshka import MatryoshkaIndex
+from algorithms.semantic_search import VectorIndex
+from algorithms.vector_index import VectorIndexStore, build_vector_index, semantic_ranking
+
+
+@pytest.fixture(scope="module")
+def matrix():
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(10, 16))
+    return (centers[np.arange(500) % 10] + 0.3 * rng.normal(size=(500, 16))).astype(np.float32)
+
+
+class TestBuildVectorIndex:
+    """Test the index selection and the exact search fallback"""
+
+    def test_small_corpus_is_exact(self, matrix):
+        assert isinstance(build_vector_index(matrix[:100], "ivf"), VectorIndex)
+
+    def test_large_corpus_uses_the_configured_index(self, matrix):
+        assert isinstance(build_vector_index(matrix, "ivf", min_rows=100), IVFIndex)
+        assert isinstance(build_vector_index(matrix, "exact", min_rows=100), VectorIndex)
+
+    @pytest.mark.parametrize("kind", ["float16", "int8", "binary"])
+    def test_quantized_kinds(self, matrix, kind):
+        index = build_vector_index(matrix, kind, min_rows=100)
+        assert isinstance(index, QuantizedIndex)
+        assert index.method == kind
+
+        # candidates are rescored at full precision
+        ids, scores = semantic_ranking(index, matrix[7], k=5)
+        exact_ids, exact_scores = VectorIndex(matrix).search(matrix[7], 5)
+        assert ids[0] == exact_ids[0] == 7
+        np.testing.assert_allclose(scores[0], exact_scores[0], rtol=1e-5)
+
+    def test_matryoshka(self, matrix):
+        wide = np.hstack([matrix] * 20)
+        index = build_vector_index(wide, "matryoshka", min_rows=100)
+        assert isinstance(index, MatryoshkaIndex)
+        assert semantic_ranking(index, wide[7], k=5)[0][0] == 7
+
+        # nothing to truncate
+        assert isinstance(build_vector_index(matrix, "matryoshka", min_rows=100), VectorIndex)
+
+    def test_unknown_kind(self, matrix):
+        with pytest.raises(ValueError):
+            build_vector_index(matrix, "hnsw")
+
+
+class TestSemanticRanking:
+    """Test that exact indexes rank every row and approximate ones their top k"""
+
+    def test_exact_ranks_every_row(self, matrix):
+        ids, scores = semantic_ranking(VectorIndex(matrix), matrix[3], k=10)
+        assert sorted(ids.tolist()) == list(range(len(matrix)))
+        assert np.all(np.diff(scores) <= 1e-6)
+
+    def test_approximate_ranks_top_k(self, matrix):
+        ids, _ = semantic_ranking(build_vector_index(matrix, "ivf", min_rows=100), matrix[3], k=10)
+        assert len(ids) == 10
+        assert ids[0] == 3
+
+
+class TestVectorIndexStore:
+    """Test that an index is built once per job set and kind"""
+
+    def test_same_matrix_reuses_the_index(self, matrix):
+        store = VectorIndexStore()
+        first = store.get(matrix, "ivf")
+        assert store.get(matrix.copy(), "ivf") is first
+        assert store.get(matrix, "exact") is not first
+        assert store.builds == 2
+
+    def test_store_is_bounded(self, matrix):
+        store = VectorIndexStore(memory_size=1)
+        store.get(matrix, "exact")
+        store.get(matrix[:-1], "exact")
+        store.get(matrix, "exact")
+        assert store.builds == 3
+        assert len(store.indexes) == 1
@@ -0,0 +1,64 @@
+import os
+import time
+
+from utils.warmup import Warmup, enable_compile_cache
+
+
+class TestWarmup:
+    """Test the background warm-up and its status"""
+
+    def test_runs_every_step_in_the_background(self):
+        calls = []
+        warmup = Warmup({"slow": lambda: time.sleep(0.2), "fast": lambda: calls.append(1)})
+        assert warmup.status()["state"] == "pending"
+
+        start = time.time()
+        warmup.start()
+        assert time.time() - start < 0.1
+        assert warmup.wait(5)
+
+        status = warmup.status()
+        assert status["state"] == "done" and calls == [1]
+        assert status["finished_steps"] == ["slow", "fast"] and not status["pending_steps"]
+        assert status["seconds"]["slow"] >= 0.2
+
+    def test_failed_step_does_not_stop_the_others(self):
+        def broken():
+            raise RuntimeError("no compiler")
+
+        calls = []
+        warmup = Warmup({"broken": broken, "next": lambda: calls.append(1)}).start()
+        warmup.wait(5)
+
+        assert warmup.state == "failed"
+        assert warmup.errors == {"broken": "no compiler"}
+        assert calls == [1]
+
+    def test_start_is_idempotent(self):
+        calls = []
+        warmup = Warmup({"step": lambda: calls.append(1)})
+        warmup.start().start()
+        warmup.wait(5)
+        assert calls == [1]
+
+
+def test_compile_cache_respects_the_environment(monkeypatch, tmp_path):
+    monkeypatch.delenv("NUMBA_CACHE_DIR", raising=False)
+    enable_compile_cache(str(tmp_path))
+    assert os.environ["NUMBA_CACHE_DIR"] == str(tmp_path)
+
+    enable_compile_cache("elsewhere")
+    assert os.environ["NUMBA_CACHE_DIR"] == str(tmp_path)
+
+
+def test_compile_cache_is_quiet_on_reruns(monkeypatch, tmp_path, caplog):
+    monkeypatch.delenv("NUMBA_CACHE_DIR", raising=False)
+    enable_compile_cache(str(tmp_path))
+
+    # as on a Streamlit rerun, numba has been imported since
+    import numba  # noqa: F401
+
+    # the first call warns too when an earlier test imported numba
+    caplog.clear()
+    enable_compile_cache(str(tmp_path))
+    assert "numba was imported" not in caplog.text